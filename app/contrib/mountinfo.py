@@ -0,0 +1,78 @@
+import re
+from pathlib import Path
+from typing import NamedTuple
+
+
+MOUNTINFO = Path('/proc/self/mountinfo')
+
+
+class MountInfo(NamedTuple):
+    mount_point: str  # mount point inside the Doku container
+    fstype: str  # filesystem type, e.g. ext4, nfs4, fuse.sshfs
+    source: str  # mount source, e.g. /dev/sda1 or server:/export
+    device: str  # major:minor device number
+
+
+def _unescape(s: str) -> str:
+    # spaces, tabs, newlines and backslashes are escaped as octal codes, e.g. \040
+    return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), s)
+
+
+def parse_mountinfo(text: str) -> list[MountInfo]:
+    """
+    Parse the content of /proc/<pid>/mountinfo.
+    See proc(5): `36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root rw,errors=continue`
+    """
+    ret = []
+    for line in text.splitlines():
+        left, sep, right = line.partition(' - ')
+        if not sep:
+            continue
+
+        fields = left.split()
+        extra = right.split()
+        if len(fields) < 5 or len(extra) < 2:
+            continue
+
+        ret.append(
+            MountInfo(
+                mount_point=_unescape(fields[4]),
+                fstype=extra[0],
+                source=_unescape(extra[1]),
+                device=fields[2],
+            )
+        )
+    return ret
+
+
+def read_mountinfo(path: Path = MOUNTINFO) -> list[MountInfo]:
+    """
+    Read the mount table of the current process. Returns an empty list if it's not available.
+    """
+    try:
+        return parse_mountinfo(path.read_text())
+    except OSError:
+        return []
+
+
+def find_mount(path: str, mounts: list[MountInfo]) -> MountInfo | None:
+    """
+    Find the mount that contains the path, i.e. the mount with the longest matching mount point.
+    Later mounts shadow earlier ones with the same mount point.
+    """
+    found = None
+    found_len = -1
+    for mnt in mounts:
+        mount_point = mnt.mount_point.rstrip('/')  # the root mount point becomes an empty string
+        if path == mount_point or path.startswith(mount_point + '/'):
+            if len(mount_point) >= found_len:
+                found, found_len = mnt, len(mount_point)
+    return found
+
+
+def nested_mounts(path: str, mounts: list[MountInfo]) -> list[MountInfo]:
+    """
+    Find the mounts below the path (not including the mount of the path itself).
+    """
+    prefix = path.rstrip('/') + '/'
+    return [mnt for mnt in mounts if mnt.mount_point.startswith(prefix) and mnt.mount_point != prefix]
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from contrib.mountinfo import MountInfo, parse_mountinfo, read_mountinfo, find_mount, nested_mounts
+
+
+MOUNTINFO = """\
+22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/sda1 rw
+25 22 0:21 / /proc rw,nosuid,nodev,noexec,relatime shared:12 - proc proc rw
+36 22 0:45 / /hostroot/mnt/nfs rw,relatime shared:20 - nfs4 server:/export rw,vers=4.2
+37 22 0:46 / /hostroot/mnt/my\\040share rw,relatime - fuse.sshfs user@host:/data rw
+broken line
+"""
+
+
+def test_parse_mountinfo():
+    mounts = parse_mountinfo(MOUNTINFO)
+    assert len(mounts) == 4
+    assert mounts[0] == MountInfo(mount_point='/', fstype='ext4', source='/dev/sda1', device='8:1')
+    assert mounts[2].fstype == 'nfs4'
+    assert mounts[2].source == 'server:/export'
+    assert mounts[3].mount_point == '/hostroot/mnt/my share'
+
+
+def test_read_mountinfo(tmp_path):
+    mounts = read_mountinfo()
+    assert find_mount('/', mounts) is not None
+
+    assert read_mountinfo(Path(tmp_path / 'missing')) == []
+
+
+def test_find_mount():
+    mounts = parse_mountinfo(MOUNTINFO)
+    assert find_mount('/hostroot/mnt/nfs/data/file', mounts).fstype == 'nfs4'
+    assert find_mount('/hostroot/mnt/nfs', mounts).fstype == 'nfs4'
+    assert find_mount('/hostroot/mnt/nfs2', mounts).fstype == 'ext4'
+    assert find_mount('/hostroot/mnt/my share/x', mounts).fstype == 'fuse.sshfs'
+    assert find_mount('/proc/1', mounts).fstype == 'proc'
+    assert find_mount('/', mounts).fstype == 'ext4'
+    assert find_mount('/anything', []) is None
+
+
+def test_nested_mounts():
+    mounts = parse_mountinfo(MOUNTINFO)
+    assert [m.fstype for m in nested_mounts('/hostroot', mounts)] == ['nfs4', 'fuse.sshfs']
+    assert [m.fstype for m in nested_mounts('/hostroot/mnt/nfs', mounts)] == []
+    assert [m.fstype for m in nested_mounts('/', mounts)] == ['proc', 'nfs4', 'fuse.sshfs']
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, UTC
 from typing import Optional
 
 from humanize import naturaltime
@@ -67,6 +67,7 @@ class DockerContainer(BaseModel):
     size_rw: int = Field(alias='SizeRw', default=0)
     size_root_fs: int = Field(alias='SizeRootFs', default=0)
     state: str = Field(alias='State', default='')
+    labels: Optional[dict[str, str]] = Field(alias='Labels', default_factory=dict)
 
     @property
     def short_id(self) -> str:
@@ -106,6 +107,7 @@ class DockerVolume(BaseModel):
     mountpoint: str = Field(alias='Mountpoint', default='')
     scope: str = Field(alias='Scope', default='local')
     usage_data: Optional[dict] = Field(alias='UsageData', default_factory=dict)
+    labels: Optional[dict[str, str]] = Field(alias='Labels', default_factory=dict)
     containers: Optional[list[str]] = Field(default_factory=list)
 
     @property
@@ -172,6 +174,18 @@ class DockerSystemDF(BaseModel):
     build_cache: DockerBuildCacheList = Field(alias='BuildCache', default_factory=lambda: DockerBuildCacheList([]))
 
 
+class BuildCacheCurve(BaseModel):
+    last_scan: datetime
+    records: int  # number of build cache records
+    total: int  # bytes of all build cache records
+    in_use: int  # bytes of the records in use, never pruned
+    shared: int  # bytes of the unused records shared with other records, pruning them frees nothing
+    ages: list[int]  # `--filter until=` values (in seconds)
+    freed_by_age: list[int]  # bytes freed for each age
+    limits: list[int]  # `--keep-storage` values (in bytes)
+    freed_by_limit: list[int]  # bytes freed for each limit
+
+
 class DockerMount(BaseModel):
     source: str = Field(alias='Source')
     destination: str = Field(alias='Destination')
@@ -202,8 +216,12 @@ class DockerContainerLog(BaseModel):
     id: str  # short ID of the container
     name: str  # name of the container
     image: str  # image of the container
-    path: str  # path to the log file
-    size: int  # size of the log file in bytes
+    path: str  # path to the live log file
+    size: int  # size of all the log files in bytes
+    live: int = 0  # size of the live log file in bytes
+    rotated: int = 0  # size of the rotated log files in bytes
+    compressed: int = 0  # size of the compressed rotated log files in bytes
+    files: int = 1  # number of log files
     last_scan: datetime  # timestamp of the last scan
 
     @property
@@ -211,20 +229,177 @@ class DockerContainerLog(BaseModel):
         return self.path[:39] + '...' + self.path[-9:]
 
 
-class DockerBindMounts(BaseModel):
+class LogGrowth(BaseModel):
+    id: str  # short ID of the container
+    name: str  # name of the container
+    path: str  # path to the live log file
+    size: int  # size of the live log file in bytes
+    rate: float  # EWMA of the bytes written per second
+    history: list[float]  # last rates between samples in bytes per second, oldest first
+
+    @property
+    def pretty_rate(self) -> str:
+        return f'{pretty_size(round(self.rate))}/s'
+
+
+class LogGrowthReport(BaseModel):
+    last_update: datetime
+    interval: int  # seconds between samples
+    containers: int  # number of log files tracked
+    top: list[LogGrowth]  # fastest growing log files first
+
+
+class LogHeatmap(BaseModel):
+    since: datetime
+    until: datetime
+    bucket: int  # seconds per bucket
+    total: int  # bytes written between since and until
+    buckets: list[int]  # bytes written per bucket, oldest first
+
+
+class DockerDeletedFile(BaseModel):
+    path: str  # path of the file before it was deleted, as seen by the process
+    size: int  # disk space held by the file in bytes
+    apparent_size: int  # size of the file in bytes, larger than the disk space if it's sparse
+    pids: list[int]  # processes holding the file open
+    process: str  # command name of the first process
+    container_id: str | None = None  # short ID of the container of the first process, None for the host
+    container: str | None = None  # name of the container
+    last_scan: datetime  # timestamp of the last scan
+
+    @property
+    def short_path(self) -> str:
+        return self.path if len(self.path) <= 51 else self.path[:39] + '...' + self.path[-9:]
+
+
+class ReclaimableSpace(BaseModel):
+    action: str  # cleanup action, e.g. `dangling_images`
+    description: str
+    items: int  # number of items removed by the action
+    size: int  # bytes freed by the action on its own
+    exclusive: int  # bytes freed that no action listed before frees, they add up to the total
+    updated: datetime = Field(default_factory=lambda: datetime.now(UTC))  # when the bytes last changed
+
+    @property
+    def pretty_size(self) -> str:
+        return pretty_size(self.size)
+
+
+class UsageRollup(BaseModel):
+    label: str  # container label the entities are grouped by, e.g. `com.docker.compose.project`
+    value: str  # value of the label, empty without the label, `*` for entities used by several groups
+    containers: int  # number of containers
+    images: int  # unshared bytes of the images used only by the group
+    writable: int  # bytes of the writable layers of the containers
+    volumes: int  # bytes of the volumes
+    bind_mounts: int  # bytes of the bind mounts
+    logs: int  # bytes of the log files
+    total: int
+    updated: datetime = Field(default_factory=lambda: datetime.now(UTC))  # when the bytes last changed
+
+    @property
+    def key(self) -> str:
+        return f'{self.label}={self.value}'
+
+    @property
+    def pretty_total(self) -> str:
+        return pretty_size(self.total)
+
+
+class ContainerFootprint(BaseModel):
+    id: str  # short ID
+    name: str
+    image: str
+    state: str
+    images: int  # unshared bytes of the image, if no other container uses it
+    writable: int  # bytes of the writable layer
+    logs: int  # bytes of the log files
+    volumes: int  # bytes of the named volumes used only by this container
+    bind_mounts: int  # bytes of the bind mounts used only by this container
+    shared: int  # bytes of the image, volumes and bind mounts also used by other containers
+    total: int  # bytes freed by removing the container with everything only it uses
+    updated: datetime = Field(default_factory=lambda: datetime.now(UTC))  # when the bytes last changed
+
+    @property
+    def pretty_total(self) -> str:
+        return pretty_size(self.total)
+
+    @property
+    def pretty_shared(self) -> str:
+        return pretty_size(self.shared)
+
+
+class TopEntry(BaseModel):
+    category: str  # images, containers, volumes, bind_mounts, logs, overlay2 or build_cache
+    id: str  # short ID, volume name or path
+    name: str
+    size: int
+
+    @property
+    def pretty_size(self) -> str:
+        return pretty_size(self.size)
+
+
+class EntryCounts(BaseModel):
+    files: int = 0  # number of regular files (only counted by the walker, not by du)
+    dirs: int = 0  # number of directories
+    symlinks: int = 0  # number of symbolic links
+    others: int = 0  # number of other entries: sockets, fifos, devices
+
+    @property
+    def entries(self) -> int:
+        return self.files + self.dirs + self.symlinks + self.others
+
+
+class DockerBindMounts(EntryCounts):
     path: str  # path to the bind mount directory
     err: bool  # flag to indicate an error during scanning
     size: int  # size of the bind mount directory in bytes
     scan_in_progress: bool  # flag to indicate that the scan is in progress
     last_scan: datetime  # timestamp of the last scan
     containers: list[str]  # list of containers using the bind mount
+    estimated: bool = False  # flag to indicate that the size is a sampling estimate
+    size_error: int = 0  # half-width of the 95% confidence interval of the estimated size in bytes
+    calibration: float = 1.0  # correction factor applied to the estimate, 1.0 unless significant
+    calibration_ratios: list[float] = Field(default_factory=list)  # exact size / raw estimate of the last exact scans
+    last_exact_scan: datetime | None = None  # timestamp of the last exact (full) scan
+    last_walk: datetime | None = None  # timestamp of the last walk, which collected the details
+    fstype: str = ''  # type of the filesystem backing the bind mount, e.g. ext4, nfs4
+    strategy: str = ''  # scan strategy used for the bind mount (see settings.ScanStrategy)
+    other_device_size: int = 0  # bytes of other filesystems mounted inside the bind mount (not included in size)
+    other_devices: list[str] = Field(default_factory=list)  # host paths of the other filesystems mounted inside
+    ignored: bool = False  # flag to indicate that the bind mount matches an ignore pattern (size is unknown)
+    ignored_paths: int = 0  # number of ignored paths inside the bind mount (their size is unknown)
+    backend: str = ''  # scan backend used for the bind mount: du, walk or parallel
+    backend_reason: str = ''  # why the backend was chosen
+    cold: bool = False  # flag to indicate that the scan was skipped as nothing was modified recently
 
     @property
     def last_scan_delta(self) -> str:
         return naturaltime(self.last_scan)
 
+    @property
+    def pretty_size_error(self) -> str:
+        return pretty_size(self.size_error)
+
+    @property
+    def pretty_other_device_size(self) -> str:
+        return pretty_size(self.other_device_size)
+
+
+class ScanThroughput(BaseModel):
+    bytes_per_sec: float  # bytes counted per second of scanning
+    files_per_sec: float  # files counted per second of scanning (for du, based on the last walk)
+    measured_at: datetime  # timestamp of the measurement
+
+
+class ScanStats(BaseModel):
+    path: str  # host path of the scanned directory
+    files: int = 0  # number of files found by the last walk
+    backends: dict[str, ScanThroughput] = Field(default_factory=dict)  # throughput by scan backend
+
 
-class DockerOverlay2Layer(BaseModel):
+class DockerOverlay2Layer(EntryCounts):
     id: str  # ID of the overlay2 layer
     created: datetime  # timestamp of the layer creation
     diff_root: str  # diff directory content
@@ -247,11 +422,129 @@ class DockerOverlay2Layer(BaseModel):
         return naturaltime(self.last_scan)
 
 
+class LargestEntry(BaseModel):
+    path: str  # path relative to the root of the scanned item
+    size: int  # size in bytes (of the whole subtree for directories)
+
+    @property
+    def pretty_size(self) -> str:
+        return pretty_size(self.size)
+
+
+class UsageBucket(BaseModel):
+    key: str  # e.g. file extension, file type or owner uid; `other` for the keys over the limit
+    size: int  # bytes of the files in the bucket
+    files: int  # number of files in the bucket
+    error: int = 0  # bytes of other keys possibly counted in the bucket (keys evicted from the counter)
+
+    @property
+    def pretty_size(self) -> str:
+        return pretty_size(self.size)
+
+
+class AgeHistogram(BaseModel):
+    buckets: list[str]  # names of the age buckets, e.g. <1d, <7d, ..., older
+    mtime: list[int]  # bytes by the age of the last modification, one value per bucket
+    atime: list[int]  # bytes by the age of the last access, one value per bucket
+
+
+class CodecRatio(BaseModel):
+    codec: str
+    ratio: float  # original bytes / compressed bytes
+    low: float  # 95% confidence interval of the ratio
+    high: float
+    savings: int  # estimated bytes saved by compressing, negative if the data grows
+
+
+class CompressionEstimate(BaseModel):
+    size: int  # bytes of the item when it was sampled, the estimate is kept while it doesn't change
+    last_scan: datetime  # timestamp of the walk the estimate was made after
+    samples: int  # number of blocks compressed
+    sampled_bytes: int
+    codecs: list[CodecRatio] = Field(default_factory=list)
+
+
+class ScanDetails(BaseModel):
+    key: str  # key of the scanned item: bind mount path, volume name or overlay2 layer ID
+    last_scan: datetime  # timestamp of the walk the details were collected by
+    largest_files: list[LargestEntry] = Field(default_factory=list)  # largest first
+    largest_dirs: list[LargestEntry] = Field(default_factory=list)  # by bytes of the subtree, largest first
+    by_extension: list[UsageBucket] = Field(default_factory=list)  # largest first, `other` last
+    by_type: list[UsageBucket] = Field(default_factory=list)  # coarse file types: log, database, image, ...
+    by_uid: list[UsageBucket] = Field(default_factory=list)  # owner uid on the host
+    age: AgeHistogram | None = None  # bytes by the age of files
+    counts: EntryCounts | None = None  # number of entries by type
+    compression: CompressionEstimate | None = None  # estimated compressibility of the files
+
+
+class DockerSizeTree(BaseModel):
+    key: str  # host path of the bind mount
+    last_scan: datetime  # timestamp of the walk the tree was collected by
+    depth: int  # all directories down to this depth are in the tree, deeper ones only if they are large
+    nodes: int  # number of directories in the tree
+    # base64 encoded arrays of scan.tree.SizeTree
+    parents: str
+    offsets: str
+    sizes: str
+    names: str
+
+
+class SizeDelta(BaseModel):
+    path: str  # directory relative to the bind mount, e.g. `/data/db`
+    previous: int  # bytes of the subtree at the previous scan, 0 for a new directory
+    size: int  # bytes of the subtree now, 0 for a removed directory
+    delta: int
+    ratio: float | None = None  # delta relative to the previous bytes, None for a new directory
+
+
+class GrowthReport(BaseModel):
+    key: str  # host path of the bind mount
+    previous_scan: datetime  # timestamp of the walk compared with
+    last_scan: datetime
+    delta: int  # change of the whole bind mount
+    grown: list[SizeDelta] = Field(default_factory=list)  # largest growth first
+    shrunk: list[SizeDelta] = Field(default_factory=list)  # largest shrinkage first
+    grown_relative: list[SizeDelta] = Field(default_factory=list)  # largest relative growth first
+    shrunk_relative: list[SizeDelta] = Field(default_factory=list)  # largest relative shrinkage first
+
+
+class FileHash(BaseModel):
+    partial: str | None = None  # hash of the first and last blocks
+    full: str | None = None  # hash of the whole file
+
+
+class DuplicateSet(BaseModel):
+    size: int  # bytes of each copy
+    digest: str
+    paths: list[str]  # host paths of the copies
+    reclaimable: int  # bytes freed by keeping a single copy
+
+
+class DedupFiles(BaseModel):
+    key: str  # host path of the bind mount or volume the files were found in
+    last_scan: datetime  # timestamp of the walk the files were found by
+    files: list[tuple[str, str, int, int, int, int]]  # path, host path, dev, ino, mtime_ns, size
+
+
+class DedupReport(BaseModel):
+    last_scan: datetime
+    files: int  # number of files large enough to be searched
+    hashed: int  # number of files read (not in the hash cache)
+    hashed_bytes: int  # bytes read to hash them
+    duplicate_sets: int  # number of sets of identical files
+    reclaimable: int  # bytes freed by keeping a single copy of every set
+    sets: list[DuplicateSet] = Field(default_factory=list)  # most reclaimable first, capped
+
+
 class DiskUsage(BaseModel):
     total: int
     used: int
     free: int
     percent: float
+    inodes_total: int = 0  # 0 if the filesystem has no fixed number of inodes, e.g. btrfs
+    inodes_used: int = 0
+    inodes_free: int = 0
+    inodes_percent: float = 0
 
     @property
     def pretty_total(self) -> str:
@@ -0,0 +1,449 @@
+import bisect
+import heapq
+import lzma
+import os
+import random
+import time
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import settings
+from contrib.types import (
+    AgeHistogram,
+    CodecRatio,
+    CompressionEstimate,
+    LargestEntry,
+    ScanDetails,
+    UsageBucket,
+)
+from scan.estimate import Z_95
+from scan.walker import Collector, cpu_throttling
+
+
+class DetailsCollector(Collector):
+    """
+    Collector whose result is persisted with the scanned item.
+    """
+
+    def save(self, details: ScanDetails) -> None:
+        """Store the collected details."""
+        raise NotImplementedError
+
+
+class LargestCollector(DetailsCollector):
+    """
+    Keeps the K largest files and the K largest directories (by subtree bytes) of a walk.
+    Two bounded min-heaps hold the candidates, so the memory used is O(K) whatever the size of the tree.
+    Paths are stored relative to the root of the walk, e.g. `/data/backup.tar`.
+    """
+
+    def __init__(self, root: str, k: int):
+        self.root = root.rstrip('/')
+        self.k = k
+        self.files: list[tuple[int, str]] = []  # min-heap of (size, path)
+        self.dirs: list[tuple[int, str]] = []
+
+    def _push(self, heap: list[tuple[int, str]], size: int, path: str):
+        if len(heap) < self.k:
+            heapq.heappush(heap, (size, path[len(self.root) :]))
+        elif size > heap[0][0]:
+            heapq.heapreplace(heap, (size, path[len(self.root) :]))
+
+    def file(self, path: str, st: os.stat_result) -> None:
+        self._push(self.files, st.st_size, path)
+
+    def directory(self, path: str, size: int) -> None:
+        if path.rstrip('/') != self.root:  # the root is the whole item
+            self._push(self.dirs, size, path)
+
+    def save(self, details: ScanDetails) -> None:
+        details.largest_files = [LargestEntry(path=path, size=size) for size, path in sorted(self.files, reverse=True)]
+        details.largest_dirs = [LargestEntry(path=path, size=size) for size, path in sorted(self.dirs, reverse=True)]
+
+
+OTHER = 'other'  # bucket of the keys over the limit
+NO_EXTENSION = '(none)'
+MAX_EXTENSION_LEN = 10  # longer suffixes are not extensions, e.g. `backup.2024-01-01T120000`
+
+# coarse classes of files by extension
+FILE_TYPES = {
+    'log': ('log', 'out', 'err', 'journal'),
+    'database': ('db', 'sqlite', 'sqlite3', 'mdb', 'ibd', 'frm', 'myd', 'myi', 'wal', 'rdb', 'aof', 'ldb', 'sst'),
+    'archive': ('gz', 'tgz', 'bz2', 'xz', 'zst', 'zip', '7z', 'rar', 'tar', 'lz4', 'dump', 'bak'),
+    'image': ('jpg', 'jpeg', 'png', 'gif', 'webp', 'heic', 'bmp', 'tif', 'tiff', 'svg', 'raw', 'dng'),
+    'video': ('mp4', 'mkv', 'avi', 'mov', 'wmv', 'webm', 'm4v', 'ts', 'mpg', 'mpeg'),
+    'audio': ('mp3', 'flac', 'wav', 'aac', 'ogg', 'm4a', 'opus'),
+    'document': ('pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'odt', 'ods', 'txt', 'md', 'csv'),
+    'disk image': ('iso', 'img', 'qcow2', 'vmdk', 'vdi', 'vhd', 'vhdx'),
+    'code': ('py', 'pyc', 'js', 'ts', 'go', 'java', 'class', 'jar', 'c', 'h', 'so', 'rb', 'php', 'rs', 'wasm'),
+}
+FILE_TYPE_BY_EXTENSION = {ext: name for name, extensions in FILE_TYPES.items() for ext in extensions}
+
+
+def file_extension(name: str) -> str:
+    """
+    Lowercase extension of a file name without the dot, `(none)` if there is no extension.
+    Numeric suffixes of rotated files are skipped, e.g. `app.log.1` is a `log` file.
+    """
+    stem, dot, ext = name.rpartition('.')
+    if ext.isdigit() and '.' in stem:
+        stem, dot, ext = stem.rpartition('.')
+    if not dot or not stem or not ext or len(ext) > MAX_EXTENSION_LEN:
+        return NO_EXTENSION  # hidden files like `.bashrc` have no extension
+    return ext.lower()
+
+
+class CappedCounter:
+    """
+    Bytes and file counts by key with a bounded number of keys, by the Space-Saving algorithm.
+    Once `capacity` keys are counted, a new key replaces the key with the fewest bytes and inherits its
+    counts, recorded as the error of the new key. A key is never undercounted and overcounted by its error
+    at most, and the counts still add up to the totals. A key holding more than `1/capacity` of the bytes
+    is always kept. The keys after the `max_keys` largest ones are reported as `other`.
+
+    The key with the fewest bytes is found by a min-heap with one entry per key. The counts only grow,
+    so an entry is a lower bound of the bytes of its key: it's updated lazily when it reaches the top.
+    """
+
+    def __init__(self, max_keys: int, capacity: int | None = None):
+        self.max_keys = max_keys
+        self.capacity = capacity or max_keys * 4
+        self.counts: dict[str, list[int]] = {}  # key -> [bytes, files, error in bytes]
+        self.heap: list[tuple[int, str]] = []  # (bytes when pushed, key)
+
+    def _evict(self) -> list[int]:
+        """Remove the key with the fewest bytes, returns its counts."""
+        while True:
+            size, key = self.heap[0]
+            count = self.counts[key]
+            if count[0] == size:
+                heapq.heappop(self.heap)
+                return self.counts.pop(key)
+            heapq.heapreplace(self.heap, (count[0], key))  # outdated entry
+
+    def add(self, key: str, size: int):
+        count = self.counts.get(key)
+        if count is None:
+            count = [0, 0, 0]
+            if len(self.counts) >= self.capacity:
+                size_, files, _ = self._evict()
+                count = [size_, files, size_]
+            self.counts[key] = count
+            heapq.heappush(self.heap, (count[0], key))
+        count[0] += size
+        count[1] += 1
+
+    def buckets(self) -> list[UsageBucket]:
+        """Buckets ordered by bytes, `other` is the last one."""
+        ranked = sorted(self.counts.items(), key=lambda item: item[1][0], reverse=True)
+        ret = [
+            UsageBucket(key=key, size=size, files=files, error=error)
+            for key, (size, files, error) in ranked[: self.max_keys]
+        ]
+        rest = [count for _, count in ranked[self.max_keys :]]
+        if rest:
+            ret.append(UsageBucket(key=OTHER, size=sum(c[0] for c in rest), files=sum(c[1] for c in rest)))
+        return ret
+
+
+class BreakdownCollector(DetailsCollector):
+    """
+    Aggregates bytes and file counts by file extension, coarse file type and owner uid.
+    """
+
+    def __init__(self, max_keys: int):
+        self.extensions = CappedCounter(max_keys)
+        self.types = CappedCounter(len(FILE_TYPES) + 1)  # every type fits, including `other`
+        self.uids = CappedCounter(max_keys)
+
+    def file(self, path: str, st: os.stat_result) -> None:
+        ext = file_extension(os.path.basename(path))
+        self.extensions.add(ext, st.st_size)
+        self.types.add(FILE_TYPE_BY_EXTENSION.get(ext, OTHER), st.st_size)
+        self.uids.add(str(st.st_uid), st.st_size)
+
+    def save(self, details: ScanDetails) -> None:
+        details.by_extension = self.extensions.buckets()
+        details.by_type = self.types.buckets()
+        details.by_uid = self.uids.buckets()
+
+
+DAY = 60 * 60 * 24
+# upper limits of the age buckets in seconds, the last bucket holds everything older
+AGE_BUCKETS = (
+    ('<1d', DAY),
+    ('<7d', 7 * DAY),
+    ('<30d', 30 * DAY),
+    ('<90d', 90 * DAY),
+    ('<1y', 365 * DAY),
+    ('older', None),
+)
+AGE_LIMITS = [limit for _, limit in AGE_BUCKETS[:-1]]
+COLD_BUCKET = 4  # data not modified for 90 days is cold
+
+
+class AgeCollector(DetailsCollector):
+    """
+    Histogram of bytes by the age of the last modification and the last access of files.
+    Access times are only as good as the mount options: with `noatime` they never change,
+    with `relatime` (the Linux default) they are updated at most once a day.
+    """
+
+    def __init__(self, now: float | None = None):
+        self.now = now if now is not None else time.time()
+        self.mtime = [0] * len(AGE_BUCKETS)
+        self.atime = [0] * len(AGE_BUCKETS)
+
+    def file(self, path: str, st: os.stat_result) -> None:
+        self.mtime[bisect.bisect_right(AGE_LIMITS, self.now - st.st_mtime)] += st.st_size
+        self.atime[bisect.bisect_right(AGE_LIMITS, self.now - st.st_atime)] += st.st_size
+
+    def save(self, details: ScanDetails) -> None:
+        details.age = AgeHistogram(buckets=[name for name, _ in AGE_BUCKETS], mtime=self.mtime, atime=self.atime)
+
+
+def is_cold(details: ScanDetails | None) -> bool:
+    """
+    Check if nothing in a scanned tree was modified recently (by the histogram of its last walk).
+    An empty tree (or one of empty files) is not cold: there is nothing to tell its age by.
+    """
+    if not details or not details.age or sum(details.age.mtime) <= 0:
+        return False
+    return not any(details.age.mtime[:COLD_BUCKET])
+
+
+COMPRESS_BLOCK_SIZE = 64 * 1024  # bytes read and compressed per sample
+ALIGNMENT = 4096
+# upper limits of the strata of file sizes, the last stratum holds the larger files
+STRATA = (COMPRESS_BLOCK_SIZE, 1024 * 1024, 16 * 1024 * 1024, 256 * 1024 * 1024)
+CODECS = {
+    'zlib': lambda data: zlib.compress(data, 6),
+    'lzma': lambda data: lzma.compress(data, preset=1),
+}
+UNKNOWN_VARIANCE = 0.25  # variance of the compressed fraction of a stratum with less than 2 samples (worst case)
+
+
+def compress_block(path: str, offset: int, sleep_duration: float) -> tuple[int, list[int]] | None:
+    """
+    Read a block of a file and compress it with every codec.
+    Returns the bytes read and the compressed bytes by codec, None if the file can't be read.
+    """
+    try:
+        with open(path, 'rb') as fd:
+            fd.seek(offset)
+            data = fd.read(COMPRESS_BLOCK_SIZE)
+    except OSError:
+        return None
+    if not data:
+        return None
+    ret = len(data), [len(compress(data)) for compress in CODECS.values()]
+    cpu_throttling(sleep_duration)
+    return ret
+
+
+class CompressionCollector(DetailsCollector):
+    """
+    Estimates how much the files of a tree would shrink if compressed, without reading all of them.
+
+    Files are stratified by size and a reservoir keeps a uniform sample of the files of every stratum.
+    After the walk, one random block of every sampled file is compressed, and the compressed fraction of
+    each stratum is a ratio estimate weighted by file sizes. The strata are combined by their bytes,
+    and the spread of the samples gives the error bounds.
+
+    The work is time-limited: blocks not compressed in time are left out, and strata without samples are
+    counted as incompressible. The estimate of the previous walk is kept while the size doesn't change.
+    Blocks are compressed by the process pool of the scan run (see `compression_pool`), or inline without one.
+    """
+
+    def __init__(
+        self,
+        samples: int,
+        executor: ProcessPoolExecutor | None,
+        time_limit: float,
+        sleep_duration: float,
+        previous: CompressionEstimate | None = None,
+        rng: random.Random | None = None,
+    ):
+        self.per_stratum = max(samples // (len(STRATA) + 1), 1)
+        self.executor = executor
+        self.time_limit = time_limit
+        self.sleep_duration = sleep_duration
+        self.previous = previous
+        self.rng = rng or random.Random()
+        self.size = 0
+        self.bytes = [0] * (len(STRATA) + 1)  # bytes of the files by stratum
+        self.seen = [0] * (len(STRATA) + 1)  # number of files by stratum
+        self.reservoirs: list[list[tuple[str, int]]] = [[] for _ in range(len(STRATA) + 1)]  # (path, size)
+
+    def file(self, path: str, st: os.stat_result) -> None:
+        if not st.st_size:
+            return
+        self.size += st.st_size
+        h = bisect.bisect_left(STRATA, st.st_size)
+        self.bytes[h] += st.st_size
+        self.seen[h] += 1
+        reservoir = self.reservoirs[h]
+        if len(reservoir) < self.per_stratum:
+            reservoir.append((path, st.st_size))
+        else:
+            i = self.rng.randrange(self.seen[h])
+            if i < self.per_stratum:
+                reservoir[i] = (path, st.st_size)
+
+    def _compress(self) -> list[list[tuple[int, int, list[int]]]]:
+        """Compress a block of every sampled file, returns (file size, bytes read, compressed bytes) by stratum."""
+        tasks = []
+        for h, reservoir in enumerate(self.reservoirs):
+            for path, size in reservoir:
+                offset = self.rng.randrange(max(size - COMPRESS_BLOCK_SIZE, 0) // ALIGNMENT + 1) * ALIGNMENT
+                tasks.append((h, path, size, offset))
+
+        results: list[list[tuple[int, int, list[int]]]] = [[] for _ in self.reservoirs]
+        deadline = time.monotonic() + self.time_limit
+        if not self.executor:
+            for h, path, size, offset in tasks:
+                if time.monotonic() > deadline:
+                    break
+                result = compress_block(path, offset, self.sleep_duration)
+                if result:
+                    results[h].append((size, *result))
+            return results
+
+        futures = {
+            self.executor.submit(compress_block, path, offset, self.sleep_duration): (h, size)
+            for h, path, size, offset in tasks
+        }
+        try:
+            for future in as_completed(futures, timeout=self.time_limit):
+                result = future.result()
+                if result:
+                    h, size = futures[future]
+                    results[h].append((size, *result))
+        except TimeoutError:
+            pass  # estimate with the blocks compressed in time
+        finally:
+            # the pool is shared by the scan run, leave it to the next item
+            for future in futures:
+                future.cancel()
+        return results
+
+    def estimate(self, last_scan: datetime) -> CompressionEstimate:
+        results = self._compress()
+        codecs = []
+        for c, name in enumerate(CODECS):
+            compressed = variance = 0.0
+            for h, stratum in enumerate(results):
+                if not self.bytes[h]:
+                    continue
+                n = len(stratum)
+                if not n:
+                    compressed += self.bytes[h]  # nothing known, counted as incompressible
+                    variance += self.bytes[h] ** 2 * UNKNOWN_VARIANCE
+                    continue
+                # ratio estimator of the compressed fraction, weighted by file sizes
+                x = [size for size, _, _ in stratum]
+                y = [size * sizes[c] / raw for size, raw, sizes in stratum]
+                r = sum(y) / sum(x)
+                compressed += self.bytes[h] * r
+                if n > 1:
+                    mean_x = sum(x) / n
+                    s2 = sum((yi - r * xi) ** 2 for xi, yi in zip(x, y)) / (n - 1)
+                    variance += self.bytes[h] ** 2 * s2 / (n * mean_x**2)
+                else:
+                    variance += self.bytes[h] ** 2 * UNKNOWN_VARIANCE
+            error = Z_95 * variance**0.5
+            codecs.append(
+                CodecRatio(
+                    codec=name,
+                    ratio=self.size / compressed if compressed else 1.0,
+                    low=self.size / (compressed + error) if compressed + error else 1.0,
+                    high=self.size / max(compressed - error, 1.0),
+                    savings=round(self.size - compressed),
+                )
+            )
+        return CompressionEstimate(
+            size=self.size,
+            last_scan=last_scan,
+            samples=sum(len(stratum) for stratum in results),
+            sampled_bytes=sum(raw for stratum in results for _, raw, _ in stratum),
+            codecs=codecs,
+        )
+
+    def save(self, details: ScanDetails) -> None:
+        if self.previous and self.previous.size == self.size:
+            details.compression = self.previous
+        elif self.size:
+            details.compression = self.estimate(details.last_scan)
+
+
+def details_enabled() -> bool:
+    """Whether any details are collected by the walker, besides the size."""
+    return bool(
+        settings.SCAN_TOP_K
+        or settings.SCAN_BREAKDOWN_KEYS
+        or settings.SCAN_AGE_HISTOGRAM
+        or settings.SCAN_COMPRESS_SAMPLES
+    )
+
+
+@contextmanager
+def compression_pool() -> Iterator[ProcessPoolExecutor | None]:
+    """
+    The process pool compressing the sampled blocks of all the items of a scan run.
+    None if the compression estimates are disabled or done in the scanner process.
+    """
+    if not settings.SCAN_COMPRESS_SAMPLES or not settings.SCAN_COMPRESS_WORKERS:
+        yield None
+        return
+    executor = ProcessPoolExecutor(max_workers=settings.SCAN_COMPRESS_WORKERS)
+    try:
+        yield executor
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def details_collectors(
+    root: Path,
+    compression: CompressionEstimate | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> tuple[DetailsCollector, ...]:
+    """
+    Create the collectors of the details of an item scanned by the walker.
+    The compression estimate of the previous walk is reused if the size of the item didn't change,
+    the sampled blocks are compressed by the pool of the scan run.
+    """
+    collectors = []
+    if settings.SCAN_TOP_K:
+        collectors.append(LargestCollector(str(root), settings.SCAN_TOP_K))
+    if settings.SCAN_BREAKDOWN_KEYS:
+        collectors.append(BreakdownCollector(settings.SCAN_BREAKDOWN_KEYS))
+    if settings.SCAN_AGE_HISTOGRAM:
+        collectors.append(AgeCollector())
+    if settings.SCAN_COMPRESS_SAMPLES:
+        collectors.append(compression_collector(compression, pool))
+    return tuple(collectors)
+
+
+def compression_collector(
+    compression: CompressionEstimate | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> CompressionCollector:
+    """Create the collector of the compression estimate of an item, with the settings of the scan."""
+    return CompressionCollector(
+        settings.SCAN_COMPRESS_SAMPLES,
+        executor=pool,
+        time_limit=settings.SCAN_COMPRESS_TIME_LIMIT,
+        sleep_duration=settings.SCAN_SLEEP_DURATION,
+        previous=compression,
+    )
+
+
+def collect_details(key: str, last_scan: datetime, collectors: tuple[DetailsCollector, ...]) -> ScanDetails:
+    details = ScanDetails(key=key, last_scan=last_scan)
+    for collector in collectors:
+        collector.save(details)
+    return details
@@ -0,0 +1,207 @@
+import hashlib
+import os
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from typing import NamedTuple
+
+from contrib.types import DedupFiles, DedupReport, DuplicateSet, FileHash
+from scan.walker import Collector, cpu_throttling
+
+
+BLOCK_SIZE = 64 * 1024  # size of the first and last blocks hashed to tell apart files of the same size
+CHUNK_SIZE = 1024 * 1024  # read size when hashing whole files
+MAX_SETS = 100  # number of duplicate sets kept in the report
+
+
+class FileRef(NamedTuple):
+    path: str  # path inside the Doku container, to read the file
+    host_path: str
+    dev: int
+    ino: int
+    mtime_ns: int
+    size: int
+
+    @property
+    def cache_key(self) -> str:
+        """A file with the same key has the same content, so its hashes are cached by it."""
+        return f'{self.dev}:{self.ino}:{self.mtime_ns}:{self.size}'
+
+
+class SizeGroupCollector(Collector):
+    """
+    Groups the files of one or more walks by size, files of different sizes can't be duplicates.
+    Hard links of the same inode are the same file, only the first one found is kept.
+    The bind mounts and volumes scanners save the files of each walk, the dedup scanner loads them all.
+    """
+
+    def __init__(self, min_size: int, root: str = '', host_root: str = ''):
+        self.min_size = max(min_size, 1)  # empty files are all identical, but free nothing
+        self.groups: dict[int, dict[tuple[int, int], FileRef]] = defaultdict(dict)  # size -> (dev, ino) -> file
+        self.files = 0
+        self.start(root, host_root)
+
+    def start(self, root: str, host_root: str):
+        """Set the root of the next walk, and the host path it's mapped to."""
+        self.root = root.rstrip('/')
+        self.host_root = host_root.rstrip('/')
+
+    def add(self, ref: FileRef):
+        if ref.size < self.min_size:
+            return
+        group = self.groups[ref.size]
+        if (ref.dev, ref.ino) not in group:
+            group[ref.dev, ref.ino] = ref
+            self.files += 1
+
+    def file(self, path: str, st: os.stat_result) -> None:
+        if st.st_size >= self.min_size:
+            host_path = self.host_root + path[len(self.root) :]
+            self.add(FileRef(path, host_path, st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size))
+
+    def save(self, key: str, last_scan: datetime) -> DedupFiles:
+        """The files found by the walks, to be searched for duplicates later."""
+        return DedupFiles(
+            key=key,
+            last_scan=last_scan,
+            files=[tuple(ref) for group in self.groups.values() for ref in group.values()],
+        )
+
+    def load(self, files: DedupFiles):
+        """Add the files saved by another walk."""
+        for item in files.files:
+            self.add(FileRef(*item))
+
+    def candidates(self) -> list[list[FileRef]]:
+        """Groups of files of the same size."""
+        return [list(group.values()) for group in self.groups.values() if len(group) > 1]
+
+
+def hash_file(path: str, size: int, partial: bool, sleep_duration: float) -> str | None:
+    """
+    Hash the first and last blocks of a file, or the whole file. None if the file can't be read.
+    Runs in the worker processes, throttled like the scanners.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, 'rb') as fd:
+            if partial:
+                h.update(fd.read(BLOCK_SIZE))
+                if size > BLOCK_SIZE:
+                    fd.seek(max(size - BLOCK_SIZE, BLOCK_SIZE))
+                    h.update(fd.read(BLOCK_SIZE))
+            else:
+                while chunk := fd.read(CHUNK_SIZE):
+                    h.update(chunk)
+                    cpu_throttling(sleep_duration)
+    except OSError:
+        return None
+    cpu_throttling(sleep_duration)
+    return h.hexdigest()
+
+
+class DedupFinder:
+    """
+    Finds identical files in staged passes, each one only reading the files still colliding after the previous:
+    files are grouped by size (by the walk), then by the hash of their first and last blocks, and only then
+    by the hash of their whole content. Files not larger than two blocks are fully read by the partial hash.
+    Hashes are cached by (dev, ino, mtime, size): a later run only reads new and modified files.
+    """
+
+    def __init__(
+        self,
+        cache: dict[str, FileHash],
+        workers: int,
+        sleep_duration: float,
+        is_stop: Callable[[], bool],
+    ):
+        self.cache = cache
+        self.used: dict[str, FileHash] = {}  # cache entries of the files seen by this run
+        self.workers = workers
+        self.sleep_duration = sleep_duration
+        self.is_stop = is_stop
+        self.hashed = 0
+        self.hashed_bytes = 0
+
+    def _hash(self, executor: ProcessPoolExecutor | None, files: list[FileRef], partial: bool) -> dict[FileRef, str]:
+        field = 'partial' if partial else 'full'
+        ret: dict[FileRef, str] = {}
+        todo = []
+        for ref in files:
+            cached = self.used.get(ref.cache_key) or self.cache.get(ref.cache_key) or FileHash()
+            self.used[ref.cache_key] = cached
+            if getattr(cached, field):
+                ret[ref] = getattr(cached, field)
+            else:
+                todo.append(ref)
+
+        paths = [ref.path for ref in todo]
+        sizes = [ref.size for ref in todo]
+        args = (paths, sizes, repeat(partial), repeat(self.sleep_duration))
+        results: Iterable[str | None] = (
+            executor.map(hash_file, *args, chunksize=8) if executor else map(hash_file, *args)
+        )
+        for ref, digest in zip(todo, results):
+            if self.is_stop():
+                break
+            self.hashed += 1
+            self.hashed_bytes += min(ref.size, 2 * BLOCK_SIZE) if partial else ref.size
+            if digest is not None:
+                setattr(self.used[ref.cache_key], field, digest)
+                ret[ref] = digest
+        return ret
+
+    @staticmethod
+    def _collisions(digests: dict[FileRef, str]) -> list[list[FileRef]]:
+        groups: dict[tuple[int, str], list[FileRef]] = defaultdict(list)
+        for ref, digest in digests.items():
+            groups[ref.size, digest].append(ref)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def find(self, candidates: list[list[FileRef]]) -> list[tuple[str, list[FileRef]]]:
+        """Sets of identical files with their digest."""
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers else None
+        try:
+            files = [ref for group in candidates for ref in group]
+            partial = self._collisions(self._hash(executor, files, partial=True))
+            if self.is_stop():
+                return []
+
+            ret = []
+            large = []
+            for group in partial:
+                if group[0].size <= 2 * BLOCK_SIZE:
+                    ret.append((self.used[group[0].cache_key].partial, group))  # fully read already
+                else:
+                    large += group
+            full = self._hash(executor, large, partial=False)
+            if self.is_stop():
+                return []
+            ret += [(full[group[0]], group) for group in self._collisions(full)]
+            return ret
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def report(self, last_scan: datetime, files: int, sets: list[tuple[str, list[FileRef]]]) -> DedupReport:
+        duplicates = [
+            DuplicateSet(
+                size=group[0].size,
+                digest=digest,
+                paths=sorted(ref.host_path for ref in group),
+                reclaimable=group[0].size * (len(group) - 1),
+            )
+            for digest, group in sets
+        ]
+        duplicates.sort(key=lambda item: item.reclaimable, reverse=True)
+        return DedupReport(
+            last_scan=last_scan,
+            files=files,
+            hashed=self.hashed,
+            hashed_bytes=self.hashed_bytes,
+            duplicate_sets=len(duplicates),
+            reclaimable=sum(item.reclaimable for item in duplicates),
+            sets=duplicates[:MAX_SETS],
+        )
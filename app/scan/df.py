@@ -1,20 +1,21 @@
+import threading
 import time
 
 import schedule
 
 import settings
-from scan.scanner import SystemDFScanner, LogfilesScanner
+from scan.scanner import SystemDFScanner, LogfilesScanner, LogRateScanner, DeletedFilesScanner
 from contrib.signal import SignalHandler
 from contrib.logger import setup_logger
 
 
 def main():
     """
-    DF scanner monitors disk space usage for Docker containers and log files.
+    DF scanner monitors disk space usage for Docker containers, log files and deleted files held open.
     """
     signal_ = SignalHandler()
     logger = setup_logger()
-    logger.info('DF scanner started (system df + logfiles).')
+    logger.info('DF scanner started (system df + logfiles + deleted files).')
 
     # make sure the database file exists
     settings.DB_DF.parent.mkdir(parents=True, exist_ok=True)
@@ -29,11 +30,23 @@ def main():
     scanner.scan()  # run once immediately
     schedule.every(settings.SCAN_LOGFILE_INTERVAL).seconds.do(scanner.scan)
 
+    ### Log Growth Rate Monitor ###
+    # in its own thread, the scanners of the main loop would delay the samples by minutes
+    scanner = LogRateScanner(is_stop=signal_.is_stop)
+    monitor = threading.Thread(target=scanner.run, name='log-rate-monitor', daemon=True)
+    monitor.start()
+
+    ### Deleted Files Scanner ###
+    scanner = DeletedFilesScanner(is_stop=signal_.is_stop)
+    scanner.scan()  # run once immediately
+    schedule.every(settings.SCAN_DELETED_FILES_INTERVAL).seconds.do(scanner.scan)
+
     # main loop
     while not signal_.is_stop():
         schedule.run_pending()
         time.sleep(1)
 
+    monitor.join()
     logger.info('DF scanner stopped.')
 
 
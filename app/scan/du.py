@@ -3,18 +3,18 @@ import time
 import schedule
 
 import settings
-from scan.scanner import BindMountsScanner, Overlay2Scanner
+from scan.scanner import BindMountsScanner, DedupScanner, Overlay2Scanner, VolumesScanner
 from contrib.signal import SignalHandler
 from contrib.logger import setup_logger
 
 
 def main():
     """
-    DU scanner monitors disk space usage for Docker bind mounts and Docker overlay2 directory.
+    DU scanner monitors disk space usage for Docker bind mounts, volumes and Docker overlay2 directory.
     """
     signal_ = SignalHandler()
     logger = setup_logger()
-    logger.info('DU scanner started (bind mounts + overlay2).')
+    logger.info('DU scanner started (bind mounts + volumes + overlay2).')
 
     # make sure the database file exists
     settings.DB_DU.parent.mkdir(parents=True, exist_ok=True)
@@ -23,6 +23,17 @@ def main():
     scanner = BindMountsScanner(is_stop=signal_.is_stop)
     scanner.scan()  # run once immediately
     schedule.every(settings.SCAN_BINDMOUNTS_INTERVAL).seconds.do(scanner.scan)
+    # estimated bind mounts (by pattern or filesystem policy) are rarely scanned exactly to recalibrate
+    # the estimates, nothing is done if there are none
+    schedule.every(settings.SCAN_BINDMOUNTS_EXACT_INTERVAL).seconds.do(scanner.recalibrate)
+
+    ### Docker Volumes Scanner ###
+    if settings.DISABLE_VOLUMES_SCAN:
+        logger.warning('Volumes scanner disabled.')
+    else:
+        scanner = VolumesScanner(is_stop=signal_.is_stop)
+        scanner.scan()  # run once immediately
+        schedule.every(settings.SCAN_VOLUMES_INTERVAL).seconds.do(scanner.scan)
 
     ### Docker Overlay2 Scanner ###
     if settings.DISABLE_OVERLAY2_SCAN:
@@ -32,6 +43,14 @@ def main():
         scanner.scan()  # run once immediately
         schedule.every(settings.SCAN_OVERLAY2_INTERVAL).seconds.do(scanner.scan)
 
+    ### Duplicate Files Scanner ###
+    if settings.DISABLE_DEDUP_SCAN:
+        logger.warning('Duplicate files scanner disabled.')
+    else:
+        scanner = DedupScanner(is_stop=signal_.is_stop)
+        # not run at startup, reading files takes much longer than the scans above
+        schedule.every(settings.SCAN_DEDUP_INTERVAL).seconds.do(scanner.scan)
+
     # main loop
     while not signal_.is_stop():
         schedule.run_pending()
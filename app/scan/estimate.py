@@ -0,0 +1,128 @@
+import os
+import random
+import statistics
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+
+from scan.ignore import IgnoreMatcher
+from scan.walker import cpu_throttling
+
+
+Z_95 = 1.96  # z-score of the 95% confidence interval
+MIN_CALIBRATION_SCANS = 3  # exact scans needed before the estimates are corrected
+CALIBRATION_HISTORY = 8  # ratios of the exact size to the raw estimate kept
+
+
+class SizeEstimate(NamedTuple):
+    size: int  # estimated size in bytes
+    error: int  # half-width of the 95% confidence interval in bytes
+    probes: int  # number of probes actually taken
+
+
+def _list_dir(path: str, root_dev: int, sleep_duration: float, ignore: IgnoreMatcher | None) -> tuple[int, list[str]]:
+    """
+    Return the total size of the regular files in a directory and the list of its subdirectories.
+    Subdirectories on other devices than root_dev and ignored entries are left out.
+    """
+    files_size = 0
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if ignore and ignore(entry.path, entry.is_dir(follow_symlinks=False)):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.stat(follow_symlinks=False).st_dev == root_dev:
+                            subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files_size += entry.stat(follow_symlinks=False).st_size
+                        cpu_throttling(sleep_duration)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files_size, subdirs
+
+
+def estimate_size(
+    path: Path,
+    /,
+    probes: int,
+    sleep_duration: float,
+    is_stop: Callable[[], bool],
+    rng: random.Random | None = None,
+    ignore: IgnoreMatcher | None = None,
+) -> SizeEstimate:
+    """
+    Estimate disk usage of a directory tree without walking all of it.
+
+    Uses Knuth's random probe estimator: every probe descends from the root to a leaf, choosing
+    a random subdirectory at each depth. The bytes of the files found at depth d, multiplied by
+    the product of branching factors along the path, is an unbiased estimate of the bytes at that
+    depth. The mean over all probes is the size estimate, their spread gives the confidence interval.
+
+    Args:
+        path: Directory to estimate size for
+        probes: Number of root-to-leaf probes
+        sleep_duration: Duration to sleep for every 100 files processed
+        is_stop: Callable to check if the process should stop
+        rng: Random number generator (for reproducible estimates)
+        ignore: Matcher of the paths to skip (ignore files are not read)
+    """
+    rng = rng or random.Random()
+    try:
+        root_dev = path.stat().st_dev
+    except OSError:
+        return SizeEstimate(size=0, error=0, probes=0)
+
+    listings: dict[str, tuple[int, list[str]]] = {}  # directories near the root are visited by most probes
+    samples = []
+
+    for _ in range(probes):
+        if is_stop():
+            break
+
+        sample = 0
+        weight = 1
+        node = str(path)
+        while True:
+            if node not in listings:
+                listings[node] = _list_dir(node, root_dev, sleep_duration, ignore)
+            files_size, subdirs = listings[node]
+            sample += weight * files_size
+            if not subdirs:
+                break
+            weight *= len(subdirs)
+            node = rng.choice(subdirs)
+
+        samples.append(sample)
+
+    if not samples:
+        return SizeEstimate(size=0, error=0, probes=0)
+
+    mean = statistics.fmean(samples)
+    error = 0.0
+    if len(samples) > 1:
+        error = Z_95 * statistics.stdev(samples) / len(samples) ** 0.5
+    return SizeEstimate(size=round(mean), error=round(error), probes=len(samples))
+
+
+def calibration(ratios: list[float]) -> tuple[float, float]:
+    """
+    Correction factor of the estimates and the half-width of its 95% confidence interval, from the ratios
+    of the exact size to the raw estimate measured at the last exact scans.
+
+    The estimator is unbiased, so a single ratio is mostly the noise of one estimate, and multiplying
+    later (independent) estimates by it only adds that noise. The mean ratio is applied once there are
+    enough of them and it differs from 1 significantly, e.g. when some files are out of reach of the probes.
+    Otherwise the estimates are taken as they are: `(1.0, 0.0)`.
+    """
+    if len(ratios) < MIN_CALIBRATION_SCANS:
+        return 1.0, 0.0
+    mean = statistics.fmean(ratios)
+    error = Z_95 * statistics.stdev(ratios) / len(ratios) ** 0.5
+    if abs(mean - 1) <= error:
+        return 1.0, 0.0
+    return mean, error
@@ -0,0 +1,168 @@
+import fnmatch
+import re
+from pathlib import Path
+
+
+IGNORE_FILE = '.dokuignore'
+
+
+def compile_patterns(patterns: list[str]) -> re.Pattern | None:
+    """
+    Compile fnmatch patterns into a single regular expression (None if there are no patterns).
+    """
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{fnmatch.translate(pattern)})' for pattern in patterns))
+
+
+def _translate_gitignore(pattern: str) -> str:
+    """
+    Translate a gitignore glob into a regular expression matching a relative path.
+    `*` and `?` don't match `/`, `**` matches any number of directories.
+    """
+    i, n = 0, len(pattern)
+    res = []
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            res.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            res.append('.*')
+            i += 2
+        elif c == '*':
+            res.append('[^/]*')
+            i += 1
+        elif c == '?':
+            res.append('[^/]')
+            i += 1
+        elif c == '[':
+            j = pattern.find(']', i + 2)
+            if j == -1:
+                res.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1 : j].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                res.append(f'[{body}]')
+                i = j + 1
+        elif c == '\\' and i + 1 < n:
+            res.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            res.append(re.escape(c))
+            i += 1
+    return ''.join(res)
+
+
+class IgnoreRules:
+    """
+    Rules of one ignore file, with gitignore semantics. They apply to the paths below the
+    directory of the file. The last matching rule wins, `!` re-includes a path.
+    """
+
+    def __init__(self, base: str, lines: list[str]):
+        self.base = base.rstrip('/') + '/'
+        self.rules: list[tuple[re.Pattern, bool, bool]] = []  # regex, negate, directories only
+
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+
+            # trailing spaces are ignored unless escaped
+            if not line.endswith('\\ '):
+                line = line.rstrip()
+
+            negate = line.startswith('!')
+            if negate or line.startswith('\\!') or line.startswith('\\#'):
+                line = line[1:]
+
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+
+            # a pattern with a slash is relative to the base, otherwise it matches at any depth
+            anchored = '/' in line
+            body = _translate_gitignore(line.lstrip('/'))
+            regex = re.compile(body + r'\Z' if anchored else r'(?:.*/)?' + body + r'\Z', re.DOTALL)
+            self.rules.append((regex, negate, dir_only))
+
+    @classmethod
+    def load(cls, dir_path: str) -> 'IgnoreRules | None':
+        try:
+            with open(Path(dir_path) / IGNORE_FILE, encoding='utf-8', errors='replace') as fd:
+                return cls(dir_path, fd.readlines())
+        except OSError:
+            return None
+
+    def match(self, path: str, is_dir: bool) -> bool | None:
+        """
+        Return True if the path is ignored, False if it's re-included and None if no rule matches.
+        """
+        if not path.startswith(self.base):
+            return None
+
+        rel = path[len(self.base) :]
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                return not negate
+        return None
+
+
+class IgnoreMatcher:
+    """
+    Decides which paths are skipped by a walk: paths matching the global ignore patterns
+    (compiled into one regex) and paths excluded by ignore files found in the scanned tree.
+
+    The walk runs on paths inside the Doku container, but the global patterns are written for host
+    paths, so walked paths are translated back to the host with the root/host_root prefixes.
+    """
+
+    def __init__(self, patterns: list[str], root: str = '', host_root: str = '', ignore_files: bool = True):
+        self.patterns = patterns
+        self.regex = compile_patterns(patterns)
+        self.root = root.rstrip('/')
+        self.host_root = host_root.rstrip('/')
+        self.ignore_files = ignore_files
+
+    def host_path(self, path: str) -> str:
+        if self.root and path.startswith(self.root):
+            return self.host_root + path[len(self.root) :]
+        return path
+
+    def du_exclude(self) -> list[str]:
+        """
+        Translate the global patterns for `du --exclude`, which matches the paths inside the Doku container.
+        Absolute patterns are only kept if they point inside the scanned tree. Ignore files are not supported by `du`.
+        """
+        ret = []
+        for pattern in self.patterns:
+            if self.root and pattern.startswith(self.host_root + '/'):
+                ret.append(self.root + pattern[len(self.host_root) :])
+            elif not pattern.startswith('/'):
+                ret.append(pattern)
+        return ret
+
+    def load(self, dir_path: str) -> IgnoreRules | None:
+        if not self.ignore_files:
+            return None
+        return IgnoreRules.load(dir_path)
+
+    def __call__(self, path: str, is_dir: bool, rules: tuple[IgnoreRules, ...] = ()) -> bool:
+        if self.regex:
+            host_path = self.host_path(path)
+            # a directory also matches as a prefix, e.g. `*/.git/*` prunes the `.git` directory itself
+            if self.regex.match(host_path) or (is_dir and self.regex.match(host_path + '/')):
+                return True
+
+        ignored = False
+        for ruleset in rules:  # deeper ignore files override the upper ones
+            res = ruleset.match(path, is_dir)
+            if res is not None:
+                ignored = res
+        return ignored
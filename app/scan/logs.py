@@ -0,0 +1,573 @@
+import gzip
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Generator, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+import anyio
+
+
+LOCAL_LOGS_DIR = 'local-logs'  # directory of the `local` logging driver, inside the container directory
+LOCAL_LOG = 'container.log'
+COMPRESSED = '.gz'  # suffix of rotated segments with `compress=true`
+HISTORY = 60  # number of rates kept per log file
+MAX_MISSED = 3  # samples a container is missing from before its rate is forgotten
+BLOCK_SIZE = 64 * 1024  # read size when tailing log files
+FOLLOW_POLL = 0.5  # seconds between checks for new lines when following a log file
+FOLLOW_IDLE = 15.0  # seconds without new lines before an empty chunk is yielded when following
+TIME_FIELD = re.compile(rb'"time":"([^"]+)"')
+MAX_PROBES = 1024  # times probed per log file for the heatmap, at most twice as many
+MAX_PROBED_FILES = 256  # log files whose probes are cached, the least recently used are dropped
+MIN_STRIDE = 64 * 1024  # bytes between the times probed in a log file
+STREAM_BLOCK_SIZE = 1024 * 1024  # read size when compressing log files for download
+GZIP_LEVEL = 6
+
+
+class LogUsage(NamedTuple):
+    path: str  # live log file, relative to the container directory
+    live: int  # bytes of the live log file
+    rotated: int  # bytes of the rotated segments, e.g. `<id>-json.log.1`
+    compressed: int  # bytes of the compressed rotated segments, e.g. `<id>-json.log.2.gz`
+    files: int
+
+    @property
+    def size(self) -> int:
+        return self.live + self.rotated + self.compressed
+
+
+def _add(usage: dict[str, int], name: str, base: str, size: int):
+    if name == base:
+        usage['live'] += size
+    elif name.endswith(COMPRESSED):
+        usage['compressed'] += size
+    else:
+        usage['rotated'] += size
+    usage['files'] += 1
+
+
+def log_usage(directory: Path, container_id: str) -> LogUsage | None:
+    """
+    Bytes of all the log segments of a container in its directory (`/var/lib/docker/containers/<id>/`),
+    written by the `json-file` driver (`<id>-json.log*`) or the `local` driver (`local-logs/container.log*`).
+    A single pass over the directory, the sizes come with the entries. None if there are no log files,
+    e.g. with a logging driver that doesn't write to disk.
+    """
+    base = f'{container_id}-json.log'
+    usage = {'live': 0, 'rotated': 0, 'compressed': 0, 'files': 0}
+    path = base
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith(base) and entry.is_file(follow_symlinks=False):
+                    _add(usage, entry.name, base, entry.stat(follow_symlinks=False).st_size)
+                elif entry.name == LOCAL_LOGS_DIR and entry.is_dir(follow_symlinks=False):
+                    path = f'{LOCAL_LOGS_DIR}/{LOCAL_LOG}'
+                    with os.scandir(entry.path) as local:
+                        for log in local:
+                            if log.name.startswith(LOCAL_LOG) and log.is_file(follow_symlinks=False):
+                                _add(usage, log.name, LOCAL_LOG, log.stat(follow_symlinks=False).st_size)
+    except OSError:
+        return None
+
+    if not usage['files']:
+        return None
+    return LogUsage(path=path, **usage)
+
+
+class LogRate:
+    """Growth of a log file: the last size seen, the EWMA of its bytes/sec and the last rates."""
+
+    __slots__ = ('path', 'size', 'ino', 'time', 'rate', 'history', 'missed')
+
+    def __init__(self, path: Path, size: int, ino: int, now: float, history: int):
+        self.path = path
+        self.size = size
+        self.ino = ino
+        self.time = now
+        self.rate = 0.0
+        self.history: deque[float] = deque(maxlen=history)  # ring buffer of the rates between samples
+        self.missed = 0  # consecutive samples the container was missing from
+
+
+class LogRateMonitor:
+    """
+    Tracks the growth rate of live log files with a stat per file and sample, no Docker calls and no reads.
+    The rate is an exponentially weighted moving average (EWMA) in bytes/sec: the weight of a sample decays
+    by half every `half_life` seconds, whatever the interval between samples.
+    A file smaller than before, or with another inode, was truncated or rotated: all of its bytes are new.
+    A container is forgotten once it's missing from `max_missed` samples in a row, not on the first one
+    (e.g. its log file is being rotated).
+    """
+
+    def __init__(self, half_life: float, history: int = HISTORY, max_missed: int = MAX_MISSED):
+        self.half_life = half_life
+        self.history = history
+        self.max_missed = max_missed
+        self.rates: dict[str, LogRate] = {}
+
+    def _missed(self, key: str):
+        item = self.rates.get(key)
+        if item is not None:
+            item.missed += 1
+            if item.missed >= self.max_missed:
+                del self.rates[key]
+
+    def sample(self, paths: dict[str, Path], now: float | None = None):
+        """Stat the live log file of every container (by ID), forgetting the containers missing for long."""
+        now = time.time() if now is None else now
+        for key in self.rates.keys() - paths.keys():
+            self._missed(key)
+
+        for key, path in paths.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._missed(key)
+                continue
+
+            item = self.rates.get(key)
+            if item is None or item.path != path:
+                self.rates[key] = LogRate(path, st.st_size, st.st_ino, now, self.history)
+                continue
+            item.missed = 0
+
+            elapsed = now - item.time
+            if elapsed <= 0:
+                continue
+            written = st.st_size - item.size if st.st_size >= item.size and st.st_ino == item.ino else st.st_size
+            rate = written / elapsed
+            alpha = 1 - 0.5 ** (elapsed / self.half_life) if self.half_life else 1.0
+            item.rate += alpha * (rate - item.rate)
+            item.history.append(rate)
+            item.size, item.ino, item.time = st.st_size, st.st_ino, now
+
+    def top(self, n: int) -> list[tuple[str, LogRate]]:
+        """The N fastest growing log files: (container ID, rate)."""
+        return heapq.nlargest(n, self.rates.items(), key=lambda item: item[1].rate)
+
+
+def tail_offset(fd: BinaryIO, lines: int, end: int) -> int:
+    """
+    Offset of the first of the last N lines before `end`, found by reading blocks backwards from there:
+    only the blocks holding the last N lines are read, one at a time.
+    """
+    if lines <= 0 or end <= 0:
+        return end
+    fd.seek(end - 1)
+    newlines = lines + 1 if fd.read(1) == b'\n' else lines  # the last newline ends a line, it doesn't start one
+    pos = end
+    while pos > 0:
+        size = min(BLOCK_SIZE, pos)
+        pos -= size
+        fd.seek(pos)
+        block = fd.read(size)
+        i = len(block)
+        while (i := block.rfind(b'\n', 0, i)) >= 0:
+            newlines -= 1
+            if not newlines:
+                return pos + i + 1
+    return 0
+
+
+def _lines(fd: BinaryIO, start: int, end: int) -> Generator[bytes, None, int]:
+    """Read the complete lines between two offsets a block at a time, return the offset after the last one."""
+    fd.seek(start)
+    pos = start
+    rest = b''
+    while pos < end:
+        block = fd.read(min(BLOCK_SIZE, end - pos))
+        if not block:
+            break
+        pos += len(block)
+        *lines, rest = (rest + block).split(b'\n')
+        for line in lines:
+            yield line + b'\n'
+    return pos - len(rest)
+
+
+def tail(path: Path, lines: int) -> Iterator[bytes]:
+    """
+    Last N lines of a log file. The `json-file` driver writes a JSON object per line, so the lines are NDJSON
+    as they are. Memory doesn't depend on N.
+    """
+    with open(path, 'rb') as fd:
+        end = os.fstat(fd.fileno()).st_size
+        pos = yield from _lines(fd, tail_offset(fd, lines, end), end)
+        if pos < end:  # last line without a newline yet
+            fd.seek(pos)
+            yield fd.read(end - pos) + b'\n'
+
+
+def _follow(path: Path, lines: int) -> Iterator[bytes | None]:
+    """
+    Last N lines of a log file, then the lines appended to it. None when there is nothing new to read yet,
+    the caller waits before reading again. A file smaller than the offset was truncated and is read from
+    its start, and a new file at the path (another inode) means it was rotated: the new file is read once
+    the rotated one is read to its end.
+    """
+    fd = open(path, 'rb')
+    try:
+        st = os.fstat(fd.fileno())
+        pos = yield from _lines(fd, tail_offset(fd, lines, st.st_size), st.st_size)
+        ino = st.st_ino
+        while True:
+            size = os.fstat(fd.fileno()).st_size
+            if size < pos:
+                pos = 0  # truncated
+            if size > pos:
+                pos = yield from _lines(fd, pos, size)
+                if pos < size:  # a line is being written
+                    yield None
+                continue
+
+            try:
+                rotated = os.stat(path).st_ino != ino
+            except OSError:
+                rotated = False  # rotation in progress
+            if rotated:
+                fd.close()
+                fd = open(path, 'rb')
+                ino = os.fstat(fd.fileno()).st_ino
+                pos = 0
+                continue
+            yield None
+    finally:
+        fd.close()
+
+
+def _next_lines(lines: Iterator[bytes | None]) -> tuple[bytes, bool]:
+    """The next lines of a followed log file, about a block at most, and whether to wait for more."""
+    chunks = []
+    size = 0
+    for line in lines:
+        if line is None:
+            return b''.join(chunks), True
+        chunks.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            break
+    return b''.join(chunks), False
+
+
+async def tail_follow(
+    path: Path,
+    lines: int,
+    poll: float = FOLLOW_POLL,
+    idle: float = FOLLOW_IDLE,
+) -> AsyncIterator[bytes]:
+    """
+    Last N lines of a log file, then the lines appended to it, for a streaming response. The file is read
+    in a worker thread a block at a time and polled with async sleeps, so a follower holds no worker thread
+    while the log is quiet. An empty chunk is yielded after `idle` seconds without lines, so a closed
+    connection is noticed.
+    """
+    reader = _follow(path, lines)
+    try:
+        waited = 0.0
+        while True:
+            data, wait = await anyio.to_thread.run_sync(_next_lines, reader)
+            if data:
+                waited = 0.0
+                yield data
+            elif waited >= idle:
+                waited = 0.0
+                yield b''
+            if wait:
+                await anyio.sleep(poll)
+                waited += poll
+    finally:
+        reader.close()
+
+
+def log_segments(path: Path) -> list[Path]:
+    """Rotated segments of a `json-file` log and the live log file, oldest first."""
+
+    def number(segment: Path) -> int:
+        suffix = segment.name[len(path.name) + 1 :].removesuffix(COMPRESSED)
+        return int(suffix) if suffix.isdigit() else 0
+
+    try:
+        rotated = [
+            path.parent / entry.name
+            for entry in os.scandir(path.parent)
+            if entry.name.startswith(path.name + '.') and entry.is_file(follow_symlinks=False)
+        ]
+    except OSError:
+        return []
+    rotated.sort(key=number, reverse=True)  # the higher the number, the older the segment
+    return rotated + [path] if path.is_file() else rotated
+
+
+def _open(segment: Path) -> BinaryIO:
+    return gzip.open(segment, 'rb') if segment.name.endswith(COMPRESSED) else open(segment, 'rb')
+
+
+def line_time(line: bytes) -> datetime | None:
+    """Time of a `json-file` log line, from its `time` field."""
+    match = TIME_FIELD.search(line)
+    if not match:
+        return None
+    try:
+        return datetime.fromisoformat(match.group(1).decode())
+    except ValueError:
+        return None
+
+
+def _next_line(fd: BinaryIO, pos: int, end: int) -> tuple[int, bytes]:
+    """The first line starting at or after an offset and before `end`: (offset, line), an empty line if none."""
+    if pos > 0:
+        fd.seek(pos - 1)
+        while pos < end:  # skip the rest of the line the offset falls in
+            block = fd.read(min(BLOCK_SIZE, end - pos + 1))
+            if not block:
+                return end, b''
+            i = block.find(b'\n')
+            if i >= 0:
+                pos += i
+                break
+            pos += len(block)
+        if pos >= end:
+            return end, b''
+    fd.seek(pos)
+    return pos, fd.readline()
+
+
+def time_offset(fd: BinaryIO, since: datetime, end: int) -> int:
+    """
+    Offset of the first line at or after a time, by binary search over the byte offsets: lines are appended
+    in time order, so only a line per probe is read. Lines without a time are taken as older.
+    """
+    lo, hi = 0, end
+    while lo < hi:
+        start, line = _next_line(fd, (lo + hi) // 2, hi)
+        if not line:
+            hi = (lo + hi) // 2
+            continue
+        ts = line_time(line)
+        if ts is None or ts < since:
+            lo = start + len(line)
+        else:
+            hi = start
+    return lo
+
+
+def search(
+    path: Path,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    pattern: re.Pattern[bytes] | None = None,
+    limit: int = 0,
+) -> Iterator[bytes]:
+    """
+    Lines of a `json-file` log and its rotated segments, oldest first, with a time in [since, until)
+    and matching a pattern (searched in the raw JSON line). The time range of a segment ends where the
+    next one starts, so only the segments overlapping the range are opened: a plain segment is sliced
+    by binary search and only the slice is read, a compressed one is read from its start.
+    """
+    segments = log_segments(path)
+    starts: list[datetime | None] = []
+    for segment in segments:
+        try:
+            with _open(segment) as fd:
+                starts.append(line_time(fd.readline()))
+        except OSError:
+            starts.append(None)
+
+    found = 0
+    for i, segment in enumerate(segments):
+        start = starts[i]
+        next_start = next((ts for ts in starts[i + 1 :] if ts), None)
+        if until and start and start >= until:
+            break
+        if since and next_start and next_start <= since:
+            continue
+
+        try:
+            with _open(segment) as fd:
+                if segment.name.endswith(COMPRESSED):
+                    lines: Iterator[bytes] = iter(fd)
+                else:
+                    end = os.fstat(fd.fileno()).st_size
+                    offset = time_offset(fd, since, end) if since else 0
+                    lines = _lines(fd, offset, end)
+                for line in lines:
+                    ts = line_time(line)
+                    if ts is not None:
+                        if since and ts < since:
+                            continue
+                        if until and ts >= until:
+                            return
+                    if pattern is None or pattern.search(line):
+                        yield line
+                        found += 1
+                        if limit and found >= limit:
+                            return
+        except OSError:
+            continue  # rotated away in the meantime
+
+
+class FileProbes:
+    """Times probed in a log file: (offset, timestamp) of the lines at every `stride` bytes, and of the last line."""
+
+    __slots__ = ('ino', 'size', 'stride', 'next', 'points', 'last')
+
+    def __init__(self, ino: int, stride: int):
+        self.ino = ino
+        self.size = 0
+        self.stride = stride
+        self.next = 0  # next offset to probe
+        self.points: list[tuple[int, float]] = []
+        self.last: tuple[int, float] | None = None
+
+    @property
+    def all_points(self) -> list[tuple[int, float]]:
+        if self.last and (not self.points or self.last[0] > self.points[-1][0]):
+            return self.points + [self.last]
+        return list(self.points)
+
+
+class LogProbes:
+    """
+    Cache of the times probed in log files, by path. A file that only grew keeps its probes and only the
+    appended bytes are probed, a file with another inode or smaller than before is probed again.
+    The stride doubles when a file has too many probes, so their number stays bounded, and only the
+    probes of the last `max_files` files used are kept.
+    The cache is shared by the requests of all containers, which run in threads: it's used under a lock.
+    """
+
+    def __init__(self, max_probes: int = MAX_PROBES, min_stride: int = MIN_STRIDE, max_files: int = MAX_PROBED_FILES):
+        self.max_probes = max_probes
+        self.min_stride = min_stride
+        self.max_files = max_files
+        self.files: OrderedDict[Path, FileProbes] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def probes(self, path: Path) -> FileProbes:
+        with self.lock:
+            return self._probes(path)
+
+    def _probes(self, path: Path) -> FileProbes:
+        st = os.stat(path)
+        item = self.files.get(path)
+        if item is None or item.ino != st.st_ino or st.st_size < item.size:
+            item = FileProbes(st.st_ino, max(self.min_stride, st.st_size // self.max_probes))
+            self.files[path] = item
+        self.files.move_to_end(path)
+        while len(self.files) > self.max_files:
+            self.files.popitem(last=False)
+
+        if st.st_size > item.size and path.name.endswith(COMPRESSED):
+            with gzip.open(path, 'rb') as fd:
+                ts = line_time(fd.readline())
+            item.points = [(0, ts.timestamp())] if ts else []
+        elif st.st_size > item.size:
+            with open(path, 'rb') as fd:
+                self._extend(fd, item, st.st_size)
+        item.size = st.st_size
+        return item
+
+    def _extend(self, fd: BinaryIO, item: FileProbes, size: int):
+        for offset in range(item.next, size, item.stride):
+            line_start, line = _next_line(fd, offset, size)
+            ts = line_time(line)
+            if ts and (not item.points or line_start > item.points[-1][0]):
+                item.points.append((line_start, ts.timestamp()))
+            item.next = offset + item.stride
+
+        # the last line, the end of the time range
+        line_start, line = _next_line(fd, tail_offset(fd, 1, size), size)
+        ts = line_time(line)
+        item.last = (line_start, ts.timestamp()) if ts else item.last
+
+        while len(item.points) > 2 * self.max_probes:
+            item.stride *= 2
+            item.points = item.points[::2]
+
+    def forget(self, paths: set[Path]):
+        """
+        Drop the probes of the files in the directories of the given ones but not given, e.g. removed rotated
+        segments of a log. The files of other directories (other containers) are kept.
+        """
+        dirs = {path.parent for path in paths}
+        with self.lock:
+            for path in [path for path in self.files if path.parent in dirs and path not in paths]:
+                del self.files[path]
+
+
+def _spread(buckets: list[float], start: float, width: float, t1: float, t2: float, nbytes: int):
+    """Add bytes written evenly between two times to the time buckets they overlap."""
+    if t2 <= t1:
+        i = int((t1 - start) // width)
+        if 0 <= i < len(buckets):
+            buckets[i] += nbytes
+        return
+    end = start + width * len(buckets)
+    lo, hi = max(t1, start), min(t2, end)
+    i = int((lo - start) // width)
+    while lo < hi and i < len(buckets):
+        edge = min(start + (i + 1) * width, hi)
+        buckets[i] += nbytes * (edge - lo) / (t2 - t1)
+        lo = edge
+        i += 1
+
+
+def heatmap(path: Path, since: datetime, until: datetime, width: int, cache: LogProbes) -> list[int]:
+    """
+    Bytes written to a log and its rotated segments per time bucket of `width` seconds, from the probed times:
+    the bytes between two probes are spread evenly over the time between them. A compressed segment has a
+    single probe, its bytes are spread until the next segment starts.
+    """
+    start = since.timestamp()
+    buckets = [0.0] * max(0, math.ceil((until.timestamp() - start) / width))
+    segments = log_segments(path)
+    cache.forget(set(segments))
+
+    probes = []
+    for segment in segments:
+        try:
+            probes.append(cache.probes(segment))
+        except OSError:
+            continue  # rotated away in the meantime
+
+    for i, item in enumerate(probes):
+        points = item.all_points
+        if not points:
+            continue
+        next_start = next((p.points[0][1] for p in probes[i + 1 :] if p.points), points[-1][1])
+        points.append((item.size, next_start if len(points) == 1 else points[-1][1]))
+        for (o1, t1), (o2, t2) in zip(points, points[1:]):
+            _spread(buckets, start, width, t1, t2, o2 - o1)
+    return [round(value) for value in buckets]
+
+
+def file_chunks(fd: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    """The bytes of an open file between two offsets, a block at a time. The file is closed at the end."""
+    try:
+        fd.seek(start)
+        pos = start
+        while pos < end:
+            block = fd.read(min(STREAM_BLOCK_SIZE, end - pos))
+            if not block:
+                break  # truncated in the meantime
+            pos += len(block)
+            yield block
+    finally:
+        fd.close()
+
+
+def gzip_chunks(path: Path, level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    """A file compressed in the gzip format as it's read, a block at a time."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip header and trailer
+    with open(path, 'rb') as fd:
+        while block := fd.read(STREAM_BLOCK_SIZE):
+            if chunk := compressor.compress(block):
+                yield chunk
+    yield compressor.flush()
@@ -0,0 +1,77 @@
+import os
+import re
+import stat
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+
+
+DELETED = ' (deleted)'  # suffix of the link target of an open file that was unlinked
+NOT_ON_DISK = ('/memfd:', 'memfd:', '/dev/shm/')  # deleted files in memory, they don't hold disk space
+CONTAINER_ID = re.compile(r'[0-9a-f]{64}')
+
+
+class OpenDeletedFile(NamedTuple):
+    dev: int
+    ino: int
+    path: str  # path of the file before it was deleted, in the mount namespace of the process
+    size: int  # apparent size
+    allocated: int  # disk space held by the file
+    pid: int
+
+
+def container_id(proc: Path, pid: int) -> str | None:
+    """
+    Find the ID of the container of a process in its cgroup, e.g. `0::/system.slice/docker-<id>.scope`
+    (cgroup v2) or `12:memory:/docker/<id>` (cgroup v1). None for processes of the host.
+    """
+    try:
+        cgroup = (proc / str(pid) / 'cgroup').read_text()
+    except OSError:
+        return None
+    ids = CONTAINER_ID.findall(cgroup)
+    return ids[-1] if ids else None
+
+
+def process_name(proc: Path, pid: int) -> str:
+    try:
+        return (proc / str(pid) / 'comm').read_text().strip()
+    except OSError:
+        return ''
+
+
+def open_deleted_files(proc: Path, is_stop: Callable[[], bool]) -> list[OpenDeletedFile]:
+    """
+    Find the files that were deleted while a process still had them open, by the file descriptors of every
+    process in `/proc/<pid>/fd`. Their disk space is freed only when the last descriptor is closed,
+    so it's counted by `df` but not by `du`. Only links and inodes are read, never file data.
+    A file open by many processes, or many times, is listed once per descriptor.
+    """
+    ret = []
+    try:
+        pids = [int(entry.name) for entry in os.scandir(proc) if entry.name.isdigit()]
+    except OSError:
+        return ret
+
+    for pid in pids:
+        if is_stop():
+            break
+        try:
+            with os.scandir(proc / str(pid) / 'fd') as it:
+                fds = list(it)
+        except OSError:
+            continue  # the process exited or can't be inspected
+
+        for fd in fds:
+            try:
+                target = os.readlink(fd.path)
+                if not target.endswith(DELETED) or target.startswith(NOT_ON_DISK):
+                    continue
+                st = os.stat(fd.path)  # follows the link to the open file
+            except OSError:
+                continue
+            # a file with other links left is not deleted, only renamed or replaced
+            if stat.S_ISREG(st.st_mode) and not st.st_nlink:
+                path = target.removesuffix(DELETED)
+                ret.append(OpenDeletedFile(st.st_dev, st.st_ino, path, st.st_size, st.st_blocks * 512, pid))
+    return ret
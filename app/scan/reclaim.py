@@ -0,0 +1,226 @@
+from collections.abc import Iterable
+from datetime import datetime, timedelta, UTC
+
+from peewee import SqliteDatabase
+from playhouse.kv import KeyValue
+
+import settings
+from contrib import kvstore
+from contrib.types import (
+    BuildCacheCurve,
+    DockerBuildCache,
+    DockerBuildCacheList,
+    DockerContainer,
+    DockerContainerList,
+    DockerContainerLog,
+    DockerImage,
+    DockerImageList,
+    DockerOverlay2Layer,
+    DockerVolume,
+    DockerVolumeList,
+    ReclaimableSpace,
+)
+
+
+STOPPED_STATES = ('exited', 'created', 'dead')  # containers removed by `docker container prune`
+ACTIONS = (  # in the order the exclusive bytes are counted
+    'dangling_images',
+    'stopped_containers',
+    'unused_volumes',
+    'build_cache',
+    'large_logs',
+    'unused_overlay2',
+)
+HOUR = 60 * 60
+DAY = 24 * HOUR
+PRUNE_AGES = (0, HOUR, 6 * HOUR, 12 * HOUR, DAY, 2 * DAY, 3 * DAY, 7 * DAY, 14 * DAY, 30 * DAY, 90 * DAY)  # `until`
+MIN_KEEP_STORAGE = 256 * 1024 * 1024  # smallest `--keep-storage` limit of the curve, besides 0
+
+
+def _row(
+    action: str,
+    description: str,
+    sizes: Iterable[int],
+    exclusive: int | None = None,
+    items: int | None = None,
+) -> ReclaimableSpace:
+    sizes = [max(size, 0) for size in sizes]  # unknown sizes are negative (e.g. volumes of other drivers)
+    return ReclaimableSpace(
+        action=action,
+        description=description,
+        items=len(sizes) if items is None else items,
+        size=sum(sizes),
+        exclusive=sum(sizes) if exclusive is None else exclusive,
+    )
+
+
+def is_dangling(image: DockerImage) -> bool:
+    return not image.repo_tags or all(tag == '<none>:<none>' for tag in image.repo_tags)
+
+
+def reclaimable(
+    images: list[DockerImage],
+    containers: list[DockerContainer],
+    volumes: list[DockerVolume],
+    build_cache: list[DockerBuildCache],
+    logs: list[DockerContainerLog],
+    layers: list[DockerOverlay2Layer],
+    now: datetime | None = None,
+) -> list[ReclaimableSpace]:
+    """
+    Bytes freed by each cleanup action. `size` is what an action frees on its own, `exclusive` what it frees
+    after the actions listed before it, so the exclusive bytes add up to the total without counting
+    anything twice:
+
+    - images: only the bytes not shared with other images are freed (`Size - SharedSize`). Dangling images
+      used only by stopped containers are counted too, they are freed once the containers are removed.
+    - stopped containers: their writable layers and their log files.
+    - volumes: volumes no container refers to.
+    - build cache: records not in use and not shared, unused for longer than the age limit.
+    - logs: log files over the size limit, except those of stopped containers (counted above).
+    - overlay2: layers not referenced by any image or container. BuildKit keeps the build cache in such
+      layers, so the build cache is subtracted from them.
+    """
+    now = now or datetime.now(UTC)
+    stopped = [cont for cont in containers if cont.state in STOPPED_STATES]
+    stopped_ids = {cont.short_id for cont in stopped}
+    # images of stopped containers only, not of any other container
+    stopped_images = {cont.image_id for cont in stopped} - {
+        cont.image_id for cont in containers if cont.state not in STOPPED_STATES
+    }
+    stopped_logs = [log.size for log in logs if log.id in stopped_ids]
+    large_logs = [log for log in logs if log.size > settings.RECLAIM_LOG_SIZE]
+    old = now - timedelta(seconds=settings.RECLAIM_BUILD_CACHE_AGE)
+    unused_layers = [layer.size for layer in layers if not layer.in_use]
+    all_cache = sum(max(item.size, 0) for item in build_cache)
+
+    rows = [
+        _row(
+            'dangling_images',
+            'Dangling images not used by any container, or only by stopped ones',
+            (
+                img.size - img.shared_size
+                for img in images
+                if is_dangling(img) and (not img.containers or img.id in stopped_images)
+            ),
+        ),
+        _row(
+            'stopped_containers',
+            'Writable layers and logs of stopped containers',
+            [cont.size_rw for cont in stopped] + stopped_logs,
+            items=len(stopped),
+        ),
+        _row(
+            'unused_volumes',
+            'Volumes not used by any container',
+            (vol.size for vol in volumes if not vol.ref_count),
+        ),
+        _row(
+            'build_cache',
+            'Build cache unused for longer than the age limit',
+            (item.size for item in build_cache if not item.in_use and not item.shared and item.last_used < old),
+        ),
+        _row(
+            'large_logs',
+            'Log files over the size limit (truncated)',
+            (log.size for log in large_logs),
+            exclusive=sum(log.size for log in large_logs if log.id not in stopped_ids),
+        ),
+    ]
+    unused = sum(unused_layers)
+    rows.append(
+        _row(
+            'unused_overlay2',
+            'Overlay2 layers not referenced by any image or container',
+            unused_layers,
+            exclusive=max(unused - all_cache, 0),
+        )
+    )
+    return rows
+
+
+def update_reclaimable() -> list[ReclaimableSpace]:
+    """
+    Recalculate the reclaimable bytes from the results of the last scans. It's cheap (no disk access besides
+    the database) so every scanner calls it when its results change. Only the actions whose bytes changed
+    are written, their `updated` timestamp tells when.
+    """
+    images, containers, volumes, build_cache, logs, layers = [], [], [], [], [], []
+    if settings.DB_DU.exists():
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            layers = kvstore.get_all(KeyValue(database=db, table_name=settings.TABLE_OVERLAY2), DockerOverlay2Layer)
+
+    db = SqliteDatabase(settings.DB_DF)
+    with db:
+        kv = KeyValue(database=db, table_name=settings.TABLE_SYSTEM_DF)
+        if settings.IMAGE_KEY in kv:
+            images = kvstore.get(settings.IMAGE_KEY, kv, DockerImageList).root
+        if settings.CONTAINER_KEY in kv:
+            containers = kvstore.get(settings.CONTAINER_KEY, kv, DockerContainerList).root
+        if settings.VOLUME_KEY in kv:
+            volumes = kvstore.get(settings.VOLUME_KEY, kv, DockerVolumeList).root
+        if settings.BUILD_CACHE_KEY in kv:
+            build_cache = kvstore.get(settings.BUILD_CACHE_KEY, kv, DockerBuildCacheList).root
+        logs = kvstore.get_all(KeyValue(database=db, table_name=settings.TABLE_LOGFILES), DockerContainerLog)
+
+        rows = reclaimable(images, containers, volumes, build_cache, logs, layers)
+        kv = KeyValue(database=db, table_name=settings.TABLE_RECLAIMABLE)
+        with db.atomic():
+            for row in rows:
+                if row.action in kv:
+                    prev = kvstore.get(row.action, kv, ReclaimableSpace)
+                    if prev.model_dump(exclude={'updated'}) == row.model_dump(exclude={'updated'}):
+                        row.updated = prev.updated
+                        continue
+                kvstore.set(row.action, row, kv)
+    return rows
+
+
+def _limits(total: int) -> list[int]:
+    limits = [0]
+    limit = MIN_KEEP_STORAGE
+    while limit < total:
+        limits.append(limit)
+        limit *= 2
+    return limits + [limit]
+
+
+def build_cache_curve(build_cache: list[DockerBuildCache], now: datetime | None = None) -> BuildCacheCurve:
+    """
+    Bytes freed by `docker builder prune --all` with `--filter until=<age>` for a range of ages, and with
+    `--keep-storage=<limit>` for a range of limits (powers of two). Records in use are never removed,
+    shared records are removed but free nothing while another record still uses their content.
+    With a storage limit, the least recently used records are removed first until the cache fits.
+    """
+    now = now or datetime.now(UTC)
+    unused = sorted((item for item in build_cache if not item.in_use), key=lambda item: item.last_used)
+    total = sum(max(item.size, 0) for item in build_cache)
+
+    freed_by_age = []
+    for age in PRUNE_AGES:
+        until = now - timedelta(seconds=age)
+        freed_by_age.append(sum(item.size for item in unused if not item.shared and item.last_used < until))
+
+    limits = _limits(total)
+    freed_by_limit = []
+    for limit in limits:
+        storage, freed = total, 0
+        for item in unused:
+            if storage <= limit:
+                break
+            storage -= max(item.size, 0)
+            freed += 0 if item.shared else max(item.size, 0)
+        freed_by_limit.append(freed)
+
+    return BuildCacheCurve(
+        last_scan=now,
+        records=len(build_cache),
+        total=total,
+        in_use=sum(item.size for item in build_cache if item.in_use),
+        shared=sum(item.size for item in build_cache if item.shared and not item.in_use),
+        ages=list(PRUNE_AGES),
+        freed_by_age=freed_by_age,
+        limits=limits,
+        freed_by_limit=freed_by_limit,
+    )
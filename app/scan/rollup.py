@@ -0,0 +1,205 @@
+import hashlib
+from collections import defaultdict
+from collections.abc import Iterable
+
+from peewee import SqliteDatabase
+from playhouse.kv import KeyValue
+
+import settings
+from contrib import kvstore
+from contrib.types import (
+    ContainerFootprint,
+    DockerBindMounts,
+    DockerContainer,
+    DockerContainerList,
+    DockerContainerLog,
+    DockerImage,
+    DockerImageList,
+    DockerVolume,
+    DockerVolumeList,
+    UsageRollup,
+)
+
+
+NO_LABEL = ''  # group of the entities without the label
+SHARED = '*'  # group of the entities used by several groups, so their bytes are counted once
+FIELDS = ('images', 'writable', 'volumes', 'bind_mounts', 'logs')
+
+
+def _group(groups: Iterable[str]) -> str:
+    groups = set(groups)
+    if len(groups) == 1:
+        return groups.pop()
+    return SHARED if groups else NO_LABEL
+
+
+def rollups(
+    label: str,
+    images: list[DockerImage],
+    containers: list[DockerContainer],
+    volumes: list[DockerVolume],
+    bind_mounts: list[DockerBindMounts],
+    logs: list[DockerContainerLog],
+) -> list[UsageRollup]:
+    """
+    Disk usage grouped by the value of a container label, e.g. the compose project. Images, volumes and
+    bind mounts belong to the group of the containers using them; a volume created by compose carries the
+    label itself. Anything used by containers of several groups goes to the SHARED group instead, so every
+    byte is counted once. Images count only their unshared bytes (`Size - SharedSize`).
+    """
+    by_name: dict[str, str] = {}
+    totals: dict[str, dict[str, int]] = defaultdict(lambda: dict.fromkeys(FIELDS + ('containers',), 0))
+    for cont in containers:
+        group = (cont.labels or {}).get(label, NO_LABEL)
+        for name in cont.clean_names:
+            by_name[name] = group
+        totals[group]['containers'] += 1
+        totals[group]['writable'] += max(cont.size_rw, 0)
+
+    def groups(names: list[str] | None) -> str:
+        return _group(by_name.get(name, NO_LABEL) for name in names or [])
+
+    for img in images:
+        totals[groups(img.containers)]['images'] += max(img.size - img.shared_size, 0)
+    for vol in volumes:
+        group = (vol.labels or {}).get(label) or groups(vol.containers)
+        totals[group]['volumes'] += max(vol.size, 0)
+    for mnt in bind_mounts:
+        totals[groups(mnt.containers)]['bind_mounts'] += max(mnt.size, 0)
+
+    by_id = {cont.short_id: (cont.labels or {}).get(label, NO_LABEL) for cont in containers}
+    for log in logs:
+        totals[by_id.get(log.id, NO_LABEL)]['logs'] += log.size
+
+    return [
+        UsageRollup(label=label, value=value, total=sum(item[field] for field in FIELDS), **item)
+        for value, item in totals.items()
+    ]
+
+
+def footprints(
+    images: list[DockerImage],
+    containers: list[DockerContainer],
+    volumes: list[DockerVolume],
+    bind_mounts: list[DockerBindMounts],
+    logs: list[DockerContainerLog],
+) -> list[ContainerFootprint]:
+    """
+    Disk footprint of every container: its writable layer and log files, plus the image, volumes and bind
+    mounts it uses. Those used by this container only count towards its total, those also used by other
+    containers are counted in `shared` instead, so the totals don't count any byte twice.
+    Images count only their unshared bytes (`Size - SharedSize`).
+    """
+    items = {
+        cont.short_id: dict.fromkeys(FIELDS + ('shared',), 0) | {'writable': max(cont.size_rw, 0)}
+        for cont in containers
+    }
+    by_name = {name: cont.short_id for cont in containers for name in cont.clean_names}
+
+    def add(field: str, names: list[str] | None, size: int):
+        ids = {by_name[name] for name in names or [] if name in by_name}
+        for id_ in ids:
+            items[id_]['shared' if len(ids) > 1 else field] += max(size, 0)
+
+    for img in images:
+        add('images', img.containers, img.size - img.shared_size)
+    for vol in volumes:
+        add('volumes', vol.containers, vol.size)
+    for mnt in bind_mounts:
+        add('bind_mounts', mnt.containers, mnt.size)
+    for log in logs:
+        if log.id in items:
+            items[log.id]['logs'] += log.size
+
+    return [
+        ContainerFootprint(
+            id=cont.short_id,
+            name=', '.join(cont.clean_names),
+            image=cont.image,
+            state=cont.state,
+            total=sum(items[cont.short_id][field] for field in FIELDS),
+            **items[cont.short_id],
+        )
+        for cont in containers
+    ]
+
+
+def _digest(
+    images: list[DockerImage],
+    containers: list[DockerContainer],
+    volumes: list[DockerVolume],
+    bind_mounts: list[DockerBindMounts],
+    logs: list[DockerContainerLog],
+) -> str:
+    # only what the rollups and footprints depend on, not the scan timestamps
+    inputs = (
+        settings.ROLLUP_LABELS,
+        sorted((img.id, img.size, img.shared_size, sorted(img.containers or [])) for img in images),
+        sorted(
+            (cont.id, cont.clean_names, cont.image, cont.state, cont.size_rw, sorted((cont.labels or {}).items()))
+            for cont in containers
+        ),
+        sorted(
+            (vol.name, vol.size, sorted(vol.containers or []), sorted((vol.labels or {}).items())) for vol in volumes
+        ),
+        sorted((mnt.path, mnt.size, sorted(mnt.containers)) for mnt in bind_mounts),
+        sorted((log.id, log.size) for log in logs),
+    )
+    return hashlib.blake2b(repr(inputs).encode(), digest_size=16).hexdigest()
+
+
+def _write(kv: KeyValue, rows: list[ContainerFootprint] | list[UsageRollup], key: str):
+    keys = {getattr(row, key) for row in rows}
+    for stale in [stale for stale in kv.keys() if stale not in keys]:
+        del kv[stale]
+    for row in rows:
+        if getattr(row, key) in kv:
+            prev = kvstore.get(getattr(row, key), kv, type(row))
+            if prev.model_dump(exclude={'updated'}) == row.model_dump(exclude={'updated'}):
+                row.updated = prev.updated
+                continue
+        kvstore.set(getattr(row, key), row, kv)
+
+
+def update_rollups() -> bool:
+    """
+    Recalculate the usage rollups of every configured label and the footprint of every container from the
+    results of the last scans. Nothing is done unless the sizes or relations they depend on changed since
+    the last run, e.g. a scan that found the same sizes again. Otherwise only the rows whose bytes changed
+    are written, and the rows of groups or containers that are gone are removed.
+    Returns whether anything was recalculated.
+    """
+    images, containers, volumes, bind_mounts, logs = [], [], [], [], []
+    if settings.DB_DU.exists():
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            bind_mounts = kvstore.get_all(KeyValue(database=db, table_name=settings.TABLE_BINDMOUNTS), DockerBindMounts)
+
+    db = SqliteDatabase(settings.DB_DF)
+    with db:
+        system_df_kv = KeyValue(database=db, table_name=settings.TABLE_SYSTEM_DF)
+        if settings.IMAGE_KEY in system_df_kv:
+            images = kvstore.get(settings.IMAGE_KEY, system_df_kv, DockerImageList).root
+        if settings.CONTAINER_KEY in system_df_kv:
+            containers = kvstore.get(settings.CONTAINER_KEY, system_df_kv, DockerContainerList).root
+        if settings.VOLUME_KEY in system_df_kv:
+            volumes = kvstore.get(settings.VOLUME_KEY, system_df_kv, DockerVolumeList).root
+        logs = kvstore.get_all(KeyValue(database=db, table_name=settings.TABLE_LOGFILES), DockerContainerLog)
+
+        digest = _digest(images, containers, volumes, bind_mounts, logs)
+        if system_df_kv.get(settings.ROLLUP_INPUTS_KEY) == digest:
+            return False
+
+        rows = []
+        for label in settings.ROLLUP_LABELS:
+            rows += rollups(label, images, containers, volumes, bind_mounts, logs)
+
+        with db.atomic():
+            _write(KeyValue(database=db, table_name=settings.TABLE_ROLLUPS), rows, 'key')
+            _write(
+                KeyValue(database=db, table_name=settings.TABLE_FOOTPRINTS),
+                footprints(images, containers, volumes, bind_mounts, logs),
+                'id',
+            )
+            system_df_kv[settings.ROLLUP_INPUTS_KEY] = digest
+    return True
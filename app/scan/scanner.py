@@ -1,6 +1,9 @@
+import math
 import time
 import fnmatch
+from datetime import datetime, UTC
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from docker.models.containers import Container
@@ -9,15 +12,54 @@ from playhouse.kv import KeyValue
 from pydantic import ValidationError
 
 import settings
-from scan.utils import get_size, du_available, pretty_size
+from settings import ScanStrategy
+from scan.collectors import (
+    DetailsCollector,
+    collect_details,
+    compression_collector,
+    compression_pool,
+    details_collectors,
+    details_enabled,
+    is_cold,
+)
+from scan.dedup import DedupFinder, SizeGroupCollector
+from scan.estimate import CALIBRATION_HISTORY, SizeEstimate, calibration, estimate_size
+from scan.ignore import IgnoreMatcher, compile_patterns
+from scan.logs import LogRateMonitor, log_usage
+from scan.procfs import container_id, open_deleted_files, process_name
+from scan.reclaim import build_cache_curve, update_reclaimable
+from scan.rollup import update_rollups
+from scan.top import update_top
+from scan.tree import GrowthCollector, SizeTree, TreeCollector
+from scan.utils import (
+    get_size,
+    get_stats,
+    choose_backend,
+    du_available,
+    fstype_strategy,
+    other_device_mounts,
+    pretty_size,
+)
+from scan.walker import Collector, WalkStats, walk
 from contrib import kvstore
 from contrib.logger import get_logger
+from contrib.mountinfo import MountInfo, find_mount, read_mountinfo
 from contrib.types import (
     DockerSystemDF,
     DockerMount,
     DockerContainerLog,
+    DockerDeletedFile,
+    LogGrowth,
+    LogGrowthReport,
     DockerBindMounts,
     DockerOverlay2Layer,
+    DockerSizeTree,
+    DedupFiles,
+    EntryCounts,
+    FileHash,
+    ScanDetails,
+    ScanStats,
+    ScanThroughput,
 )
 from contrib.docker import (
     docker_from_env,
@@ -104,6 +146,7 @@ class SystemDFScanner(BaseScanner):
             kvstore.set(settings.CONTAINER_KEY, df.containers, kv)
             kvstore.set(settings.VOLUME_KEY, df.volumes, kv)
             kvstore.set(settings.BUILD_CACHE_KEY, df.build_cache, kv)
+            kvstore.set(settings.BUILD_CACHE_CURVE_KEY, build_cache_curve(df.build_cache.root), kv)
 
             for mnt in doku_mounts(self.client):
                 if mnt.root:
@@ -113,13 +156,19 @@ class SystemDFScanner(BaseScanner):
             elapsed = time.perf_counter() - start
             self.logger.info(f'Docker disk usage (df) has been analyzed. Elapsed time: {elapsed:.2f} seconds.')
 
+        update_reclaimable()
+        update_rollups()
+        update_top('images', 'containers', 'volumes', 'build_cache')
+
 
 class LogfilesScanner(BaseScanner):
     """
-    Scans the disk usage of log files.
+    Scans the disk usage of log files, including rotated and compressed segments.
     Docker stores log files in `/var/lib/docker/containers/<container-id>/`.
     """
 
+    CONTAINERS_DIR = '/var/lib/docker/containers/'
+
     def __init__(self, is_stop: Callable[[], bool]):
         super().__init__()
         self.is_stop = is_stop
@@ -156,48 +205,222 @@ class LogfilesScanner(BaseScanner):
             start = time.perf_counter()
             self.logger.debug('Scanning logfiles...')
 
-            kv.clear()  # clear previous calculations
+            # map host path to doku container path (used only for size calculation)
+            containers_dir: Path | None = map_host_path_to_container(
+                source=self.root_mount.src,
+                destination=self.root_mount.dst,
+                host_path=self.CONTAINERS_DIR,
+            )
+            if not containers_dir:
+                self.logger.error(f'Directory {self.CONTAINERS_DIR} not found or not accessible.')
+                return
 
-            for cont in self.client.containers.list(all=True):
+            items: dict[str, DockerContainerLog] = {}
+
+            # a single request for all images (the image models would inspect each one)
+            tags = {image['Id']: image['RepoTags'][0] for image in self.client.api.images() if image.get('RepoTags')}
+
+            # the container list has everything needed, no container inspect either
+            for cont in self.client.containers.list(all=True, sparse=True):
                 if self.is_stop():
                     break
 
                 cont: Container
-                if 'LogPath' not in cont.attrs:
-                    continue
-
                 id_ = cont.short_id
-                name = cont.name
-                image_id = cont.image.short_id
-                image = cont.image.tags[0] if cont.image.tags else image_id.removeprefix('sha256:')
+                names = cont.attrs.get('Names') or [id_]
+                name = names[0].lstrip('/')
+                image_id = cont.attrs.get('ImageID', '')
+                image = tags.get(image_id) or image_id.removeprefix('sha256:')[:12]
+
+                usage = log_usage(containers_dir / cont.id, cont.id)
+                if not usage:
+                    continue  # no log files, e.g. a logging driver that doesn't write to disk
+
+                # timestamp of the last scan in seconds
+                last_scan = round(time.time())
+
+                total += usage.size
+                num += 1
+
+                obj = DockerContainerLog(
+                    id=id_,
+                    name=name,
+                    image=image,
+                    path=f'{self.CONTAINERS_DIR}{cont.id}/{usage.path}',
+                    size=usage.size,
+                    live=usage.live,
+                    rotated=usage.rotated,
+                    compressed=usage.compressed,
+                    files=usage.files,
+                    last_scan=last_scan,
+                )
+                items[id_] = obj
+                self.logger.debug(f'Logfiles of container {name} scanned. Size: {pretty_size(usage.size)}.')
+
+            # replaced at once: the log rate monitor reads the table in another thread
+            with db.atomic():
+                kv.clear()  # clear previous calculations
+                for key, obj in items.items():
+                    kvstore.set(key, obj, kv)
+
+            elapsed = time.perf_counter() - start
+            self.logger.info(
+                f'{num} logfiles scanned. Total size: {pretty_size(total)}. Elapsed time: {elapsed:.2f} seconds.'
+            )
 
-                log_path = cont.attrs['LogPath']
+        update_reclaimable()
+        update_rollups()
+        update_top('logs')
 
-                # map host path to doku container path (used only for size calculation)
-                path: Path | None = map_host_path_to_container(
+
+class LogRateScanner(LogfilesScanner):
+    """
+    Samples the size of the live log files found by the last logfiles scan, every few seconds,
+    to catch a runaway logger long before the next logfiles scan. A stat per file, no Docker calls:
+    only the fastest growing log files are written.
+    It runs in its own thread (see `run`), the other scanners of the DF process would delay the samples.
+    """
+
+    def __init__(self, is_stop: Callable[[], bool]):
+        super().__init__(is_stop)
+        self.monitor = LogRateMonitor(settings.LOG_RATE_HALF_LIFE)
+
+    @property
+    def table_name(self):
+        return settings.TABLE_LOG_RATES
+
+    def run(self):
+        """Sample every `SCAN_LOG_RATE_INTERVAL` seconds until stopped. The first sample is a baseline."""
+        deadline = time.monotonic()
+        while not self.is_stop():
+            deadline += settings.SCAN_LOG_RATE_INTERVAL
+            try:
+                self.scan()
+            except Exception as e:
+                self.logger.error(f'Failed to sample the log files: {e}')
+            # sleep until the next sample, a late sample isn't made up for
+            deadline = max(deadline, time.monotonic())
+            while not self.is_stop() and time.monotonic() < deadline:
+                time.sleep(min(deadline - time.monotonic(), 1))
+
+    def scan(self):
+        if not self.root_mount:
+            return
+
+        db = SqliteDatabase(self.database_name)
+        with db:
+            logs = {
+                log.id: log
+                for log in kvstore.get_all(
+                    KeyValue(database=db, table_name=settings.TABLE_LOGFILES), DockerContainerLog
+                )
+            }
+            paths = {}
+            for id_, log in logs.items():
+                path = map_host_path_to_container(
                     source=self.root_mount.src,
                     destination=self.root_mount.dst,
-                    host_path=log_path,
+                    host_path=log.path,
                 )
+                if path:
+                    paths[id_] = path
+            self.monitor.sample(paths)
 
-                if not path:
-                    self.logger.error(f'Logfile {log_path} of container {name} not found or not accessible.')
-                    continue
+            top = [
+                LogGrowth(
+                    id=id_,
+                    name=logs[id_].name,
+                    path=logs[id_].path,
+                    size=item.size,
+                    rate=item.rate,
+                    history=list(item.history),
+                )
+                for id_, item in self.monitor.top(settings.LOG_RATE_TOP_N)
+            ]
+            report = LogGrowthReport(
+                last_update=datetime.now(UTC),
+                interval=settings.SCAN_LOG_RATE_INTERVAL,
+                containers=len(self.monitor.rates),
+                top=top,
+            )
+            kvstore.set(settings.LOG_RATES_KEY, report, KeyValue(database=db, table_name=self.table_name))
 
-                # timestamp of the last scan in seconds
-                last_scan = round(time.time())
 
-                size = path.stat().st_size  # log file size in bytes
-                total += size
-                num += 1
+class DeletedFilesScanner(BaseScanner):
+    """
+    Finds files deleted while a process still holds them open, through the file descriptors in `/proc`.
+    Their space is used on the disk (`df` counts it) but no scan of directories can find it.
+    Cheap enough to run often: only links and inodes are read, never file data.
+    """
+
+    def __init__(self, is_stop: Callable[[], bool]):
+        super().__init__()
+        self.is_stop = is_stop
+        self.proc = self._proc_dir()
+
+    def _proc_dir(self) -> Path:
+        # the procfs of the host is mounted under the root mount, the one of the container shows
+        # the processes of the host only if the PID namespace is shared (`--pid=host`)
+        for mnt in doku_mounts(self.client):
+            if mnt.root and (Path(mnt.dst) / 'proc' / '1').is_dir():
+                return Path(mnt.dst) / 'proc'
+        return Path('/proc')
+
+    @property
+    def database_name(self):
+        return settings.DB_DF
+
+    @property
+    def table_name(self):
+        return settings.TABLE_DELETED_FILES
+
+    def scan(self):
+        self.log_start_time()
+        db = SqliteDatabase(self.database_name)
+        kv = KeyValue(database=db, table_name=self.table_name)
+
+        with db:
+            start = time.perf_counter()
+            self.logger.debug('Scanning deleted files held open...')
+
+            files = open_deleted_files(self.proc, self.is_stop)
+            if self.is_stop():
+                return
+
+            containers = {cont.id: cont.name for cont in self.client.containers.list()}
+            last_scan = round(time.time())
+
+            # a file open by many descriptors or processes is stored once
+            items: dict[str, DockerDeletedFile] = {}
+            for file in files:
+                key = f'{file.dev}:{file.ino}'
+                if key in items:
+                    if file.pid not in items[key].pids:
+                        items[key].pids.append(file.pid)
+                    continue
+
+                id_ = container_id(self.proc, file.pid)
+                items[key] = DockerDeletedFile(
+                    path=file.path,
+                    size=file.allocated,
+                    apparent_size=file.size,
+                    pids=[file.pid],
+                    process=process_name(self.proc, file.pid),
+                    container_id=id_[:12] if id_ else None,
+                    container=containers.get(id_) if id_ else None,
+                    last_scan=last_scan,
+                )
 
-                obj = DockerContainerLog(id=id_, name=name, image=image, path=log_path, size=size, last_scan=last_scan)
-                kvstore.set(id_, obj, kv)
-                self.logger.debug(f'Logfile of container {name} scanned. Size: {pretty_size(size)}.')
+            with db.atomic():
+                kv.clear()  # clear previous calculations
+                for key, obj in items.items():
+                    kvstore.set(key, obj, kv)
 
+            total = sum(obj.size for obj in items.values())
             elapsed = time.perf_counter() - start
             self.logger.info(
-                f'{num} logfiles scanned. Total size: {pretty_size(total)}. Elapsed time: {elapsed:.2f} seconds.'
+                f'{len(items)} deleted files held open. Total size: {pretty_size(total)}. '
+                f'Elapsed time: {elapsed:.2f} seconds.'
             )
 
 
@@ -212,6 +435,8 @@ class BindMountsScanner(BaseScanner):
         super().__init__()
         self.is_stop = is_stop
         self.doku_mounts = self._doku_mounts()
+        self.mount_table: list[MountInfo] = []  # mount table of the Doku container, read on every scan
+        self.ignore_regex = compile_patterns(settings.BINDMOUNT_IGNORE_PATTERNS)
 
     def _doku_mounts(self) -> list[DockerMount]:
         mounts = doku_mounts(self.client)
@@ -234,28 +459,380 @@ class BindMountsScanner(BaseScanner):
 
     def should_ignore_path(self, path: str) -> bool:
         """Check if the path matches any ignore pattern."""
-        for pattern in settings.BINDMOUNT_IGNORE_PATTERNS:
+        return bool(self.ignore_regex and self.ignore_regex.match(path))
+
+    def ignore_matcher(self, path: Path, host_path: str) -> IgnoreMatcher:
+        """Create the matcher of the paths skipped inside a bind mount."""
+        return IgnoreMatcher(
+            settings.BINDMOUNT_IGNORE_PATTERNS,
+            root=str(path),
+            host_root=host_path,
+            ignore_files=settings.SCAN_IGNORE_FILES,
+        )
+
+    def should_estimate_path(self, path: str) -> bool:
+        """Check if the path matches any estimate pattern."""
+        for pattern in settings.BINDMOUNT_ESTIMATE_PATTERNS:
             if fnmatch.fnmatch(path, pattern):
                 return True
         return False
 
-    def scan(self):
+    def doku_path(self, host_path: str) -> Path | None:
+        """Map a host path to the path inside the Doku container using a suitable Doku mount."""
+        for doku_mnt in self.doku_mounts:
+            path: Path | None = map_host_path_to_container(
+                source=doku_mnt.src,
+                destination=doku_mnt.dst,
+                host_path=host_path,
+            )
+            if path:
+                return path
+        return None
+
+    def scan_strategy(self, host_path: str, path: Path) -> tuple[str, ScanStrategy]:
+        """
+        Detect the filesystem type backing the path and pick the scan strategy for it.
+        Bind mounts matching the estimate patterns are always estimated.
+        """
+        mnt = find_mount(str(path), self.mount_table)
+        fstype = mnt.fstype if mnt else ''
+        if self.should_estimate_path(host_path):
+            return fstype, ScanStrategy.ESTIMATE
+        return fstype, fstype_strategy(fstype)
+
+    @staticmethod
+    def scan_backend(
+        strategy: ScanStrategy, fstype: str, scan_stats: ScanStats, stale_details: bool = False
+    ) -> tuple[ScanStrategy, str]:
+        """
+        Resolve the auto strategy: to walk if the details are stale (du sees only the size), otherwise
+        to du or walk by the throughput measured on previous scans. Other strategies are set by the
+        filesystem policy.
+        """
+        if strategy == ScanStrategy.AUTO:
+            if stale_details:
+                return ScanStrategy.WALK, 'the details are refreshed by the walker'
+            return choose_backend(scan_stats)
+        return strategy, f'{fstype or "unknown"} filesystem policy'
+
+    def other_devices(self, path: Path, obj: DockerBindMounts) -> list[tuple[Path, str]]:
+        """
+        Filesystems mounted inside a bind mount: their paths in the Doku container and on the host.
+        """
+        mounts = []
+        for mount_point in other_device_mounts(path, self.mount_table):
+            mounts.append((mount_point, obj.path.rstrip('/') + str(mount_point)[len(str(path).rstrip('/')) :]))
+        obj.other_devices = [host_path for _, host_path in mounts]
+        return mounts
+
+    def estimate(self, path: Path, obj: DockerBindMounts) -> SizeEstimate:
+        """
+        Estimate the size of a bind mount by random sampling, corrected only if the exact scans showed
+        a significant bias (see `calibration`). Filesystems mounted inside are estimated separately.
+        Returns the raw (uncalibrated) estimate.
+        """
+        est = estimate_size(
+            path,
+            probes=settings.SCAN_ESTIMATE_PROBES,
+            sleep_duration=settings.SCAN_SLEEP_DURATION,
+            is_stop=self.is_stop,
+            ignore=self.ignore_matcher(path, obj.path),
+        )
+        obj.other_device_size = 0
+        for mount_point, host_path in self.other_devices(path, obj):
+            obj.other_device_size += estimate_size(
+                mount_point,
+                probes=settings.SCAN_ESTIMATE_PROBES,
+                sleep_duration=settings.SCAN_SLEEP_DURATION,
+                is_stop=self.is_stop,
+                ignore=self.ignore_matcher(mount_point, host_path),
+            ).size
+        obj.calibration, calibration_error = calibration(obj.calibration_ratios)
+        obj.size = round(est.size * obj.calibration)
+        # the uncertainty of the correction adds to the one of the estimate
+        obj.size_error = round(math.hypot(est.error * obj.calibration, est.size * calibration_error))
+        obj.estimated = True
+        return est
+
+    @staticmethod
+    def uses_du(strategy: ScanStrategy) -> bool:
+        return strategy == ScanStrategy.DU and du_available()
+
+    def size(
+        self,
+        path: Path,
+        host_path: str,
+        strategy: ScanStrategy,
+        collectors: tuple[Collector, ...] = (),
+    ) -> WalkStats:
+        """
+        Calculate the size of a path on its own filesystem with an exact scan strategy.
+        Collectors are only filled by the walker, not by `du`.
+        """
+        ignore = self.ignore_matcher(path, host_path)
+
+        if self.uses_du(strategy):
+            size = get_size(
+                path,
+                sleep_duration=settings.SCAN_SLEEP_DURATION,
+                is_stop=self.is_stop,
+                use_du=True,
+                ignore=ignore,
+            )
+            return WalkStats(size=size)
+
+        return walk(
+            path,
+            sleep_duration=settings.SCAN_SLEEP_DURATION,
+            is_stop=self.is_stop,
+            threads=settings.SCAN_PARALLEL_THREADS if strategy == ScanStrategy.PARALLEL else 0,
+            ignore=ignore,
+            collectors=collectors,
+        )
+
+    def measure(
+        self,
+        path: Path,
+        obj: DockerBindMounts,
+        strategy: ScanStrategy = ScanStrategy.DU,
+        scan_stats: ScanStats | None = None,
+        collectors: tuple[Collector, ...] = (),
+    ) -> None:
+        """
+        Calculate the exact size of a bind mount.
+        Filesystems mounted inside the bind mount are measured separately and not added to its size.
+        If scan_stats is given, the throughput of the scan is recorded in it.
+        """
+        start = time.perf_counter()
+        stats = self.size(path, obj.path, strategy, collectors)
+        obj.size = stats.size
+        obj.ignored_paths = stats.ignored
+        set_counts(obj, stats)
+        obj.other_device_size = 0
+        files = stats.files
+        nested_collectors = tuple(c for c in collectors if not c.same_device_only)
+        for mount_point, host_path in self.other_devices(path, obj):
+            stats = self.size(mount_point, host_path, strategy, nested_collectors)
+            obj.other_device_size += stats.size
+            obj.ignored_paths += stats.ignored
+            files += stats.files
+        obj.size_error = 0
+        obj.estimated = False
+        elapsed = time.perf_counter() - start
+
+        # an interrupted scan says nothing about the throughput
+        if scan_stats is None or elapsed <= 0 or self.is_stop():
+            return
+
+        # recorded under the backend that ran: the walker when du was asked for but isn't available
+        backend = strategy if strategy != ScanStrategy.DU or self.uses_du(strategy) else ScanStrategy.WALK
+        if backend != ScanStrategy.DU:
+            scan_stats.files = files
+        else:
+            files = scan_stats.files  # du doesn't count files, use the count of the last walk
+        scan_stats.backends[backend.value] = ScanThroughput(
+            bytes_per_sec=(obj.size + obj.other_device_size) / elapsed,
+            files_per_sec=files / elapsed,
+            measured_at=datetime.now(UTC),
+        )
+
+    @staticmethod
+    def reuse_cold(obj: DockerBindMounts, prev: DockerBindMounts | None, prev_details: ScanDetails | None) -> bool:
+        """
+        Take the results of the previous scan of a bind mount if nothing was modified in it for a long time,
+        and its last exact scan is recent enough (see SCAN_COLD_SKIP_INTERVAL).
+        """
+        if not settings.SCAN_COLD_SKIP_INTERVAL or not prev or not prev.last_exact_scan or not is_cold(prev_details):
+            return False
+        if (obj.last_scan - prev.last_exact_scan).total_seconds() > settings.SCAN_COLD_SKIP_INTERVAL:
+            return False
+
+        obj.size = prev.size
+        obj.other_device_size = prev.other_device_size
+        obj.other_devices = prev.other_devices
+        obj.ignored_paths = prev.ignored_paths
+        set_counts(obj, prev)
+        obj.backend = prev.backend
+        obj.backend_reason = prev.backend_reason
+        obj.last_exact_scan = prev.last_exact_scan
+        obj.last_walk = prev.last_walk
+        obj.cold = True
+        return True
+
+    @staticmethod
+    def stale_details(obj: DockerBindMounts) -> bool:
+        """
+        Whether details are collected and the last walk is older than SCAN_DETAILS_INTERVAL.
+        In between, `du` may measure the bind mount if it's faster, the details of the last walk are kept.
+        """
+        if not (details_enabled() or settings.SCAN_TREE_DEPTH or not settings.DISABLE_DEDUP_SCAN):
+            return False
+        if obj.last_walk is None:
+            return True
+        return (obj.last_scan - obj.last_walk).total_seconds() >= settings.SCAN_DETAILS_INTERVAL
+
+    def scan_exact(
+        self,
+        path: Path,
+        obj: DockerBindMounts,
+        strategy: ScanStrategy,
+        stats_kv: KeyValue,
+        details_kv: KeyValue,
+        trees_kv: KeyValue,
+        growth_kv: KeyValue,
+        files_kv: KeyValue,
+        prev_details: ScanDetails | None = None,
+        pool: ProcessPoolExecutor | None = None,
+    ):
+        """
+        Measure a bind mount with the backend picked for it, and store the details collected by the walker,
+        and the files searched for duplicates by the dedup scanner.
+        The size tree of the previous walk is compared with the new one during the walk.
+        If `du` is used (faster while the details are fresh, or by the filesystem policy), the details of the
+        previous walk are kept.
+        """
+        scan_stats = ScanStats(path=obj.path)
+        if obj.path in stats_kv:
+            scan_stats = kvstore.get(obj.path, stats_kv, ScanStats)
+
+        backend, obj.backend_reason = self.scan_backend(strategy, obj.fstype, scan_stats, self.stale_details(obj))
+        obj.backend = backend.value
+        self.logger.debug(
+            f'Bind mount {obj.path}: {obj.fstype or "unknown"} filesystem, {backend.value} backend '
+            f'({obj.backend_reason}).'
+        )
+
+        collectors: tuple[DetailsCollector, ...] = ()
+        tree: TreeCollector | None = None
+        growth: GrowthCollector | None = None
+        dedup: SizeGroupCollector | None = None
+        if not self.uses_du(backend):
+            if not settings.DISABLE_DEDUP_SCAN:
+                dedup = SizeGroupCollector(settings.SCAN_DEDUP_MIN_SIZE, str(path), obj.path)
+            collectors = details_collectors(path, prev_details.compression if prev_details else None, pool)
+            if settings.SCAN_TREE_DEPTH:
+                tree = TreeCollector(str(path), settings.SCAN_TREE_DEPTH, settings.SCAN_TREE_DEEP_NODES)
+            if tree and settings.SCAN_GROWTH_TOP_N and obj.path in trees_kv:
+                previous = kvstore.get(obj.path, trees_kv, DockerSizeTree)
+                growth = GrowthCollector(
+                    str(path), SizeTree.from_model(previous), previous.depth, settings.SCAN_GROWTH_TOP_N
+                )
+
+        others = tuple(c for c in (tree, growth, dedup) if c)
+        self.measure(path, obj, backend, scan_stats, collectors + others)
+        obj.last_exact_scan = obj.last_scan
+        kvstore.set(obj.path, scan_stats, stats_kv)
+        if self.is_stop():
+            return
+
+        if self.uses_du(backend):
+            # du sees only the size: keep the details, the size tree, the growth report and the files of the last walk
+            if prev_details:
+                kvstore.set(obj.path, prev_details, details_kv)
+                if prev_details.counts:
+                    set_counts(obj, prev_details.counts)
+            return
+
+        obj.last_walk = obj.last_scan
+        if collectors:
+            scan_details = collect_details(obj.path, obj.last_scan, collectors)
+            scan_details.counts = entry_counts(obj)
+            kvstore.set(obj.path, scan_details, details_kv)
+        if growth:
+            report = growth.report(obj.path, previous.last_scan, obj.last_scan)
+            kvstore.set(obj.path, report, growth_kv)
+        elif obj.path in growth_kv:
+            del growth_kv[obj.path]
+        if tree:
+            size_tree = tree.tree(obj.path)
+            kvstore.set(obj.path, size_tree.to_model(obj.path, obj.last_scan, settings.SCAN_TREE_DEPTH), trees_kv)
+        elif obj.path in trees_kv:
+            del trees_kv[obj.path]  # tree disabled, don't keep a stale one
+        if dedup:
+            kvstore.set(obj.path, dedup.save(obj.path, obj.last_scan), files_kv)
+        elif obj.path in files_kv:
+            del files_kv[obj.path]
+
+    def recalibrate(self):
+        """
+        Run exact scans of the estimated bind mounts, record the ratio of the exact size to the estimate
+        for their calibration, and report the exact size until the next regular scan estimates it again.
+        It's expensive, so it's scheduled much less often than the regular scan. Bind mounts are estimated
+        by pattern or by filesystem policy, nothing is done if none were estimated by the last scan.
+        """
         if not self.doku_mounts:
             return
 
-        self.log_start_time()
         db = SqliteDatabase(self.database_name)
         kv = KeyValue(database=db, table_name=self.table_name)
 
         with db:
+            estimated = [obj for obj in kvstore.get_all(kv, DockerBindMounts) if obj.estimated]
+            if not estimated:
+                return
+
+            start = time.perf_counter()
+            self.logger.info('Recalibrating estimated bind mounts...')
+            self.mount_table = read_mountinfo()
+
+            num = 0
+            for obj in estimated:
+                if self.is_stop():
+                    break
+
+                path = self.doku_path(obj.path)
+                if not path:
+                    continue
+
+                est = self.estimate(path, obj)
+                # the parallel walk is the fastest exact scan on any filesystem where estimating makes sense
+                self.measure(path, obj, ScanStrategy.PARALLEL)
+                if est.size > 0 and not self.is_stop():
+                    obj.calibration_ratios = (obj.calibration_ratios + [obj.size / est.size])[-CALIBRATION_HISTORY:]
+                    obj.calibration = calibration(obj.calibration_ratios)[0]
+
+                obj.last_exact_scan = datetime.now(UTC)
+                kvstore.set(obj.path, obj, kv)
+                num += 1
+                self.logger.debug(
+                    f'Bind mount {obj.path} recalibrated. Size: {pretty_size(obj.size)}, '
+                    f'calibration: {obj.calibration:.3f}.'
+                )
+
+            elapsed = time.perf_counter() - start
+            self.logger.info(f'{num} estimated bind mounts recalibrated. Elapsed time: {elapsed:.2f} seconds.')
+
+    def scan(self):
+        if not self.doku_mounts:
+            return
+
+        self.log_start_time()
+        db = SqliteDatabase(self.database_name)
+        kv = KeyValue(database=db, table_name=self.table_name)
+        # throughput of the scan backends, kept between scans (never cleared)
+        stats_kv = KeyValue(database=db, table_name=settings.TABLE_SCAN_STATS)
+        details_kv = KeyValue(database=db, table_name=settings.TABLE_BINDMOUNT_DETAILS)
+        # size trees are kept between scans, the previous tree is compared with the new one
+        trees_kv = KeyValue(database=db, table_name=settings.TABLE_BINDMOUNT_TREES)
+        growth_kv = KeyValue(database=db, table_name=settings.TABLE_BINDMOUNT_GROWTH)
+        # files searched for duplicates by the dedup scanner, kept with the trees
+        files_kv = KeyValue(database=db, table_name=settings.TABLE_BINDMOUNT_FILES)
+
+        with db, compression_pool() as pool:
             total = 0
             num = 0
             start = time.perf_counter()
             self.logger.info('Scanning bind mounts...')
 
+            # calibration of estimated bind mounts and results of cold bind mounts survive between scans
+            previous = {item.path: item for item in kvstore.get_all(kv, DockerBindMounts)}
+            previous_details = {item.key: item for item in kvstore.get_all(details_kv, ScanDetails)}
             kv.clear()  # clear previous calculations
+            details_kv.clear()
+            self.mount_table = read_mountinfo()
 
             already_scanned: dict[str, DockerBindMounts] = {}  # set of processed bindmounts
+            kept_trees: set[str] = set()  # bind mounts with an up-to-date size tree
             myself = doku_container(self.client)
 
             # loop through all containers
@@ -291,11 +868,6 @@ class BindMountsScanner(BaseScanner):
                     if mnt.dst == '/var/run/docker.sock' or mnt.dst.startswith('/run/secrets/'):
                         continue
 
-                    # Skip paths matching ignore patterns
-                    if self.should_ignore_path(mnt.src):
-                        self.logger.debug(f'Skipping bind mount {mnt.src} as it matches an ignore pattern')
-                        continue
-
                     if mnt.src in already_scanned:
                         # skip already scanned bind mounts, but update the list of containers
                         obj = already_scanned[mnt.src]
@@ -317,36 +889,60 @@ class BindMountsScanner(BaseScanner):
                     kvstore.set(mnt.src, obj, kv)  # for early access from the web interface
                     already_scanned[mnt.src] = obj
 
-                    # looking for a suitable bind mount in doku_mounts
-                    for doku_mnt in self.doku_mounts:
-                        # map host path to doku container path (used only for size calculation)
-                        path: Path | None = map_host_path_to_container(
-                            source=doku_mnt.src,
-                            destination=doku_mnt.dst,
-                            host_path=mnt.src,
-                        )
-
-                        if not path:
-                            continue
-
-                        self.logger.debug(f'Start scanning bind mount {mnt.src} of container {name}...')
-                        size = get_size(
-                            path,
-                            sleep_duration=settings.SCAN_SLEEP_DURATION,
-                            is_stop=self.is_stop,
-                            use_du=settings.SCAN_USE_DU and du_available(),
-                        )
-                        total += size
+                    # skip paths matching ignore patterns, their size is unknown
+                    if self.should_ignore_path(mnt.src):
+                        self.logger.debug(f'Skipping bind mount {mnt.src} as it matches an ignore pattern')
+                        obj.ignored = True
+                        obj.scan_in_progress = False
+                        kvstore.set(mnt.src, obj, kv)
+                        continue
+
+                    # map host path to doku container path (used only for size calculation)
+                    path: Path | None = self.doku_path(mnt.src)
+
+                    if path:
+                        obj.fstype, strategy = self.scan_strategy(mnt.src, path)
+                        obj.strategy = strategy.value
+
+                        if strategy == ScanStrategy.SKIP:
+                            self.logger.debug(f'Skipping bind mount {mnt.src} on {obj.fstype} filesystem')
+                        elif strategy == ScanStrategy.ESTIMATE:
+                            self.logger.debug(f'Start estimating bind mount {mnt.src} of container {name}...')
+                            if mnt.src in previous:
+                                obj.calibration_ratios = previous[mnt.src].calibration_ratios
+                                obj.last_exact_scan = previous[mnt.src].last_exact_scan
+                            self.estimate(path, obj)
+                        elif self.reuse_cold(obj, previous.get(mnt.src), previous_details.get(mnt.src)):
+                            self.logger.debug(f'Skipping bind mount {mnt.src}, nothing was modified for 90 days')
+                            kvstore.set(mnt.src, previous_details[mnt.src], details_kv)
+                            kept_trees.add(mnt.src)
+                        else:
+                            self.logger.debug(f'Start scanning bind mount {mnt.src} of container {name}...')
+                            prev_details = previous_details.get(mnt.src)
+                            if mnt.src in previous:
+                                obj.last_walk = previous[mnt.src].last_walk
+                            self.scan_exact(
+                                path,
+                                obj,
+                                strategy,
+                                stats_kv,
+                                details_kv,
+                                trees_kv,
+                                growth_kv,
+                                files_kv,
+                                prev_details,
+                                pool,
+                            )
+                            kept_trees.add(mnt.src)
+
+                        total += obj.size
                         num += 1
 
-                        obj.size = size
                         obj.scan_in_progress = False
                         kvstore.set(mnt.src, obj, kv)  # update the key-value store with the final size
                         already_scanned[mnt.src] = obj
 
-                        self.logger.debug(f'Bind mount {mnt.src} scanned. Size: {pretty_size(size)}.')
-                        # this mount is processed, no need to check other Doku mounts
-                        break
+                        self.logger.debug(f'Bind mount {mnt.src} scanned. Size: {pretty_size(obj.size)}.')
                     else:
                         obj.err = True
                         obj.scan_in_progress = False
@@ -354,11 +950,21 @@ class BindMountsScanner(BaseScanner):
                         already_scanned[mnt.src] = obj
                         self.logger.error(f'Bind mount {mnt.src} of container {name} not found or not accessible.')
 
+            if not self.is_stop():
+                # remove the trees (and files) of bind mounts that are gone or not walked anymore
+                for table in (trees_kv, growth_kv, files_kv):
+                    for key in list(table.keys()):
+                        if key not in kept_trees:
+                            del table[key]
+
             elapsed = time.perf_counter() - start
             self.logger.info(
                 f'{num} bind mounts scanned. Total size: {pretty_size(total)}. Elapsed time: {elapsed:.2f} seconds.'
             )
 
+        update_rollups()
+        update_top('bind_mounts')
+
 
 class Overlay2Scanner(BaseScanner):
     """
@@ -423,6 +1029,16 @@ class Overlay2Scanner(BaseScanner):
         self.logger.debug(f'Overlay2 layers: {len(layers)} collected.')
         return layers
 
+    @staticmethod
+    def stale_compression(obj: DockerOverlay2Layer, details: ScanDetails | None) -> bool:
+        """
+        Whether the compression estimate of a layer is older than SCAN_DETAILS_INTERVAL.
+        In between, `du` measures the layer and the estimate of the last walk is kept.
+        """
+        if details is None:
+            return True
+        return (obj.last_scan - details.last_scan).total_seconds() >= settings.SCAN_DETAILS_INTERVAL
+
     def scan(self):
         if not self.overlay2_dir:
             return
@@ -430,15 +1046,19 @@ class Overlay2Scanner(BaseScanner):
         self.log_start_time()
         db = SqliteDatabase(self.database_name)
         kv = KeyValue(database=db, table_name=self.table_name)
+        details_kv = KeyValue(database=db, table_name=settings.TABLE_OVERLAY2_DETAILS)
         layers = self.collect_overlay2_layers()
 
-        with db:
+        with db, compression_pool() as pool:
             total = 0
             num = 0
             start = time.perf_counter()
             self.logger.info('Scanning overlay2 storage driver...')
 
+            # compression estimates are kept while the size of a layer doesn't change
+            previous = {item.key: item for item in kvstore.get_all(details_kv, ScanDetails)}
             kv.clear()  # clear previous calculations
+            details_kv.clear()
 
             for path in self.overlay2_dir.iterdir():
                 if self.is_stop():
@@ -489,13 +1109,30 @@ class Overlay2Scanner(BaseScanner):
 
                 try:
                     self.logger.debug(f'Start scanning overlay2 layer {short_id}...')
-                    # only diff directories are scanned
-                    size = get_size(
+                    prev_details = previous.get(id_)
+                    compression = prev_details.compression if prev_details else None
+                    collectors = ()
+                    if settings.SCAN_OVERLAY2_DETAILS:
+                        collectors = details_collectors(diff_dir, compression, pool)
+                    elif settings.SCAN_COMPRESS_SAMPLES and self.stale_compression(obj, prev_details):
+                        # the compressibility is estimated without the other details
+                        collectors = (compression_collector(compression, pool),)
+                    # only diff directories are scanned, with `du` unless the details are collected
+                    stats = get_stats(
                         diff_dir,
                         sleep_duration=settings.SCAN_SLEEP_DURATION,
                         is_stop=self.is_stop,
                         use_du=settings.SCAN_USE_DU and du_available(),
+                        collectors=collectors,
                     )
+                    size = stats.size
+                    set_counts(obj, stats)
+                    if collectors and not self.is_stop():
+                        details = collect_details(id_, obj.last_scan, collectors)
+                        details.counts = entry_counts(stats)
+                        kvstore.set(id_, details, details_kv)
+                    elif prev_details and settings.SCAN_COMPRESS_SAMPLES:
+                        kvstore.set(id_, prev_details, details_kv)  # kept until the next walk
                     total += size
                     num += 1
 
@@ -514,6 +1151,176 @@ class Overlay2Scanner(BaseScanner):
                 f'{num} overlay2 layers scanned. Total size: {pretty_size(total)}. Elapsed time: {elapsed:.2f} seconds.'
             )
 
+        update_reclaimable()
+        update_top('overlay2')
+
+
+class VolumesScanner(BaseScanner):
+    """
+    Walks local Docker volumes to collect their details (largest files, usage breakdown), and their files
+    searched for duplicates by the dedup scanner.
+    Volume sizes are reported by the Docker API, but not what takes the space inside a volume.
+    """
+
+    def __init__(self, is_stop: Callable[[], bool]):
+        super().__init__()
+        self.is_stop = is_stop
+        self.root_mount = self._root_mount()
+
+    def _root_mount(self) -> DockerMount | None:
+        root_mounts = [mnt for mnt in doku_mounts(self.client) if mnt.root]
+        if not root_mounts:
+            self.logger.error('No root mount found. Volumes will not be scanned.')
+            return None
+        return root_mounts[0]
+
+    @property
+    def database_name(self):
+        return settings.DB_DU
+
+    @property
+    def table_name(self):
+        return settings.TABLE_VOLUME_DETAILS
+
+    def scan(self):
+        if not self.root_mount:
+            return
+
+        self.log_start_time()
+        db = SqliteDatabase(self.database_name)
+        kv = KeyValue(database=db, table_name=self.table_name)
+        files_kv = KeyValue(database=db, table_name=settings.TABLE_VOLUME_FILES)
+
+        with db, compression_pool() as pool:
+            num = 0
+            start = time.perf_counter()
+            self.logger.info('Scanning volumes...')
+
+            # compression estimates are kept while the size of a volume doesn't change
+            compression = {item.key: item.compression for item in kvstore.get_all(kv, ScanDetails)}
+            kv.clear()  # clear previous calculations
+            files_kv.clear()
+
+            for vol in self.client.volumes.list():
+                if self.is_stop():
+                    break
+
+                mountpoint = vol.attrs.get('Mountpoint', '')
+                if vol.attrs.get('Driver') != 'local' or not mountpoint:
+                    continue
+
+                path = map_host_path_to_container(
+                    source=self.root_mount.src,
+                    destination=self.root_mount.dst,
+                    host_path=mountpoint,
+                )
+                if not path or not path.is_dir():
+                    self.logger.error(f'Volume {vol.name} not found or not accessible.')
+                    continue
+
+                collectors = details_collectors(path, compression.get(vol.name), pool)
+                dedup = None
+                if not settings.DISABLE_DEDUP_SCAN:
+                    dedup = SizeGroupCollector(settings.SCAN_DEDUP_MIN_SIZE, str(path), mountpoint)
+                if not collectors and not dedup:
+                    break  # nothing to collect
+
+                self.logger.debug(f'Start scanning volume {vol.name}...')
+                last_scan = datetime.now(UTC)
+                stats = walk(
+                    path,
+                    sleep_duration=settings.SCAN_SLEEP_DURATION,
+                    is_stop=self.is_stop,
+                    collectors=collectors + ((dedup,) if dedup else ()),
+                )
+                if self.is_stop():
+                    break
+
+                if collectors:
+                    details = collect_details(vol.name, last_scan, collectors)
+                    details.counts = entry_counts(stats)
+                    kvstore.set(vol.name, details, kv)
+                if dedup:
+                    # files searched for duplicates by the dedup scanner
+                    kvstore.set(vol.name, dedup.save(mountpoint, last_scan), files_kv)
+                num += 1
+                self.logger.debug(f'Volume {vol.name} scanned. Size: {pretty_size(stats.size)}.')
+
+            elapsed = time.perf_counter() - start
+            self.logger.info(f'{num} volumes scanned. Elapsed time: {elapsed:.2f} seconds.')
+
+
+def set_counts(obj: EntryCounts, stats: WalkStats | EntryCounts):
+    """Copy the number of entries by type from a walk (or from another record)."""
+    obj.files = stats.files
+    obj.dirs = stats.dirs
+    obj.symlinks = stats.symlinks
+    obj.others = stats.others
+
+
+def entry_counts(stats: WalkStats | EntryCounts) -> EntryCounts:
+    return EntryCounts(files=stats.files, dirs=stats.dirs, symlinks=stats.symlinks, others=stats.others)
+
 
 def diff_subdirs(diff_dir: Path) -> list[Path]:
     return list(diff_dir.iterdir())
+
+
+class DedupScanner(BaseScanner):
+    """
+    Searches bind mounts and local volumes for duplicate files. The files are listed by the walks of the
+    bind mounts and volumes scanners: only the files that may have a duplicate are read here.
+    Bind mounts that are estimated or skipped are not searched, those measured by `du` keep the files of
+    their last walk.
+    """
+
+    def __init__(self, is_stop: Callable[[], bool]):
+        super().__init__()
+        self.is_stop = is_stop
+
+    @property
+    def database_name(self):
+        return settings.DB_DU
+
+    @property
+    def table_name(self):
+        return settings.TABLE_DEDUP
+
+    def scan(self):
+        self.log_start_time()
+        db = SqliteDatabase(self.database_name)
+        kv = KeyValue(database=db, table_name=self.table_name)
+        hashes_kv = KeyValue(database=db, table_name=settings.TABLE_DEDUP_HASHES)
+
+        with db:
+            start = time.perf_counter()
+            self.logger.info('Searching for duplicate files...')
+            last_scan = datetime.now(UTC)
+
+            # group the files found by the last walks of every bind mount and volume by size
+            sizes = SizeGroupCollector(settings.SCAN_DEDUP_MIN_SIZE)
+            for table in (settings.TABLE_BINDMOUNT_FILES, settings.TABLE_VOLUME_FILES):
+                for files in kvstore.get_all(KeyValue(database=db, table_name=table), DedupFiles):
+                    sizes.load(files)
+
+            cache = {key: FileHash.model_validate_json(str(value)) for key, value in hashes_kv.items()}
+            finder = DedupFinder(cache, settings.SCAN_DEDUP_WORKERS, settings.SCAN_SLEEP_DURATION, self.is_stop)
+            sets = finder.find(sizes.candidates())
+            if self.is_stop():
+                return
+
+            # keep the hashes of the files found by this run only
+            with db.atomic():
+                hashes_kv.clear()
+                hashes_kv.update({
+                    key: value.model_dump_json() for key, value in finder.used.items() if value.partial or value.full
+                })
+
+            report = finder.report(last_scan, sizes.files, sets)
+            kvstore.set(settings.DEDUP_KEY, report, kv)
+
+            elapsed = time.perf_counter() - start
+            self.logger.info(
+                f'{report.duplicate_sets} sets of duplicate files found, {pretty_size(report.reclaimable)} reclaimable '
+                f'({report.hashed} files hashed). Elapsed time: {elapsed:.2f} seconds.'
+            )
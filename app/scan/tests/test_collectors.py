@@ -0,0 +1,222 @@
+import os
+import random
+import time
+from datetime import datetime, UTC
+from unittest.mock import patch
+
+from scan.collectors import (
+    DAY,
+    AgeCollector,
+    BreakdownCollector,
+    CappedCounter,
+    CompressionCollector,
+    LargestCollector,
+    collect_details,
+    compression_pool,
+    details_collectors,
+    file_extension,
+    is_cold,
+)
+from scan.walker import walk
+
+
+def test_largest_collector(tmp_path):
+    for i in range(10):
+        d = tmp_path / f'dir{i}'
+        d.mkdir()
+        (d / 'file').write_bytes(b'x' * (i + 1) * 100)
+    (tmp_path / 'dir9' / 'small').write_bytes(b'x')
+
+    collector = LargestCollector(str(tmp_path), k=3)
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+
+    # the heaps never grow over k
+    assert len(collector.files) == 3
+    assert len(collector.dirs) == 3
+
+    details = collect_details('/host/path', datetime.now(UTC), (collector,))
+    assert [(e.path, e.size) for e in details.largest_files] == [
+        ('/dir9/file', 1000),
+        ('/dir8/file', 900),
+        ('/dir7/file', 800),
+    ]
+    assert [(e.path, e.size) for e in details.largest_dirs] == [('/dir9', 1001), ('/dir8', 900), ('/dir7', 800)]
+
+
+def test_file_extension():
+    assert file_extension('access.LOG') == 'log'
+    assert file_extension('backup.tar.gz') == 'gz'
+    assert file_extension('syslog.2.gz') == 'gz'
+    assert file_extension('app.log.12') == 'log'
+    assert file_extension('.bashrc') == '(none)'
+    assert file_extension('Makefile') == '(none)'
+    assert file_extension('dump.20240101T120000') == '(none)'
+
+
+def test_capped_counter():
+    counter = CappedCounter(max_keys=2)
+    for i in range(100):
+        counter.add(f'key{i}', 1)
+    counter.add('big', 1000)
+    counter.add('big', 1000)
+    counter.add('key99', 10)
+    assert len(counter.counts) <= 8
+
+    buckets = counter.buckets()
+    big, key99, other = buckets
+    assert (big.key, key99.key, other.key) == ('big', 'key99', 'other')
+    # never undercounted, overcounted by the error at most
+    assert big.size - big.error <= 2000 <= big.size
+    assert key99.size - key99.error <= 11 <= key99.size
+    assert sum(b.size for b in buckets) == 2110
+    assert sum(b.files for b in buckets) == 103
+
+    # a key evicted and counted again keeps its bytes
+    counter = CappedCounter(max_keys=1, capacity=2)
+    counter.add('a', 5)
+    counter.add('b', 6)
+    counter.add('c', 1)  # evicts a
+    counter.add('a', 5)  # evicts c
+    assert counter.counts['a'][0] >= 10
+
+    # the key with the fewest bytes is evicted, even if its heap entry is outdated
+    counter = CappedCounter(max_keys=1, capacity=3)
+    counter.add('a', 1)
+    counter.add('b', 2)
+    counter.add('c', 3)
+    counter.add('a', 10)  # the entry of `a` is outdated
+    counter.add('d', 1)  # evicts b
+    assert set(counter.counts) == {'a', 'c', 'd'}
+    assert counter.counts['d'] == [3, 2, 2]
+    assert len(counter.heap) == len(counter.counts)
+
+
+def test_breakdown_collector(tmp_path):
+    (tmp_path / 'app.log').write_bytes(b'x' * 100)
+    (tmp_path / 'app.log.1').write_bytes(b'x' * 10)
+    (tmp_path / 'photo.JPG').write_bytes(b'x' * 50)
+    (tmp_path / 'README').write_bytes(b'x' * 5)
+
+    collector = BreakdownCollector(max_keys=10)
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+    details = collect_details('volume', datetime.now(UTC), (collector,))
+
+    assert {b.key: (b.size, b.files) for b in details.by_extension} == {
+        'log': (110, 2),
+        'jpg': (50, 1),
+        '(none)': (5, 1),
+    }
+    assert {b.key: b.size for b in details.by_type} == {'log': 110, 'image': 50, 'other': 5}
+    uid = str((tmp_path / 'README').stat().st_uid)
+    assert [(b.key, b.size, b.files) for b in details.by_uid] == [(uid, 165, 4)]
+
+
+def test_details_collectors(tmp_path):
+    with (
+        patch('settings.SCAN_TOP_K', 0),
+        patch('settings.SCAN_BREAKDOWN_KEYS', 0),
+        patch('settings.SCAN_AGE_HISTOGRAM', False),
+        patch('settings.SCAN_COMPRESS_SAMPLES', 0),
+    ):
+        assert details_collectors(tmp_path) == ()
+
+    with (
+        patch('settings.SCAN_TOP_K', 5),
+        patch('settings.SCAN_BREAKDOWN_KEYS', 0),
+        patch('settings.SCAN_AGE_HISTOGRAM', False),
+        patch('settings.SCAN_COMPRESS_SAMPLES', 0),
+    ):
+        (collector,) = details_collectors(tmp_path)
+        assert isinstance(collector, LargestCollector)
+        assert collector.k == 5
+
+
+def test_age_collector(tmp_path):
+    now = time.time()
+    ages = {'new': 60, 'week': 3 * DAY, 'quarter': 60 * DAY, 'old': 400 * DAY}
+    for name, age in ages.items():
+        (tmp_path / name).write_bytes(b'x' * 10)
+        os.utime(tmp_path / name, (now - age, now - age))
+    os.utime(tmp_path / 'old', (now, now - 400 * DAY))  # accessed recently
+
+    collector = AgeCollector(now=now)
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+    details = collect_details('volume', datetime.now(UTC), (collector,))
+
+    assert details.age.buckets == ['<1d', '<7d', '<30d', '<90d', '<1y', 'older']
+    assert details.age.mtime == [10, 10, 0, 10, 0, 10]
+    assert details.age.atime == [20, 10, 0, 10, 0, 0]
+    assert not is_cold(details)
+
+    details.age.mtime = [0, 0, 0, 0, 10, 30]
+    assert is_cold(details)
+    assert not is_cold(None)
+
+    # new or empty trees hold no bytes to tell their age by
+    details.age.mtime = [0] * len(details.age.buckets)
+    assert not is_cold(details)
+
+
+def compression(tmp_path, previous=None, executor=None) -> CompressionCollector:
+    collector = CompressionCollector(
+        60, executor=executor, time_limit=10, sleep_duration=0, previous=previous, rng=random.Random(0)
+    )
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+    return collector
+
+
+def test_compression_collector(tmp_path):
+    rng = random.Random(0)
+    for i in range(20):
+        (tmp_path / f'zeros{i}.log').write_bytes(b'\0' * 200_000)
+        (tmp_path / f'random{i}.bin').write_bytes(rng.randbytes(200_000))
+    (tmp_path / 'empty').touch()
+
+    collector = compression(tmp_path)
+    assert collector.size == 8_000_000
+    # all files are in the same stratum, sampled up to the reservoir size
+    assert sum(len(reservoir) for reservoir in collector.reservoirs) == 60 // 5
+
+    details = collect_details('/host/path', datetime.now(UTC), (collector,))
+    estimate = details.compression
+    assert estimate.size == 8_000_000
+    assert estimate.samples == 12
+    zlib_ratio, lzma_ratio = estimate.codecs
+    assert (zlib_ratio.codec, lzma_ratio.codec) == ('zlib', 'lzma')
+    for ratio in estimate.codecs:
+        # half of the bytes are incompressible, the others compress to almost nothing
+        assert ratio.low < 2 < ratio.high
+        assert ratio.low <= ratio.ratio <= ratio.high
+        assert ratio.savings > 0
+
+    # the previous estimate is kept while the size doesn't change
+    collector = compression(tmp_path, previous=estimate)
+    assert collect_details('/host/path', datetime.now(UTC), (collector,)).compression is estimate
+
+    (tmp_path / 'more').write_bytes(b'x' * 10)
+    with (
+        patch('settings.SCAN_COMPRESS_SAMPLES', 60),
+        patch('settings.SCAN_COMPRESS_WORKERS', 2),
+        compression_pool() as pool,
+    ):
+        # the pool of the scan run is shared by the items
+        for _ in range(2):
+            collector = compression(tmp_path, previous=estimate, executor=pool)
+            assert collect_details('/host/path', datetime.now(UTC), (collector,)).compression.size == 8_000_010
+    assert pool._shutdown_thread
+
+    with patch('settings.SCAN_COMPRESS_WORKERS', 0), compression_pool() as pool:
+        assert pool is None
+
+
+def test_compression_collector_time_limit(tmp_path):
+    (tmp_path / 'file').write_bytes(b'x' * 1000)
+    collector = CompressionCollector(10, executor=None, time_limit=0, sleep_duration=0)
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+
+    with patch('scan.collectors.time.monotonic', side_effect=[0, 1]):
+        estimate = collector.estimate(datetime.now(UTC))
+    # nothing compressed in time, counted as incompressible
+    assert estimate.samples == 0
+    assert estimate.codecs[0].ratio == 1.0
+    assert estimate.codecs[0].savings == 0
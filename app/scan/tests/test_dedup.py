@@ -0,0 +1,60 @@
+import os
+from datetime import datetime, UTC
+
+import pytest
+
+from scan.dedup import BLOCK_SIZE, DedupFinder, SizeGroupCollector
+from scan.walker import walk
+
+
+def search(tmp_path, cache, workers=0) -> tuple[DedupFinder, SizeGroupCollector, list]:
+    sizes = SizeGroupCollector(min_size=10)
+    sizes.start(str(tmp_path), '/host')
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(sizes,))
+    finder = DedupFinder(cache, workers=workers, sleep_duration=0, is_stop=lambda: False)
+    return finder, sizes, finder.find(sizes.candidates())
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_dedup(tmp_path, workers):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    # small duplicates, fully read by the partial hash
+    (tmp_path / 'a' / 'model.bin').write_bytes(b'm' * 1000)
+    (tmp_path / 'b' / 'model.bin').write_bytes(b'm' * 1000)
+    (tmp_path / 'b' / 'other.bin').write_bytes(b'o' * 1000)  # same size, other content
+    os.link(tmp_path / 'a' / 'model.bin', tmp_path / 'a' / 'link.bin')  # the same file
+    (tmp_path / 'tiny').write_bytes(b'm')  # under the minimum size
+
+    # large files with the same first and last blocks, only the full hash tells them apart
+    large = b'x' * BLOCK_SIZE * 3
+    (tmp_path / 'a' / 'dataset').write_bytes(large)
+    (tmp_path / 'b' / 'dataset').write_bytes(large)
+    (tmp_path / 'b' / 'changed').write_bytes(large[:BLOCK_SIZE] + b'y' * BLOCK_SIZE + large[:BLOCK_SIZE])
+
+    cache = {}
+    finder, sizes, sets = search(tmp_path, cache, workers)
+    assert sizes.files == 6
+
+    report = finder.report(datetime.now(UTC), sizes.files, sets)
+    assert report.duplicate_sets == 2
+    assert report.reclaimable == BLOCK_SIZE * 3 + 1000
+    assert report.sets[0].paths == ['/host/a/dataset', '/host/b/dataset']
+    # hard links are a single copy, either path is reported
+    small = report.sets[1]
+    assert small.size == 1000
+    assert small.paths[0] in ('/host/a/link.bin', '/host/a/model.bin')
+    assert small.paths[1:] == ['/host/b/model.bin']
+    assert report.hashed == 6 + 3  # partial hashes of all candidates, full hashes of the large ones
+
+    # the files saved by a walk are searched by the dedup scanner
+    loaded = SizeGroupCollector(min_size=10)
+    loaded.load(sizes.save('/host', datetime.now(UTC)))
+    loaded.load(sizes.save('/host', datetime.now(UTC)))  # files found twice are kept once
+    assert loaded.files == sizes.files
+    assert loaded.candidates() == sizes.candidates()
+
+    # hashes are cached by inode, mtime and size
+    finder, sizes, sets = search(tmp_path, finder.used, workers)
+    assert finder.hashed == 0
+    assert len(sets) == 2
@@ -17,11 +17,15 @@ def mock_stop_signal():
 @patch('scan.df.setup_logger')
 @patch('scan.df.SystemDFScanner')
 @patch('scan.df.LogfilesScanner')
+@patch('scan.df.LogRateScanner')
+@patch('scan.df.DeletedFilesScanner')
 @patch('scan.df.time.sleep')
 @patch('scan.df.schedule.every')
 def test_main(
     mock_schedule,
     mock_sleep,
+    mock_deleted_files_scanner,
+    mock_log_rate_scanner,
     mock_logfiles_scanner,
     mock_system_scanner,
     mock_logger,
@@ -38,7 +42,7 @@ def test_main(
     mock_signal_handler.assert_called_once()
     mock_logger.assert_called_once()
 
-    mock_logger.return_value.info.assert_any_call('DF scanner started (system df + logfiles).')
+    mock_logger.return_value.info.assert_any_call('DF scanner started (system df + logfiles + deleted files).')
     mock_logger.return_value.info.assert_any_call('DF scanner stopped.')
 
     mock_system_scanner.assert_called_once()
@@ -47,7 +51,13 @@ def test_main(
     mock_logfiles_scanner.assert_called_once_with(is_stop=mock_stop_signal.is_stop)
     mock_logfiles_scanner.return_value.scan.assert_called_once()
 
-    assert mock_schedule.call_count == 2
+    mock_log_rate_scanner.assert_called_once_with(is_stop=mock_stop_signal.is_stop)
+    mock_log_rate_scanner.return_value.run.assert_called_once()  # in its own thread
+
+    mock_deleted_files_scanner.assert_called_once_with(is_stop=mock_stop_signal.is_stop)
+    mock_deleted_files_scanner.return_value.scan.assert_called_once()
+
+    assert mock_schedule.call_count == 3
 
     # Verify sleep was called 10 times (matches our mock signal setup)
     assert mock_sleep.call_count == 10
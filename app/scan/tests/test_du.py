@@ -17,11 +17,15 @@ def mock_stop_signal():
 @patch('scan.du.setup_logger')
 @patch('scan.du.BindMountsScanner')
 @patch('scan.du.Overlay2Scanner')
+@patch('scan.du.VolumesScanner')
+@patch('scan.du.DedupScanner')
 @patch('scan.du.time.sleep')
 @patch('scan.du.schedule.every')
 def test_main(
     mock_schedule,
     mock_sleep,
+    mock_dedup_scanner,
+    mock_volumes_scanner,
     mock_overlay2_scanner,
     mock_bindmounts_scanner,
     mock_logger,
@@ -38,7 +42,7 @@ def test_main(
     mock_signal_handler.assert_called_once()
     mock_logger.assert_called_once()
 
-    mock_logger.return_value.info.assert_any_call('DU scanner started (bind mounts + overlay2).')
+    mock_logger.return_value.info.assert_any_call('DU scanner started (bind mounts + volumes + overlay2).')
     mock_logger.return_value.info.assert_any_call('DU scanner stopped.')
 
     mock_overlay2_scanner.assert_called_once()
@@ -47,7 +51,14 @@ def test_main(
     mock_bindmounts_scanner.assert_called_once_with(is_stop=mock_stop_signal.is_stop)
     mock_bindmounts_scanner.return_value.scan.assert_called_once()
 
-    assert mock_schedule.call_count == 2
+    mock_volumes_scanner.assert_called_once_with(is_stop=mock_stop_signal.is_stop)
+    mock_volumes_scanner.return_value.scan.assert_called_once()
+
+    # scheduled only, not run at startup
+    mock_dedup_scanner.assert_called_once_with(is_stop=mock_stop_signal.is_stop)
+    mock_dedup_scanner.return_value.scan.assert_not_called()
+
+    assert mock_schedule.call_count == 5  # with the recalibration of the estimated bind mounts
 
     # Verify sleep was called 10 times (matches our mock signal setup)
     assert mock_sleep.call_count == 10
@@ -0,0 +1,55 @@
+import random
+from pathlib import Path
+
+from scan.estimate import MIN_CALIBRATION_SCANS, calibration, estimate_size
+from scan.utils import get_size
+
+
+def make_tree(root: Path, depth: int, fanout: int, file_size: int):
+    (root / 'file.bin').write_bytes(b'x' * file_size)
+    if depth == 0:
+        return
+    for n in range(fanout):
+        subdir = root / f'dir{n}'
+        subdir.mkdir()
+        make_tree(subdir, depth - 1, fanout, file_size)
+
+
+def test_estimate_size_uniform_tree(tmp_path):
+    # in a uniform tree every probe gives the exact size
+    make_tree(tmp_path, depth=3, fanout=3, file_size=100)
+    exact = get_size(tmp_path, sleep_duration=0, is_stop=lambda: False, use_du=False)
+
+    est = estimate_size(tmp_path, probes=10, sleep_duration=0, is_stop=lambda: False)
+    assert est.size == exact
+    assert est.error == 0
+    assert est.probes == 10
+
+
+def test_estimate_size_skewed_tree(tmp_path):
+    big = tmp_path / 'big'
+    big.mkdir()
+    (big / 'data.bin').write_bytes(b'x' * 10000)
+    for n in range(3):
+        (tmp_path / f'small{n}').mkdir()
+        (tmp_path / f'small{n}' / 'data.bin').write_bytes(b'x' * 10)
+
+    est = estimate_size(tmp_path, probes=500, sleep_duration=0, is_stop=lambda: False, rng=random.Random(42))
+    assert est.error > 0
+    assert est.size - est.error <= 10030 <= est.size + est.error
+
+
+def test_estimate_size_stop(tmp_path):
+    est = estimate_size(tmp_path, probes=10, sleep_duration=0, is_stop=lambda: True)
+    assert est.size == 0
+    assert est.probes == 0
+
+
+def test_calibration():
+    assert calibration([]) == (1.0, 0.0)
+    assert calibration([1.5] * (MIN_CALIBRATION_SCANS - 1)) == (1.0, 0.0)
+    assert calibration([0.8, 1.2, 1.1, 0.9]) == (1.0, 0.0)  # noise of the estimates
+
+    factor, error = calibration([1.5, 1.45, 1.55])
+    assert round(factor, 2) == 1.5
+    assert 0 < error < 0.5
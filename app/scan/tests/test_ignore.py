@@ -0,0 +1,76 @@
+from scan.ignore import IgnoreMatcher, IgnoreRules, compile_patterns
+from scan.walker import walk
+
+
+def test_compile_patterns():
+    assert compile_patterns([]) is None
+
+    regex = compile_patterns(['/home/*', '*/.git/*'])
+    assert regex.match('/home/user')
+    assert regex.match('/srv/app/.git/objects')
+    assert not regex.match('/srv/app/src')
+
+
+def test_ignore_rules():
+    rules = IgnoreRules(
+        '/data',
+        [
+            '# comment',
+            '',
+            '*.log',
+            '!keep.log',
+            'cache/',
+            '/build',
+            'docs/**/*.tmp',
+            'node_modules',
+        ],
+    )
+    assert rules.match('/data/app.log', is_dir=False) is True
+    assert rules.match('/data/sub/app.log', is_dir=False) is True
+    assert rules.match('/data/sub/keep.log', is_dir=False) is False
+    assert rules.match('/data/sub/cache', is_dir=True) is True
+    assert rules.match('/data/sub/cache', is_dir=False) is None
+    assert rules.match('/data/build', is_dir=True) is True
+    assert rules.match('/data/sub/build', is_dir=True) is None
+    assert rules.match('/data/docs/a/b/x.tmp', is_dir=False) is True
+    assert rules.match('/data/docs/x.tmp', is_dir=False) is True
+    assert rules.match('/data/web/node_modules', is_dir=True) is True
+    assert rules.match('/other/app.log', is_dir=False) is None
+
+
+def test_ignore_matcher():
+    matcher = IgnoreMatcher(['/srv/app/tmp/*', '*/.git/*'], root='/hostroot/srv/app', host_root='/srv/app')
+    assert matcher.host_path('/hostroot/srv/app/x') == '/srv/app/x'
+    assert matcher('/hostroot/srv/app/tmp/file', is_dir=False)
+    assert matcher('/hostroot/srv/app/.git', is_dir=True)
+    assert not matcher('/hostroot/srv/app/.git', is_dir=False)
+    assert not matcher('/hostroot/srv/app/src', is_dir=True)
+
+    # deeper ignore files override upper ones
+    upper = IgnoreRules('/hostroot/srv/app', ['*.log'])
+    lower = IgnoreRules('/hostroot/srv/app/logs', ['!*.log'])
+    assert matcher('/hostroot/srv/app/a.log', False, (upper,))
+    assert not matcher('/hostroot/srv/app/logs/a.log', False, (upper, lower))
+
+    assert matcher.du_exclude() == ['/hostroot/srv/app/tmp/*', '*/.git/*']
+    assert IgnoreMatcher(['/home/*']).du_exclude() == []
+
+
+def test_walk_ignore(tmp_path):
+    (tmp_path / 'file').write_bytes(b'x' * 10)
+    (tmp_path / '.git').mkdir()
+    (tmp_path / '.git' / 'objects').write_bytes(b'x' * 1000)
+    (tmp_path / 'app').mkdir()
+    (tmp_path / 'app' / 'debug.log').write_bytes(b'x' * 100)
+    (tmp_path / 'app' / 'main.py').write_bytes(b'x' * 5)
+    (tmp_path / 'app' / '.dokuignore').write_text('*.log\n')
+
+    matcher = IgnoreMatcher(['*/.git/*'], root=str(tmp_path), host_root='/srv')
+    stats = walk(tmp_path, sleep_duration=0, is_stop=lambda: False, ignore=matcher)
+    assert stats.size == 10 + 5 + len('*.log\n')
+    assert stats.ignored == 2
+
+    matcher = IgnoreMatcher([], ignore_files=False)
+    stats = walk(tmp_path, sleep_duration=0, is_stop=lambda: False, ignore=matcher)
+    assert stats.size == 10 + 1000 + 100 + 5 + len('*.log\n')
+    assert stats.ignored == 0
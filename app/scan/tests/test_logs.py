@@ -0,0 +1,274 @@
+import gzip
+import re
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+import scan.logs
+from scan.logs import (
+    LogProbes,
+    LogRateMonitor,
+    LogUsage,
+    file_chunks,
+    gzip_chunks,
+    heatmap,
+    line_time,
+    log_segments,
+    tail_follow,
+    log_usage,
+    search,
+    tail,
+    tail_offset,
+    time_offset,
+)
+
+
+def test_log_usage_json_file(tmp_path):
+    id_ = 'a' * 64
+    (tmp_path / f'{id_}-json.log').write_bytes(b'x' * 100)
+    (tmp_path / f'{id_}-json.log.1').write_bytes(b'x' * 50)
+    (tmp_path / f'{id_}-json.log.2').write_bytes(b'x' * 40)
+    (tmp_path / f'{id_}-json.log.3.gz').write_bytes(b'x' * 10)
+    (tmp_path / 'hostconfig.json').write_bytes(b'x' * 1000)
+
+    usage = log_usage(tmp_path, id_)
+    assert usage == LogUsage(path=f'{id_}-json.log', live=100, rotated=90, compressed=10, files=4)
+    assert usage.size == 200
+
+
+def test_log_usage_local(tmp_path):
+    id_ = 'b' * 64
+    (tmp_path / 'local-logs').mkdir()
+    (tmp_path / 'local-logs' / 'container.log').write_bytes(b'x' * 100)
+    (tmp_path / 'local-logs' / 'container.log.1.gz').write_bytes(b'x' * 20)
+
+    usage = log_usage(tmp_path, id_)
+    assert usage == LogUsage(path='local-logs/container.log', live=100, rotated=0, compressed=20, files=2)
+
+
+def test_log_usage_none(tmp_path):
+    (tmp_path / 'hostconfig.json').write_bytes(b'{}')
+    assert log_usage(tmp_path, 'c' * 64) is None
+    assert log_usage(tmp_path / 'missing', 'c' * 64) is None
+
+
+def test_log_rate_monitor(tmp_path):
+    fast, slow = tmp_path / 'fast.log', tmp_path / 'slow.log'
+    fast.write_bytes(b'')
+    slow.write_bytes(b'')
+    paths = {'fast': fast, 'slow': slow, 'missing': tmp_path / 'missing.log'}
+    monitor = LogRateMonitor(half_life=10, history=3)
+
+    monitor.sample(paths, now=0)  # baseline
+    assert set(monitor.rates) == {'fast', 'slow'}
+    assert monitor.rates['fast'].rate == 0
+
+    fast.write_bytes(b'x' * 1000)
+    slow.write_bytes(b'x' * 10)
+    monitor.sample(paths, now=10)
+    # a sample weighs half after a half-life
+    assert monitor.rates['fast'].rate == 50
+    assert monitor.rates['slow'].rate == 0.5
+    assert [key for key, _ in monitor.top(1)] == ['fast']
+
+    # rotated: all the bytes of the new file are new
+    fast.unlink()
+    fast.write_bytes(b'x' * 100)
+    monitor.sample(paths, now=20)
+    assert list(monitor.rates['fast'].history) == [100, 10]
+    assert monitor.rates['fast'].rate == 30
+
+    for now in (30, 40):
+        monitor.sample(paths, now=now)
+    assert len(monitor.rates['fast'].history) == 3  # ring buffer
+
+    # removed containers are forgotten once missing from a few samples
+    history = list(monitor.rates['fast'].history)
+    monitor.sample({'slow': slow}, now=50)
+    monitor.sample(paths, now=60)
+    assert list(monitor.rates['fast'].history)[:-1] == history[1:]  # not reset by a missed sample
+    for now in (70, 80):
+        monitor.sample({'slow': slow}, now=now)
+    assert set(monitor.rates) == {'fast', 'slow'}
+    monitor.sample({'slow': slow}, now=90)
+    assert set(monitor.rates) == {'slow'}
+
+
+def test_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan.logs, 'BLOCK_SIZE', 7)  # lines across blocks
+    path = tmp_path / 'json.log'
+    lines = [f'{{"log":"line {i}"}}\n'.encode() for i in range(10)]
+    path.write_bytes(b''.join(lines))
+
+    assert list(tail(path, 3)) == lines[-3:]
+    assert list(tail(path, 100)) == lines
+    assert list(tail(path, 0)) == []
+
+    with path.open('rb') as fd:
+        assert tail_offset(fd, 1, path.stat().st_size) == path.stat().st_size - len(lines[-1])
+
+    # a last line without a newline yet
+    path.write_bytes(b''.join(lines) + b'{"log":')
+    assert list(tail(path, 2)) == [lines[-1], b'{"log":\n']
+
+    (tmp_path / 'empty.log').write_bytes(b'')
+    assert list(tail(tmp_path / 'empty.log', 10)) == []
+
+
+@pytest.mark.asyncio
+async def test_tail_follow(tmp_path):
+    path = tmp_path / 'json.log'
+    path.write_bytes(b'a\nb\n')
+    # an empty chunk after every poll without new lines
+    lines = tail_follow(path, 1, poll=0, idle=0)
+    assert await lines.__anext__() == b'b\n'
+    assert await lines.__anext__() == b''
+
+    with path.open('ab') as fd:
+        fd.write(b'c\nd')
+    assert await lines.__anext__() == b'c\n'
+    with path.open('ab') as fd:
+        fd.write(b'\n')
+    assert await lines.__anext__() == b'd\n'
+
+    # rotated
+    path.rename(tmp_path / 'json.log.1')
+    path.write_bytes(b'e\n')
+    assert await lines.__anext__() == b'e\n'
+
+    # truncated
+    path.write_bytes(b'')
+    assert await lines.__anext__() == b''
+    path.write_bytes(b'f\ng\n')
+    assert await lines.__anext__() == b'f\ng\n'  # the lines read at once are sent together
+    await lines.aclose()
+
+
+T0 = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def log_line(minute: int, message: str = 'line') -> bytes:
+    ts = (T0 + timedelta(minutes=minute)).isoformat().replace('+00:00', '.123456789Z')
+    return f'{{"log":"{message} {minute}\\n","stream":"stdout","time":"{ts}"}}\n'.encode()
+
+
+def test_time_offset(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan.logs, 'BLOCK_SIZE', 16)
+    path = tmp_path / 'json.log'
+    lines = [log_line(minute) for minute in range(0, 100, 2)]
+    path.write_bytes(b''.join(lines))
+    assert line_time(lines[0]) == T0 + timedelta(microseconds=123456)
+    assert line_time(b'{"log":"x"}') is None
+
+    end = path.stat().st_size
+    with path.open('rb') as fd:
+        for minute in (-1, 0, 1, 2, 51, 98, 99, 200):
+            expected = next(
+                (i for i, line in enumerate(lines) if line_time(line) >= T0 + timedelta(minutes=minute)), 50
+            )
+            assert time_offset(fd, T0 + timedelta(minutes=minute), end) == sum(map(len, lines[:expected]))
+
+
+def test_search(tmp_path):
+    path = tmp_path / 'id-json.log'
+    with gzip.open(tmp_path / 'id-json.log.2.gz', 'wb') as fd:
+        fd.write(b''.join(log_line(minute) for minute in range(0, 10)))
+    (tmp_path / 'id-json.log.1').write_bytes(b''.join(log_line(minute) for minute in range(10, 20)))
+    path.write_bytes(b''.join(log_line(minute, 'error' if minute % 5 else 'ok') for minute in range(20, 30)))
+    assert [p.name for p in log_segments(path)] == ['id-json.log.2.gz', 'id-json.log.1', 'id-json.log']
+
+    def minutes(lines):
+        return [int(re.search(rb'"\w+ (\d+)', line).group(1)) for line in lines]
+
+    assert minutes(search(path)) == list(range(30))
+    assert minutes(search(path, T0 + timedelta(minutes=8), T0 + timedelta(minutes=12))) == [8, 9, 10, 11]
+    assert minutes(search(path, since=T0 + timedelta(minutes=25))) == [25, 26, 27, 28, 29]
+    assert minutes(search(path, until=T0 + timedelta(minutes=2))) == [0, 1]
+    assert minutes(search(path, pattern=re.compile(rb'"error'))) == [21, 22, 23, 24, 26, 27, 28, 29]
+    assert minutes(search(path, pattern=re.compile(rb'"error'), limit=2)) == [21, 22]
+
+
+def test_heatmap(tmp_path):
+    path = tmp_path / 'id-json.log'
+    with gzip.open(tmp_path / 'id-json.log.1.gz', 'wb') as fd:
+        fd.write(b''.join(log_line(minute) for minute in range(0, 10)))
+    # quiet, then a burst of lines in minute 15
+    lines = [log_line(minute) for minute in range(10, 15)] + [log_line(15, 'x' * 200)] * 50
+    path.write_bytes(b''.join(lines))
+
+    cache = LogProbes(max_probes=8, min_stride=64)
+    hours = T0 + timedelta(minutes=20)
+    buckets = heatmap(path, T0, hours, 60, cache)
+    assert len(buckets) == 20
+    # bytes are rounded per bucket
+    size = path.stat().st_size + (tmp_path / 'id-json.log.1.gz').stat().st_size
+    assert abs(sum(buckets) - size) <= len(buckets)
+    assert max(range(20), key=lambda i: buckets[i]) == 15
+    assert buckets[15] > sum(map(len, lines[5:])) * 0.8
+    assert abs(sum(buckets[:10]) - (tmp_path / 'id-json.log.1.gz').stat().st_size) <= 10
+    assert sum(buckets[16:]) == 0
+
+    # appended lines are probed, the previous probes are kept
+    probes = cache.files[path]
+    previous = list(probes.points)
+    assert len(previous) <= 2 * 8
+    with path.open('ab') as fd:
+        fd.write(b''.join(log_line(17, 'y' * 100) for _ in range(20)))
+    buckets = heatmap(path, T0, hours, 60, cache)
+    assert cache.files[path] is probes
+    assert probes.points[: len(previous)] == previous
+    assert buckets[17] > 0
+
+    # the stride doubles to keep the number of probes bounded
+    stride = probes.stride
+    with path.open('ab') as fd:
+        fd.write(b''.join(log_line(18, 'z' * 100) for _ in range(500)))
+    heatmap(path, T0, hours, 60, cache)
+    assert len(probes.points) <= 2 * 8
+    assert probes.stride > stride
+
+    # rotated: probed again
+    path.rename(tmp_path / 'id-json.log.2')
+    path.write_bytes(log_line(19))
+    heatmap(path, T0, hours, 60, cache)
+    assert cache.files[path] is not probes
+
+    # the probes of other containers are kept, those of removed segments are dropped
+    other = tmp_path / 'other' / 'other-json.log'
+    other.parent.mkdir()
+    other.write_bytes(log_line(1))
+    heatmap(other, T0, hours, 60, cache)
+    (tmp_path / 'id-json.log.2').unlink()
+    heatmap(path, T0, hours, 60, cache)
+    assert other in cache.files
+    assert tmp_path / 'id-json.log.2' not in cache.files
+
+    # the least recently used files are dropped
+    cache.max_files = 2
+    heatmap(other, T0, hours, 60, cache)
+    assert list(cache.files) == [path, other]
+
+
+def test_file_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan.logs, 'STREAM_BLOCK_SIZE', 7)
+    path = tmp_path / 'json.log'
+    path.write_bytes(b'0123456789' * 3)
+    fd = path.open('rb')
+    size = path.stat().st_size
+    with path.open('ab') as log:
+        log.write(b'written during the download')
+    # the bytes up to the size when the download started, even if the file grows
+    assert b''.join(file_chunks(fd, 0, size)) == b'0123456789' * 3
+    assert fd.closed
+    assert b''.join(file_chunks(path.open('rb'), 5, 12)) == b'5678901'
+
+
+def test_gzip_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan.logs, 'STREAM_BLOCK_SIZE', 1000)
+    path = tmp_path / 'json.log'
+    data = b''.join(log_line(minute) for minute in range(100))
+    path.write_bytes(data)
+    assert gzip.decompress(b''.join(gzip_chunks(path))) == data
+
+    (tmp_path / 'empty.log').write_bytes(b'')
+    assert gzip.decompress(b''.join(gzip_chunks(tmp_path / 'empty.log'))) == b''
@@ -0,0 +1,39 @@
+import os
+from pathlib import Path
+
+from scan.procfs import container_id, open_deleted_files, process_name
+
+
+def test_open_deleted_files(tmp_path):
+    path = tmp_path / 'app.log'
+    kept = tmp_path / 'kept.log'
+    with path.open('wb') as fd, kept.open('wb'):
+        fd.write(b'x' * 10000)
+        fd.flush()
+        path.unlink()
+
+        files = [file for file in open_deleted_files(Path('/proc'), lambda: False) if file.pid == os.getpid()]
+        assert [(file.path, file.size) for file in files] == [(str(path), 10000)]
+        assert files[0].allocated >= 0  # may be 0 on filesystems that allocate lazily
+        assert files[0].ino == os.fstat(fd.fileno()).st_ino
+
+    assert not [file for file in open_deleted_files(Path('/proc'), lambda: False) if file.pid == os.getpid()]
+    assert open_deleted_files(tmp_path / 'missing', lambda: False) == []
+
+
+def test_container_id(tmp_path):
+    id_ = 'a' * 64
+    (tmp_path / '1').mkdir()
+    (tmp_path / '1' / 'cgroup').write_text('0::/init.scope\n')
+    (tmp_path / '2').mkdir()
+    (tmp_path / '2' / 'cgroup').write_text(f'0::/system.slice/docker-{id_}.scope\n')
+    (tmp_path / '3').mkdir()
+    (tmp_path / '3' / 'cgroup').write_text(f'12:memory:/docker/{id_}\n11:cpu:/docker/{id_}\n')
+    (tmp_path / '3' / 'comm').write_text('nginx\n')
+
+    assert container_id(tmp_path, 1) is None
+    assert container_id(tmp_path, 2) == id_
+    assert container_id(tmp_path, 3) == id_
+    assert container_id(tmp_path, 4) is None
+    assert process_name(tmp_path, 3) == 'nginx'
+    assert process_name(tmp_path, 4) == ''
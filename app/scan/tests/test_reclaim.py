@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta, UTC
+
+import settings
+from contrib.types import (
+    DockerBuildCache,
+    DockerContainer,
+    DockerContainerLog,
+    DockerImage,
+    DockerOverlay2Layer,
+    DockerVolume,
+)
+from scan.reclaim import ACTIONS, DAY, MIN_KEEP_STORAGE, PRUNE_AGES, build_cache_curve, reclaimable
+
+
+NOW = datetime(2024, 1, 1, tzinfo=UTC)
+MiB = 1024 * 1024
+
+
+def image(id_: str, size: int, shared_size: int, tags: list[str], containers: list[str] | None = None):
+    return DockerImage.model_validate(
+        {'Id': id_, 'Created': NOW, 'Size': size, 'SharedSize': shared_size, 'RepoTags': tags}
+        | {'containers': containers or []}
+    )
+
+
+def container(id_: str, state: str, size_rw: int, image_id: str = 'sha256:img'):
+    return DockerContainer.model_validate({
+        'Id': id_ * 64,
+        'Image': 'img',
+        'ImageID': image_id,
+        'Created': NOW,
+        'SizeRw': size_rw,
+        'State': state,
+    })
+
+
+def log(id_: str, size: int):
+    return DockerContainerLog(id=(id_ * 64)[:12], name=id_, image='img', path=f'/{id_}.log', size=size, last_scan=NOW)
+
+
+def cache(id_: str, size: int, last_used: datetime, in_use=False, shared=False):
+    return DockerBuildCache.model_validate({
+        'ID': id_,
+        'Type': 'regular',
+        'Size': size,
+        'InUse': in_use,
+        'Shared': shared,
+        'CreatedAt': last_used,
+        'LastUsedAt': last_used,
+    })
+
+
+def layer(id_: str, size: int, in_use: bool):
+    return DockerOverlay2Layer(
+        id=id_,
+        created=NOW,
+        diff_root='',
+        err=False,
+        size=size,
+        scan_in_progress=False,
+        last_scan=NOW,
+        in_use=in_use,
+    )
+
+
+def test_reclaimable():
+    old = NOW - timedelta(seconds=settings.RECLAIM_BUILD_CACHE_AGE + 1)
+    rows = reclaimable(
+        images=[
+            image('sha256:a', 100, 40, []),
+            image('sha256:b', 100, 0, ['<none>:<none>'], containers=['web']),  # used by a container
+            image('sha256:c', 100, 0, ['nginx:latest']),
+            image('sha256:d', 30, 0, [], containers=['old', 'older']),  # used by stopped containers only
+        ],
+        containers=[
+            container('a', 'exited', 10),
+            container('b', 'running', 20, image_id='sha256:b'),
+            container('c', 'exited', 0, image_id='sha256:b'),
+            container('d', 'exited', 0, image_id='sha256:d'),
+            container('e', 'created', 0, image_id='sha256:d'),
+        ],
+        volumes=[
+            DockerVolume.model_validate({
+                'Name': 'a',
+                'Driver': 'local',
+                'CreatedAt': NOW,
+                'UsageData': {'Size': 5, 'RefCount': 0},
+            }),
+            DockerVolume.model_validate({
+                'Name': 'b',
+                'Driver': 'local',
+                'CreatedAt': NOW,
+                'UsageData': {'Size': 7, 'RefCount': 1},
+            }),
+            DockerVolume.model_validate({
+                'Name': 'c',
+                'Driver': 'nfs',
+                'CreatedAt': NOW,
+                'UsageData': {'Size': -1, 'RefCount': 0},
+            }),
+        ],
+        build_cache=[
+            cache('old', 30, old),
+            cache('recent', 50, NOW),
+            cache('used', 70, old, in_use=True),
+        ],
+        logs=[log('a', 200 * MiB), log('b', 300 * MiB), log('c', 1)],
+        layers=[layer('x', 1000, False), layer('y', 1000, True), layer('z', 0, False)],
+        now=NOW,
+    )
+    by_action = {row.action: row for row in rows}
+
+    assert [row.action for row in rows] == list(ACTIONS)
+    assert (by_action['dangling_images'].items, by_action['dangling_images'].size) == (2, 60 + 30)
+    assert (by_action['stopped_containers'].items, by_action['stopped_containers'].size) == (4, 10 + 200 * MiB + 1)
+    assert (by_action['unused_volumes'].items, by_action['unused_volumes'].size) == (2, 5)
+    assert (by_action['build_cache'].items, by_action['build_cache'].size) == (1, 30)
+
+    # the log of the stopped container is freed by removing the container already
+    assert by_action['large_logs'].size == 500 * MiB
+    assert by_action['large_logs'].exclusive == 300 * MiB
+
+    # the build cache is kept in unused layers
+    assert (by_action['unused_overlay2'].items, by_action['unused_overlay2'].size) == (2, 1000)
+    assert by_action['unused_overlay2'].exclusive == 1000 - (30 + 50 + 70)
+
+
+def test_reclaimable_empty():
+    rows = reclaimable([], [], [], [], [], [], now=NOW)
+    assert [(row.items, row.size, row.exclusive) for row in rows] == [(0, 0, 0)] * len(ACTIONS)
+
+    # more build cache than unused layers, e.g. of another builder
+    rows = reclaimable([], [], [], [cache('old', 100, NOW)], [], [layer('x', 10, False)], now=NOW)
+    assert rows[-1].exclusive == 0
+
+
+def test_build_cache_curve():
+    GiB = 1024 * MiB
+    records = [
+        cache('oldest', 1 * GiB, NOW - timedelta(days=40)),
+        cache('shared', 1 * GiB, NOW - timedelta(days=20), shared=True),
+        cache('old', 2 * GiB, NOW - timedelta(days=10)),
+        cache('recent', 4 * GiB, NOW - timedelta(hours=2)),
+        cache('used', 9 * GiB, NOW - timedelta(days=50), in_use=True),
+    ]
+    curve = build_cache_curve(records, now=NOW)
+
+    assert (curve.records, curve.total, curve.in_use, curve.shared) == (5, 17 * GiB, 9 * GiB, 1 * GiB)
+    freed_by_age = dict(zip(curve.ages, curve.freed_by_age))
+    assert curve.ages == list(PRUNE_AGES)
+    assert freed_by_age[0] == 7 * GiB  # everything not in use nor shared
+    assert freed_by_age[DAY] == 3 * GiB
+    assert freed_by_age[14 * DAY] == 1 * GiB
+    assert freed_by_age[90 * DAY] == 0
+
+    # the least recently used records first, the shared one frees nothing
+    freed_by_limit = dict(zip(curve.limits, curve.freed_by_limit))
+    assert curve.limits[0] == 0 and curve.limits[1] == MIN_KEEP_STORAGE
+    assert curve.limits[-1] >= curve.total
+    assert freed_by_limit[0] == 7 * GiB  # the records in use are kept anyway
+    assert freed_by_limit[32 * GiB] == 0
+    assert freed_by_limit[16 * GiB] == 1 * GiB  # the oldest record
+    assert freed_by_limit[8 * GiB] == 7 * GiB  # can't fit with the records in use
+    assert curve.limits[-1] == 32 * GiB
+
+    empty = build_cache_curve([], now=NOW)
+    assert (empty.limits, empty.freed_by_limit) == ([0, MIN_KEEP_STORAGE], [0, 0])
@@ -0,0 +1,112 @@
+from datetime import datetime, UTC
+
+from contrib.types import DockerBindMounts, DockerContainer, DockerContainerLog, DockerImage, DockerVolume
+from scan.rollup import NO_LABEL, SHARED, _digest, footprints, rollups
+
+
+NOW = datetime(2024, 1, 1, tzinfo=UTC)
+PROJECT = 'com.docker.compose.project'
+
+
+def container(name: str, project: str | None, size_rw: int):
+    return DockerContainer.model_validate({
+        'Id': name * 64,
+        'Names': [f'/{name}'],
+        'Image': 'img',
+        'ImageID': 'sha256:img',
+        'Created': NOW,
+        'SizeRw': size_rw,
+        'Labels': {PROJECT: project} if project else {},
+    })
+
+
+def image(id_: str, size: int, shared_size: int, containers: list[str]):
+    return DockerImage.model_validate(
+        {'Id': id_, 'Created': NOW, 'Size': size, 'SharedSize': shared_size} | {'containers': containers}
+    )
+
+
+def volume(name: str, size: int, containers: list[str], project: str | None = None):
+    return DockerVolume.model_validate(
+        {
+            'Name': name,
+            'Driver': 'local',
+            'CreatedAt': NOW,
+            'UsageData': {'Size': size, 'RefCount': len(containers)},
+            'Labels': {PROJECT: project} if project else None,
+        }
+        | {'containers': containers}
+    )
+
+
+def bind_mount(path: str, size: int, containers: list[str]):
+    return DockerBindMounts(
+        path=path, err=False, size=size, scan_in_progress=False, last_scan=NOW, containers=containers
+    )
+
+
+def test_rollups():
+    rows = rollups(
+        PROJECT,
+        images=[
+            image('sha256:a', 100, 30, ['w', 'd']),  # one project
+            image('sha256:b', 50, 0, ['w', 'c']),  # two projects
+            image('sha256:c', 20, 0, []),  # unused
+        ],
+        containers=[container('w', 'shop', 1), container('d', 'shop', 2), container('c', 'batch', 4)],
+        volumes=[
+            volume('data', 1000, ['d']),
+            volume('cache', 500, [], project='batch'),  # labeled by compose, not used
+            volume('tmp', 7, ['c', 'w']),
+        ],
+        bind_mounts=[bind_mount('/srv/shop', 10, ['w']), bind_mount('/srv/shared', 20, ['w', 'c'])],
+        logs=[
+            DockerContainerLog(id=('w' * 64)[:12], name='w', image='img', path='/w.log', size=5, last_scan=NOW),
+            DockerContainerLog(id='gone', name='gone', image='img', path='/gone.log', size=3, last_scan=NOW),
+        ],
+    )
+    by_value = {row.value: row for row in rows}
+    shop, batch, shared, none = by_value['shop'], by_value['batch'], by_value[SHARED], by_value[NO_LABEL]
+
+    counts = {'containers', 'images', 'writable', 'volumes', 'bind_mounts', 'logs'}
+    assert shop.model_dump(include=counts) == {
+        'containers': 2,
+        'images': 70,
+        'writable': 3,
+        'volumes': 1000,
+        'bind_mounts': 10,
+        'logs': 5,
+    }
+    assert (batch.containers, batch.writable, batch.volumes) == (1, 4, 500)
+    assert (shared.images, shared.volumes, shared.bind_mounts) == (50, 7, 20)
+    assert (none.images, none.logs) == (20, 3)
+    assert shop.key == f'{PROJECT}=shop'
+    assert shop.total == 70 + 3 + 1000 + 10 + 5
+
+    # every byte counted once
+    assert sum(row.total for row in rows) == (70 + 50 + 20) + (1 + 2 + 4) + (1000 + 500 + 7) + (10 + 20) + (5 + 3)
+
+
+def test_footprints():
+    images = [image('sha256:a', 100, 30, ['w']), image('sha256:b', 50, 0, ['w', 'c']), image('sha256:c', 20, 0, [])]
+    containers = [container('w', 'shop', 1), container('c', None, 4)]
+    volumes = [volume('data', 1000, ['w']), volume('tmp', 7, ['c', 'w']), volume('unused', 9, [])]
+    bind_mounts = [bind_mount('/srv/shop', 10, ['w', 'gone']), bind_mount('/srv/shared', 20, ['w', 'c'])]
+    logs = [DockerContainerLog(id=('c' * 64)[:12], name='c', image='img', path='/c.log', size=5, last_scan=NOW)]
+
+    rows = footprints(images, containers, volumes, bind_mounts, logs)
+    by_name = {row.name: row for row in rows}
+    w, c = by_name['w'], by_name['c']
+
+    assert (w.id, w.image) == (('w' * 64)[:12], 'img')
+    assert (w.images, w.writable, w.logs, w.volumes, w.bind_mounts) == (70, 1, 0, 1000, 10)
+    assert w.total == 70 + 1 + 1000 + 10
+    assert w.shared == c.shared == 50 + 7 + 20
+    assert (c.images, c.writable, c.logs, c.volumes, c.bind_mounts, c.total) == (0, 4, 5, 0, 0, 9)
+
+    # scan timestamps don't change the inputs, sizes do
+    digest = _digest(images, containers, volumes, bind_mounts, logs)
+    logs[0].last_scan = datetime.now(UTC)
+    assert _digest(images, containers, volumes, bind_mounts, logs) == digest
+    logs[0].size += 1
+    assert _digest(images, containers, volumes, bind_mounts, logs) != digest
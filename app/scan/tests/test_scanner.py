@@ -1,11 +1,15 @@
+from datetime import datetime, timedelta, UTC
 from pathlib import Path
 from unittest.mock import MagicMock, patch, call, ANY
 
 import pytest
+from peewee import SqliteDatabase
+from playhouse.kv import KeyValue
 from docker.models.images import Image
 from docker.models.containers import Container
 
 from contrib.types import (
+    AgeHistogram,
     DockerMount,
     DockerImageList,
     DockerContainerList,
@@ -14,8 +18,26 @@ from contrib.types import (
     DockerContainerLog,
     DockerBindMounts,
     DockerOverlay2Layer,
+    EntryCounts,
+    LargestEntry,
+    ScanDetails,
+    ScanStats,
+)
+import settings
+from contrib import kvstore
+from scan.collectors import CompressionCollector
+from scan.estimate import SizeEstimate
+from settings import ScanStrategy
+from scan.walker import WalkStats
+from scan.scanner import (
+    BaseScanner,
+    SystemDFScanner,
+    LogfilesScanner,
+    LogRateScanner,
+    BindMountsScanner,
+    Overlay2Scanner,
+    VolumesScanner,
 )
-from scan.scanner import BaseScanner, SystemDFScanner, LogfilesScanner, BindMountsScanner, Overlay2Scanner
 
 
 @pytest.fixture
@@ -145,40 +167,44 @@ def test_system_df_scanner(mock_docker_client, docker_mount):
         )
 
 
-def test_logfiles_scanner(mock_docker_client, mock_is_stop, docker_mount):
-    short_id = '7d2de847bebae847b'
+def test_logfiles_scanner(mock_docker_client, mock_is_stop, docker_mount, tmp_path):
+    id_ = '7d2de847bebae847b' + 'a' * 47
+    short_id = id_[:12]
     name = 'container1'
-    log_path = '/var/lib/docker/containers/7d2de847bebae847b-json.log'
+    log_path = f'/var/lib/docker/containers/{id_}/{id_}-json.log'
     image = 'nginx:latest'
-    st_size = 1024 * 10
+
+    # live, rotated and compressed log files
+    (tmp_path / id_).mkdir()
+    (tmp_path / id_ / f'{id_}-json.log').write_bytes(b'x' * 1024 * 10)
+    (tmp_path / id_ / f'{id_}-json.log.1').write_bytes(b'x' * 1024 * 5)
+    (tmp_path / id_ / f'{id_}-json.log.2.gz').write_bytes(b'x' * 1024)
+    (tmp_path / id_ / 'config.v2.json').write_bytes(b'{}')
 
     # mock container data
     mock_container = MagicMock(spec=Container)
+    mock_container.id = id_
     mock_container.short_id = short_id
-    mock_container.name = name
-    mock_container.attrs = {'LogPath': log_path}
-
-    mock_image = MagicMock(spec=Image)
-    mock_image.tags = [image]
-    mock_container.image = mock_image
+    mock_container.attrs = {'Id': id_, 'Names': [f'/{name}'], 'ImageID': 'sha256:abc'}
 
     mock_docker_client.containers.list.return_value = [mock_container]
+    mock_docker_client.api.images.return_value = [{'Id': 'sha256:abc', 'RepoTags': [image]}]
 
     with (
         patch('scan.scanner.docker_from_env', return_value=mock_docker_client),
         patch('scan.scanner.doku_mounts', return_value=[docker_mount]),
-        patch('scan.scanner.map_host_path_to_container') as mock_map_path,
+        patch('scan.scanner.map_host_path_to_container', return_value=tmp_path) as mock_map_path,
         patch('scan.scanner.kvstore.set') as mock_kvstore_set,
+        patch('scan.scanner.update_reclaimable'),
     ):
-        mock_path = MagicMock(spec=Path)
-        mock_path.stat.return_value.st_size = st_size
-        mock_map_path.return_value = mock_path
-
         scanner = LogfilesScanner(mock_is_stop)
         scanner.client = mock_docker_client
         scanner.scan()
 
-        mock_docker_client.containers.list.assert_called_once_with(all=True)
+        # no inspect of containers nor images
+        mock_docker_client.containers.list.assert_called_once_with(all=True, sparse=True)
+        mock_docker_client.api.images.assert_called_once_with()
+        mock_docker_client.images.list.assert_not_called()
 
         # check what was stored in the kvstore
         obj = DockerContainerLog.model_validate({
@@ -186,16 +212,35 @@ def test_logfiles_scanner(mock_docker_client, mock_is_stop, docker_mount):
             'name': name,
             'image': image,
             'path': log_path,
-            'size': st_size,
+            'size': 1024 * 16,
+            'live': 1024 * 10,
+            'rotated': 1024 * 5,
+            'compressed': 1024,
+            'files': 3,
             'last_scan': '2023-01-01T12:00:00Z',
         })
         obj.last_scan = ANY
-        mock_kvstore_set.assert_called_once_with(mock_container.short_id, obj, ANY)
+        mock_kvstore_set.assert_called_once_with(short_id, obj, ANY)
 
         mock_map_path.return_value = None
         scanner.scan()
 
 
+def test_log_rate_scanner_run(mock_docker_client, docker_mount):
+    is_stop = MagicMock(side_effect=[False] * 6 + [True] * 2)
+    with (
+        patch('scan.scanner.docker_from_env', return_value=mock_docker_client),
+        patch('scan.scanner.doku_mounts', return_value=[docker_mount]),
+        patch('scan.scanner.settings.SCAN_LOG_RATE_INTERVAL', 0),
+        patch.object(LogRateScanner, 'scan', side_effect=[OSError('disk gone'), None, None]) as mock_scan,
+    ):
+        scanner = LogRateScanner(is_stop)
+        scanner.run()
+
+    # a failed sample doesn't stop the monitor
+    assert mock_scan.call_count == 3
+
+
 def test_bind_mounts_scanner(mock_docker_client, mock_is_stop, docker_mount):
     # mock Doku container
     doku_container = MagicMock(spec=Container)
@@ -233,6 +278,7 @@ def test_bind_mounts_scanner(mock_docker_client, mock_is_stop, docker_mount):
         patch('scan.scanner.doku_mounts', return_value=[docker_mount]),
         patch('scan.scanner.map_host_path_to_container') as mock_map_path,
         patch('scan.scanner.kvstore.set') as mock_kvstore_set,
+        patch('scan.scanner.walk', return_value=WalkStats()),
     ):
         mock_path = MagicMock(spec=Path)
         mock_path.stat.return_value.st_size = 2048
@@ -254,8 +300,14 @@ def test_bind_mounts_scanner(mock_docker_client, mock_is_stop, docker_mount):
             scan_in_progress=False,
             last_scan='2023-01-01T12:00:00Z',
             containers=['container1', 'container1'],
+            strategy='auto',
         )
         obj.last_scan = ANY
+        obj.backend = ANY
+        obj.backend_reason = ANY
+        obj.last_exact_scan = ANY
+        obj.last_walk = ANY
+        obj.fstype = ANY
 
         mock_kvstore_set.assert_has_calls(
             [
@@ -337,7 +389,7 @@ def test_overlay2_scanner(mock_docker_client, mock_is_stop, docker_mount, mock_d
         patch('scan.scanner.map_host_path_to_container') as mock_map_path,
         patch('pathlib.Path.exists', return_value=True),
         patch('scan.scanner.diff_subdirs', side_effect=mock_diff_subdirs),
-        patch('scan.scanner.get_size') as mock_get_size,
+        patch('scan.scanner.get_stats') as mock_get_stats,
         patch('scan.scanner.kvstore.set') as mock_kvstore_set,
     ):
         # mock for map_host_path_to_container
@@ -360,9 +412,13 @@ def test_overlay2_scanner(mock_docker_client, mock_is_stop, docker_mount, mock_d
 
         scanner.overlay2_dir.iterdir.return_value = [overlay2_iterdir_0, overlay2_iterdir_1]
 
-        mock_get_size.side_effect = [1024, Exception('Failed to get size')]
+        mock_get_stats.side_effect = [WalkStats(size=1024, files=3, dirs=1), Exception('Failed to get size')]
         scanner.scan()
 
+        # the details of overlay2 layers are opt-in, the layers are walked to estimate their compressibility
+        collectors = mock_get_stats.call_args.kwargs['collectors']
+        assert [type(c) for c in collectors] == [CompressionCollector]
+
         # verify method calls
         mock_docker_client.containers.list.assert_called_once_with(all=True)
         mock_docker_client.images.list.assert_called_once()
@@ -376,6 +432,8 @@ def test_overlay2_scanner(mock_docker_client, mock_is_stop, docker_mount, mock_d
             scan_in_progress=False,
             last_scan='2023-01-01T12:00:00Z',
             in_use=False,
+            files=3,
+            dirs=1,
         )
         overlay2_1.last_scan = ANY
         overlay2_1.created = ANY
@@ -407,3 +465,239 @@ def test_overlay2_scanner(mock_docker_client, mock_is_stop, docker_mount, mock_d
         # test when path mapping returns None
         mock_map_path.return_value = None
         scanner.scan()
+
+
+def test_overlay2_scanner_stale_compression():
+    now = datetime.now(UTC)
+    obj = DockerOverlay2Layer(
+        id='abc123', created=now, diff_root='/', err=False, size=0, scan_in_progress=True, last_scan=now, in_use=True
+    )
+    details = ScanDetails(key='abc123', last_scan=now - timedelta(seconds=60))
+
+    assert Overlay2Scanner.stale_compression(obj, None)
+    with patch('settings.SCAN_DETAILS_INTERVAL', 3600):
+        assert not Overlay2Scanner.stale_compression(obj, details)
+    with patch('settings.SCAN_DETAILS_INTERVAL', 60):
+        assert Overlay2Scanner.stale_compression(obj, details)
+
+
+def test_bind_mounts_scanner_estimate(mock_docker_client, mock_is_stop, docker_mount):
+    with (
+        patch('scan.scanner.docker_from_env', return_value=mock_docker_client),
+        patch('scan.scanner.doku_mounts', return_value=[docker_mount]),
+        patch('scan.scanner.settings.BINDMOUNT_ESTIMATE_PATTERNS', ['/mnt/nfs/*']),
+        patch('scan.scanner.estimate_size') as mock_estimate_size,
+        patch('scan.scanner.get_size', return_value=3000),
+    ):
+        scanner = BindMountsScanner(mock_is_stop)
+        assert scanner.should_estimate_path('/mnt/nfs/share')
+        assert not scanner.should_estimate_path('/home/user')
+
+        mock_estimate_size.return_value = SizeEstimate(size=1000, error=100, probes=10)
+        obj = DockerBindMounts(
+            path='/mnt/nfs/share',
+            err=False,
+            size=0,
+            scan_in_progress=True,
+            last_scan='2023-01-01T12:00:00Z',
+            containers=['container1'],
+            calibration_ratios=[2.0, 2.0, 2.0],
+        )
+        est = scanner.estimate(Path('/container/path'), obj)
+        assert est.size == 1000
+        assert obj.estimated
+        assert obj.size == 2000
+        assert obj.size_error == 200
+
+        # filesystems mounted inside are estimated separately
+        with patch('scan.scanner.other_device_mounts', return_value=[Path('/container/path/disk')]):
+            scanner.estimate(Path('/container/path'), obj)
+        assert (obj.size, obj.other_device_size, obj.other_devices) == (2000, 1000, ['/mnt/nfs/share/disk'])
+
+        # too few or insignificant ratios leave the estimate as it is
+        for ratios in ([2.0], [0.9, 1.1, 1.0]):
+            obj.calibration_ratios = ratios
+            scanner.estimate(Path('/container/path'), obj)
+            assert (obj.size, obj.size_error, obj.calibration) == (1000, 100, 1.0)
+
+        scanner.measure(Path('/container/path'), obj)
+        assert not obj.estimated
+        assert obj.size == 3000
+        assert obj.size_error == 0
+
+
+def test_bind_mounts_scanner_recalibrate(mock_docker_client, mock_is_stop, docker_mount, tmp_path):
+    db = SqliteDatabase(tmp_path / 'du.sqlite3')
+    kv = KeyValue(database=db, table_name=settings.TABLE_BINDMOUNTS)
+    with (
+        patch('scan.scanner.docker_from_env', return_value=mock_docker_client),
+        patch('scan.scanner.doku_mounts', return_value=[docker_mount]),
+        patch('scan.scanner.settings.DB_DU', tmp_path / 'du.sqlite3'),
+        patch('scan.scanner.read_mountinfo', return_value=[]),
+        patch('scan.scanner.map_host_path_to_container', return_value=tmp_path),
+        patch('scan.scanner.estimate_size', return_value=SizeEstimate(size=1000, error=100, probes=10)),
+        patch('scan.scanner.get_size', return_value=2000),
+        patch('scan.scanner.walk', return_value=WalkStats(size=2000)),
+    ):
+        scanner = BindMountsScanner(mock_is_stop)
+        obj = DockerBindMounts(
+            path='/host/path/fuse',
+            err=False,
+            size=0,
+            scan_in_progress=False,
+            last_scan=datetime.now(UTC),
+            containers=[],
+        )
+        with db:
+            kvstore.set(obj.path, obj, kv)
+        # nothing estimated, nothing to do
+        with patch.object(scanner, 'estimate') as mock_estimate:
+            scanner.recalibrate()
+        mock_estimate.assert_not_called()
+
+        # estimated by a filesystem policy, not by a pattern
+        obj.estimated = True
+        with db:
+            kvstore.set(obj.path, obj, kv)
+        scanner.recalibrate()
+        with db:
+            obj = kvstore.get(obj.path, kv, DockerBindMounts)
+        assert (obj.size, obj.calibration_ratios) == (2000, [2.0])
+        assert obj.last_exact_scan
+
+
+def test_bind_mounts_scanner_backend(mock_docker_client, mock_is_stop, docker_mount, tmp_path):
+    stats = ScanStats(path='/host/path')
+    assert BindMountsScanner.scan_backend(ScanStrategy.AUTO, 'ext4', stats, stale_details=True)[0] == ScanStrategy.WALK
+    assert BindMountsScanner.scan_backend(ScanStrategy.DU, 'nfs', stats, stale_details=True)[0] == ScanStrategy.DU
+    with patch('scan.scanner.choose_backend', return_value=(ScanStrategy.DU, 'du is faster')):
+        assert BindMountsScanner.scan_backend(ScanStrategy.AUTO, 'ext4', stats)[0] == ScanStrategy.DU
+
+    # the details are refreshed by a walk once a day, du may measure the bind mount in between
+    now = datetime.now(UTC)
+    fresh = DockerBindMounts(
+        path='/host/path', err=False, size=0, scan_in_progress=True, last_scan=now, containers=[], last_walk=now
+    )
+    with patch('scan.scanner.settings.SCAN_DETAILS_INTERVAL', 3600):
+        assert not BindMountsScanner.stale_details(fresh)
+        assert BindMountsScanner.stale_details(fresh.model_copy(update={'last_walk': None}))
+        assert BindMountsScanner.stale_details(fresh.model_copy(update={'last_walk': now - timedelta(hours=2)}))
+    with patch('scan.scanner.settings.SCAN_DETAILS_INTERVAL', 0):
+        assert BindMountsScanner.stale_details(fresh)
+
+    # du asked for but not available: the walker ran, its throughput isn't a du sample
+    (tmp_path / 'file').write_bytes(b'x' * 100)
+    with (
+        patch('scan.scanner.docker_from_env', return_value=mock_docker_client),
+        patch('scan.scanner.doku_mounts', return_value=[docker_mount]),
+        patch('scan.scanner.du_available', return_value=False),
+    ):
+        BindMountsScanner(mock_is_stop).measure(tmp_path, fresh, ScanStrategy.DU, stats)
+    assert list(stats.backends) == ['walk']
+    assert stats.files == 1
+
+    # du by the filesystem policy keeps the details and the tree of the last walk
+    db = SqliteDatabase(':memory:')
+    stats_kv, details_kv, trees_kv, growth_kv, files_kv = (KeyValue(database=db, table_name=name) for name in 'abcde')
+    trees_kv['/host/path'] = 'tree'
+    growth_kv['/host/path'] = 'growth'
+    files_kv['/host/path'] = 'files'
+    prev_details = ScanDetails(
+        key='/host/path',
+        last_scan='2023-01-01T12:00:00Z',
+        largest_files=[LargestEntry(path='/big', size=100)],
+        counts=EntryCounts(files=5, dirs=2),
+    )
+    obj = DockerBindMounts(
+        path='/host/path', err=False, size=0, scan_in_progress=True, last_scan=datetime.now(UTC), containers=[]
+    )
+    with (
+        patch('scan.scanner.docker_from_env', return_value=mock_docker_client),
+        patch('scan.scanner.doku_mounts', return_value=[docker_mount]),
+        patch('scan.scanner.du_available', return_value=True),
+        patch('scan.scanner.get_size', return_value=3000),
+    ):
+        scanner = BindMountsScanner(mock_is_stop)
+        scanner.scan_exact(
+            tmp_path, obj, ScanStrategy.DU, stats_kv, details_kv, trees_kv, growth_kv, files_kv, prev_details
+        )
+
+    assert (obj.size, obj.backend, obj.files, obj.dirs) == (3000, 'du', 5, 2)
+    assert kvstore.get('/host/path', details_kv, ScanDetails) == prev_details
+    assert (trees_kv['/host/path'], growth_kv['/host/path'], files_kv['/host/path']) == ('tree', 'growth', 'files')
+
+
+def test_volumes_scanner(mock_docker_client, mock_is_stop, docker_mount, tmp_path):
+    (tmp_path / 'data.db').write_bytes(b'x' * 100)
+
+    local = MagicMock()
+    local.name = 'db_data'
+    local.attrs = {'Driver': 'local', 'Mountpoint': '/var/lib/docker/volumes/db_data/_data'}
+    remote = MagicMock()
+    remote.name = 'nfs_data'
+    remote.attrs = {'Driver': 'nfs', 'Mountpoint': ''}
+    mock_docker_client.volumes.list.return_value = [local, remote]
+
+    with (
+        patch('scan.scanner.docker_from_env', return_value=mock_docker_client),
+        patch('scan.scanner.doku_mounts', return_value=[docker_mount]),
+        patch('scan.scanner.map_host_path_to_container', return_value=tmp_path) as mock_map_path,
+        patch('scan.scanner.kvstore.set') as mock_kvstore_set,
+        patch('scan.scanner.settings.SCAN_DEDUP_MIN_SIZE', 1),
+    ):
+        scanner = VolumesScanner(mock_is_stop)
+        scanner.scan()
+
+        mock_map_path.assert_called_once_with(
+            source='/host/path',
+            destination='/container/path',
+            host_path='/var/lib/docker/volumes/db_data/_data',
+        )
+        assert mock_kvstore_set.call_count == 2
+        (key, details, _), (files_key, files, _) = (c.args for c in mock_kvstore_set.call_args_list)
+        assert key == 'db_data'
+        assert [(e.path, e.size) for e in details.largest_files] == [('/data.db', 100)]
+        assert details.by_type[0].key == 'database'
+        assert details.counts.files == 1
+        assert details.counts.entries == 1
+        # the files searched for duplicates, by their host path
+        assert files_key == 'db_data'
+        assert [f[1] for f in files.files] == ['/var/lib/docker/volumes/db_data/_data/data.db']
+
+
+def test_bind_mounts_scanner_reuse_cold():
+    prev = DockerBindMounts(
+        path='/host/path',
+        err=False,
+        size=5000,
+        scan_in_progress=False,
+        last_scan='2023-01-01T12:00:00Z',
+        last_exact_scan='2023-01-01T12:00:00Z',
+        containers=['container1'],
+        backend='walk',
+    )
+    obj = prev.model_copy(update={'size': 0, 'backend': '', 'last_scan': datetime(2023, 1, 2, 12, tzinfo=UTC)})
+    details = ScanDetails(
+        key='/host/path',
+        last_scan='2023-01-01T12:00:00Z',
+        age=AgeHistogram(buckets=[], mtime=[0, 0, 0, 0, 0, 5000], atime=[0, 0, 0, 0, 0, 5000]),
+    )
+
+    with patch('scan.scanner.settings.SCAN_COLD_SKIP_INTERVAL', 0):
+        assert not BindMountsScanner.reuse_cold(obj, prev, details)
+
+    with patch('scan.scanner.settings.SCAN_COLD_SKIP_INTERVAL', 3600):
+        # the last exact scan is too old
+        assert not BindMountsScanner.reuse_cold(obj, prev, details)
+
+    with patch('scan.scanner.settings.SCAN_COLD_SKIP_INTERVAL', 7 * 24 * 3600):
+        assert not BindMountsScanner.reuse_cold(obj, None, details)
+
+        details.age.mtime[0] = 1  # modified recently
+        assert not BindMountsScanner.reuse_cold(obj, prev, details)
+
+        details.age.mtime[0] = 0
+        assert BindMountsScanner.reuse_cold(obj, prev, details)
+        assert obj.cold
+        assert obj.size == 5000
+        assert obj.backend == 'walk'
@@ -0,0 +1,54 @@
+from datetime import datetime, UTC
+
+from peewee import SqliteDatabase
+from playhouse.kv import KeyValue
+
+import settings
+from contrib import kvstore
+from contrib.types import DockerImage, DockerImageList, DockerVolume, DockerVolumeList, TopEntry
+from scan.top import INDEX_SIZE, _key, top, update_top
+
+
+NOW = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def test_top():
+    db = SqliteDatabase(':memory:')
+    with db:
+        kv = KeyValue(database=db, table_name=settings.TABLE_TOP)
+        sizes = {'images': [90, 40, 10], 'logs': [70, 60, 50, 5], 'volumes': [], 'overlay2': [100]}
+        for category, values in sizes.items():
+            for rank, size in enumerate(values):
+                kvstore.set(_key(category, rank), TopEntry(category=category, id=str(rank), name='', size=size), kv)
+
+        assert [item.size for item in top(kv, 5)] == [100, 90, 70, 60, 50]
+        assert [item.size for item in top(kv, 100, ['images', 'logs'])] == [90, 70, 60, 50, 40, 10, 5]
+        assert [(item.category, item.id) for item in top(kv, 2, ['logs'])] == [('logs', '0'), ('logs', '1')]
+        assert top(kv, 3, ['volumes', 'bind_mounts']) == []
+
+
+def test_update_top(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DB_DF', tmp_path / 'df.sqlite3')
+    monkeypatch.setattr(settings, 'DB_DU', tmp_path / 'du.sqlite3')
+    images = [
+        {'Id': f'sha256:{i:064d}', 'Created': NOW, 'Size': 100 * i, 'SharedSize': 10 * i, 'RepoTags': [f'img:{i}']}
+        for i in range(INDEX_SIZE + 10)
+    ]
+    volumes = [
+        {'Name': 'data', 'Driver': 'local', 'CreatedAt': NOW, 'UsageData': {'Size': 5, 'RefCount': 1}},
+        {'Name': 'nfs', 'Driver': 'nfs', 'CreatedAt': NOW, 'UsageData': {'Size': -1, 'RefCount': 0}},
+    ]
+    db = SqliteDatabase(settings.DB_DF)
+    with db:
+        kv = KeyValue(database=db, table_name=settings.TABLE_SYSTEM_DF)
+        kvstore.set(settings.IMAGE_KEY, DockerImageList([DockerImage.model_validate(img) for img in images]), kv)
+        kvstore.set(settings.VOLUME_KEY, DockerVolumeList([DockerVolume.model_validate(vol) for vol in volumes]), kv)
+
+    update_top('images', 'volumes', 'overlay2')
+
+    with db:
+        kv = KeyValue(database=db, table_name=settings.TABLE_TOP)
+        assert len(kv) == INDEX_SIZE + 1  # the largest images only, the volume of unknown size is left out
+        first = top(kv, 1)[0]
+        assert (first.category, first.name, first.size) == ('images', f'img:{INDEX_SIZE + 9}', 90 * (INDEX_SIZE + 9))
+        assert [item.name for item in top(kv, 5, ['volumes'])] == ['data']
@@ -0,0 +1,143 @@
+from datetime import datetime, UTC
+
+from scan.tree import MIN_RELATIVE_DELTA, REST, GrowthCollector, SizeTree, TreeCollector
+from scan.walker import walk
+
+
+def make_tree(tmp_path):
+    (tmp_path / 'a' / 'b' / 'c' / 'd').mkdir(parents=True)
+    (tmp_path / 'a' / 'b' / 'c' / 'd' / 'big').write_bytes(b'x' * 1000)
+    (tmp_path / 'a' / 'file').write_bytes(b'x' * 100)
+    (tmp_path / 'e').mkdir()
+    (tmp_path / 'e' / 'file').write_bytes(b'x' * 10)
+    (tmp_path / 'top').write_bytes(b'x')
+
+
+def collect(tmp_path, depth, deep_nodes) -> SizeTree:
+    collector = TreeCollector(str(tmp_path), depth, deep_nodes)
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+    return collector.tree('/host')
+
+
+def test_tree_collector(tmp_path):
+    make_tree(tmp_path)
+    tree = collect(tmp_path, depth=1, deep_nodes=0)
+
+    assert len(tree) == 3
+    assert tree.sizes[tree.find('/')] == 1111
+    assert tree.sizes[tree.find('/a')] == 1100
+    assert tree.sizes[tree.find('/e')] == 10
+    assert tree.find('/a/b') is None
+    assert tree.find('/missing') is None
+
+
+def test_tree_collector_deep_nodes(tmp_path):
+    make_tree(tmp_path)
+    tree = collect(tmp_path, depth=1, deep_nodes=3)
+    assert tree.sizes[tree.find('/a/b/c/d')] == 1000
+    assert tree.sizes[tree.find('/a/b/c')] == 1000
+    assert tree.sizes[tree.find('/a/b')] == 1000
+    assert len(tree) == 6
+
+    # on ties the shallower directories are kept, so the tree stays connected
+    tree = collect(tmp_path, depth=1, deep_nodes=2)
+    assert tree.find('/a/b/c') is not None
+    assert tree.find('/a/b/c/d') is None
+    assert len(tree) == 5
+
+
+def test_tree_encoding(tmp_path):
+    make_tree(tmp_path)
+    (tmp_path / 'ünï').mkdir()
+    tree = collect(tmp_path, depth=3, deep_nodes=10)
+    last_scan = datetime.now(UTC)
+
+    model = tree.to_model('/host', last_scan, 3)
+    assert model.nodes == len(tree)
+    decoded = SizeTree.from_model(model)
+    assert list(decoded.parents) == list(tree.parents)
+    assert list(decoded.sizes) == list(tree.sizes)
+    assert [decoded.name(i) for i in range(len(decoded))] == [tree.name(i) for i in range(len(tree))]
+    assert decoded.find('/ünï') is not None
+
+
+def test_subtree(tmp_path):
+    make_tree(tmp_path)
+    tree = collect(tmp_path, depth=2, deep_nodes=0)
+
+    assert tree.subtree(tree.find('/'), 1) == {
+        'name': '/host',
+        'size': 1111,
+        'children': [{'name': 'a', 'size': 1100}, {'name': 'e', 'size': 10}],
+    }
+    assert tree.subtree(tree.find('/a'), 1) == {'name': 'a', 'size': 1100, 'children': [{'name': 'b', 'size': 1000}]}
+
+
+def test_to_ncdu(tmp_path):
+    make_tree(tmp_path)
+    tree = collect(tmp_path, depth=1, deep_nodes=0)
+
+    version, minor, meta, root = tree.to_ncdu('/host', datetime.fromtimestamp(1700000000, UTC))
+    assert (version, minor) == (1, 0)
+    assert meta['timestamp'] == 1700000000
+    assert root[0] == {'name': '/host'}
+    # directories are lists, the remaining bytes of a directory are a single file
+    assert [{'name': 'a'}, {'name': REST, 'asize': 1100, 'dsize': 1100}] in root
+    assert {'name': REST, 'asize': 1, 'dsize': 1} in root
+
+    empty = SizeTree.build('/host', {})
+    assert empty.to_ncdu('/host')[3] == [{'name': '/host'}]
+
+
+def test_growth_collector(tmp_path):
+    make_tree(tmp_path)
+    (tmp_path / 'gone' / 'sub').mkdir(parents=True)
+    (tmp_path / 'gone' / 'sub' / 'file').write_bytes(b'x' * 50)
+    previous = collect(tmp_path, depth=2, deep_nodes=0)
+
+    (tmp_path / 'a' / 'b' / 'c' / 'd' / 'big').write_bytes(b'x' * 3000)
+    (tmp_path / 'e' / 'file').write_bytes(b'x' * 5)
+    (tmp_path / 'gone' / 'sub' / 'file').unlink()
+    (tmp_path / 'gone' / 'sub').rmdir()
+    (tmp_path / 'gone').rmdir()
+    (tmp_path / 'new').mkdir()
+    (tmp_path / 'new' / 'file').write_bytes(b'x' * 20)
+
+    collector = GrowthCollector(str(tmp_path), previous, depth=2, top_n=2)
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+    report = collector.report('/host', datetime.fromtimestamp(0, UTC), datetime.now(UTC))
+
+    assert report.delta == 2000 - 5 - 50 + 20
+    # /a/b/c is deeper than the previous tree, its change is unknown
+    assert [(d.path, d.previous, d.size) for d in report.grown] == [('/a', 1100, 3100), ('/a/b', 1000, 3000)]
+    assert report.grown[0].ratio == 2000 / 1100
+    # only the top of the removed subtree
+    assert [(d.path, d.delta) for d in report.shrunk] == [('/gone', -50), ('/e', -5)]
+    # changes under the relative ranking threshold
+    assert report.grown_relative == []
+    assert report.shrunk_relative == []
+
+    # a new directory is ranked by absolute growth only
+    collector = GrowthCollector(str(tmp_path), previous, depth=2, top_n=10)
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+    report = collector.report('/host', datetime.fromtimestamp(0, UTC), datetime.now(UTC))
+    new = next(d for d in report.grown if d.path == '/new')
+    assert (new.previous, new.size, new.ratio) == (0, 20, None)
+
+
+def test_growth_collector_relative(tmp_path):
+    for name in ('small', 'large'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'file').write_bytes(b'x')
+    (tmp_path / 'large' / 'file').write_bytes(b'x' * MIN_RELATIVE_DELTA * 10)
+    previous = collect(tmp_path, depth=1, deep_nodes=0)
+
+    (tmp_path / 'small' / 'file').write_bytes(b'x' * MIN_RELATIVE_DELTA * 2)
+    (tmp_path / 'large' / 'file').write_bytes(b'x' * MIN_RELATIVE_DELTA * 15)
+
+    collector = GrowthCollector(str(tmp_path), previous, depth=1, top_n=10)
+    walk(tmp_path, sleep_duration=0, is_stop=lambda: False, collectors=(collector,))
+    report = collector.report('/host', datetime.fromtimestamp(0, UTC), datetime.now(UTC))
+
+    assert [d.path for d in report.grown] == ['/large', '/small']
+    assert [d.path for d in report.grown_relative] == ['/small', '/large']
@@ -1,9 +1,22 @@
 import os
+from datetime import datetime, timedelta, UTC
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
 import settings
-from scan.utils import du_available, cpu_throttling, run_du, get_size, pretty_size
+from settings import ScanStrategy
+from contrib.mountinfo import MountInfo
+from contrib.types import ScanStats, ScanThroughput
+from scan.utils import (
+    du_available,
+    cpu_throttling,
+    run_du,
+    get_size,
+    pretty_size,
+    fstype_strategy,
+    choose_backend,
+    other_device_mounts,
+)
 
 
 def test_cpu_throttling():
@@ -48,3 +61,65 @@ def test_pretty_size():
     assert pretty_size(1000) == '1.0 kB'
     assert pretty_size(1000000) == '1.0 MB'
     assert pretty_size(1000000000) == '1.0 GB'
+
+
+def test_fstype_strategy():
+    policies = {'nfs*': ScanStrategy.PARALLEL, 'fuse.*': ScanStrategy.ESTIMATE}
+    with patch('settings.SCAN_FSTYPE_POLICIES', policies), patch('settings.SCAN_USE_DU', True):
+        assert fstype_strategy('nfs4') == ScanStrategy.PARALLEL
+        assert fstype_strategy('fuse.sshfs') == ScanStrategy.ESTIMATE
+        assert fstype_strategy('ext4') == ScanStrategy.AUTO
+
+    with patch('settings.SCAN_FSTYPE_POLICIES', {}), patch('settings.SCAN_USE_DU', False):
+        assert fstype_strategy('ext4') == ScanStrategy.WALK
+
+
+def test_choose_backend():
+    now = datetime.now(UTC)
+    stats = ScanStats(path='/host/path')
+
+    with patch('scan.utils.du_available', return_value=False):
+        assert choose_backend(stats) == (ScanStrategy.WALK, 'du is not available')
+
+    with patch('scan.utils.du_available', return_value=True), patch('settings.SCAN_BACKEND_REPROBE_INTERVAL', 3600):
+        # both backends are probed first
+        assert choose_backend(stats)[0] == ScanStrategy.DU
+        stats.backends['du'] = ScanThroughput(bytes_per_sec=3000, files_per_sec=30, measured_at=now)
+        assert choose_backend(stats)[0] == ScanStrategy.WALK
+        stats.backends['walk'] = ScanThroughput(bytes_per_sec=1000, files_per_sec=10, measured_at=now)
+
+        backend, reason = choose_backend(stats)
+        assert backend == ScanStrategy.DU
+        assert reason.startswith('du is faster')
+
+        # the walker wins unless du is clearly faster
+        stats.backends['walk'].bytes_per_sec = 2800
+        assert choose_backend(stats)[0] == ScanStrategy.WALK
+
+        # the oldest measurement is refreshed
+        stats.backends['du'].measured_at = now - timedelta(hours=2)
+        assert choose_backend(stats) == (ScanStrategy.DU, 're-probing du throughput')
+
+
+def test_other_device_mounts(tmp_path):
+    (tmp_path / 'proc').mkdir()
+    (tmp_path / 'disk').mkdir()
+    (tmp_path / 'bind').mkdir()
+    mount_table = [
+        MountInfo(mount_point='/', fstype='ext4', source='/dev/sda1', device='8:1'),
+        MountInfo(mount_point=str(tmp_path / 'proc'), fstype='proc', source='proc', device='0:21'),
+        MountInfo(mount_point=str(tmp_path / 'disk'), fstype='ext4', source='/dev/sdb1', device='8:17'),
+        MountInfo(mount_point=str(tmp_path / 'bind'), fstype='ext4', source='/dev/sda1', device='8:1'),
+    ]
+
+    real_stat = Path.stat
+
+    def fake_stat(self, **kwargs):
+        st = real_stat(self, **kwargs)
+        if self.name == 'disk':
+            return os.stat_result((st.st_mode, 0, st.st_dev + 1, 0, 0, 0, 0, 0, 0, 0))
+        return st
+
+    with patch('pathlib.Path.stat', fake_stat):
+        assert other_device_mounts(tmp_path, mount_table) == [tmp_path / 'disk']
+    assert other_device_mounts(tmp_path / 'missing', mount_table) == []
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import settings
+from scan.utils import get_size
+from scan.walker import Collector, list_dir, walk
+
+
+def test_list_dir(tmp_path):
+    (tmp_path / 'file').write_bytes(b'x' * 10)
+    (tmp_path / 'dir').mkdir()
+
+    entries = {Path(p).name: (is_dir, st.st_size) for p, is_dir, st in list_dir(str(tmp_path))}
+    assert entries['file'] == (False, 10)
+    assert entries['dir'][0] is True
+
+    assert list_dir(str(tmp_path / 'missing')) == []
+
+
+def test_walk():
+    p = settings.BASE_DIR
+    s1 = get_size(p, sleep_duration=0, is_stop=lambda: False, use_du=False)
+    s2 = walk(p, sleep_duration=0, is_stop=lambda: False).size
+    s3 = walk(p, sleep_duration=0, is_stop=lambda: False, threads=4).size
+    assert round(s1, -6) == round(s2, -6) == round(s3, -6)
+
+    assert walk(p, sleep_duration=0, is_stop=lambda: True, threads=4).size == 0
+    assert walk(Path(__file__), sleep_duration=0, is_stop=lambda: False).size == Path(__file__).stat().st_size
+    assert walk(p / 'missing', sleep_duration=0, is_stop=lambda: False).size == 0
+
+
+def test_walk_parallel(tmp_path):
+    for i in range(300):
+        (tmp_path / f'dir{i}' / 'sub').mkdir(parents=True)
+        (tmp_path / f'dir{i}' / 'sub' / 'file').write_bytes(b'x')
+    listed_by = []
+
+    def slow_list_dir(path: str):
+        time.sleep(0.001)  # a network round-trip
+        listed_by.append(threading.current_thread().name)
+        return list_dir(path)
+
+    with patch('scan.walker.list_dir', side_effect=slow_list_dir):
+        stats = walk(tmp_path, sleep_duration=0, is_stop=lambda: False, threads=4)
+    assert (stats.size, stats.dirs) == (300, 600)
+
+    # the pool is refilled with the directories the walk reaches next, the walk itself lists a directory
+    # only when every worker is busy
+    assert len(listed_by) == 601
+    assert listed_by.count(threading.current_thread().name) < 60
+
+
+def test_walk_one_file_system(tmp_path):
+    (tmp_path / 'file').write_bytes(b'x' * 10)
+    (tmp_path / 'proc').mkdir()
+    (tmp_path / 'proc' / 'file').write_bytes(b'x' * 1000)
+    dev = tmp_path.stat().st_dev
+
+    def fake_list_dir(path: str):
+        entries = list_dir(path)
+        # pretend that the proc directory is a mount point of another device
+        return [
+            (p, is_dir, os.stat_result((st.st_mode, 0, dev + 1, 0, 0, 0, st.st_size, 0, 0, 0)))
+            if Path(p).name == 'proc'
+            else (p, is_dir, st)
+            for p, is_dir, st in entries
+        ]
+
+    with patch('scan.walker.list_dir', side_effect=fake_list_dir):
+        stats = walk(tmp_path, sleep_duration=0, is_stop=lambda: False)
+    assert stats.size == 10
+    assert (stats.files, stats.dirs) == (1, 0)  # the proc directory is not entered, nor counted
+
+
+def test_walk_collectors(tmp_path):
+    (tmp_path / 'a' / 'b').mkdir(parents=True)
+    (tmp_path / 'c').mkdir()
+    (tmp_path / 'file').write_bytes(b'x' * 1)
+    (tmp_path / 'a' / 'file').write_bytes(b'x' * 10)
+    (tmp_path / 'a' / 'b' / 'file').write_bytes(b'x' * 100)
+    (tmp_path / 'c' / 'file').write_bytes(b'x' * 1000)
+
+    class Recorder(Collector):
+        def __init__(self):
+            self.files = {}
+            self.dirs = {}
+
+        def file(self, path, st):
+            self.files[path] = st.st_size
+
+        def directory(self, path, size):
+            self.dirs[path] = size
+
+    for threads in (0, 2):
+        recorder = Recorder()
+        stats = walk(tmp_path, sleep_duration=0, is_stop=lambda: False, threads=threads, collectors=(recorder,))
+        assert stats.size == 1111
+        assert sum(recorder.files.values()) == 1111
+        assert recorder.dirs == {
+            str(tmp_path): 1111,
+            str(tmp_path / 'a'): 110,
+            str(tmp_path / 'a' / 'b'): 100,
+            str(tmp_path / 'c'): 1000,
+        }
+
+
+def test_walk_counts(tmp_path):
+    (tmp_path / 'dir' / 'sub').mkdir(parents=True)
+    (tmp_path / 'dir' / 'file').write_bytes(b'x')
+    (tmp_path / 'file').write_bytes(b'x')
+    (tmp_path / 'link').symlink_to(tmp_path / 'file')
+    os.mkfifo(tmp_path / 'fifo')
+
+    stats = walk(tmp_path, sleep_duration=0, is_stop=lambda: False)
+    assert (stats.files, stats.dirs, stats.symlinks, stats.others) == (2, 2, 1, 1)
@@ -0,0 +1,125 @@
+import heapq
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from operator import attrgetter
+
+from peewee import SqliteDatabase
+from playhouse.kv import KeyValue
+
+import settings
+from contrib import kvstore
+from contrib.types import (
+    DockerBindMounts,
+    DockerBuildCacheList,
+    DockerContainerList,
+    DockerContainerLog,
+    DockerImageList,
+    DockerOverlay2Layer,
+    DockerVolumeList,
+    TopEntry,
+)
+
+
+CATEGORIES = ('images', 'containers', 'volumes', 'bind_mounts', 'logs', 'overlay2', 'build_cache')
+INDEX_SIZE = 1000  # largest entries kept per category
+
+
+def _key(category: str, rank: int) -> str:
+    return f'{category}/{rank:08d}'  # the keys of a category sort by rank
+
+
+def _range(kv: KeyValue, category: str):
+    return (kv.key >= f'{category}/') & (kv.key < f'{category}0')  # '0' follows '/'
+
+
+def _entries(category: str) -> list[TopEntry]:
+    # the results of the last scan of the category
+    if category == 'bind_mounts':
+        if not settings.DB_DU.exists():
+            return []
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            mounts = kvstore.get_all(KeyValue(database=db, table_name=settings.TABLE_BINDMOUNTS), DockerBindMounts)
+        return [TopEntry(category=category, id=mnt.path, name=mnt.path, size=mnt.size) for mnt in mounts]
+
+    if category == 'overlay2':
+        if not settings.DB_DU.exists():
+            return []
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            layers = kvstore.get_all(KeyValue(database=db, table_name=settings.TABLE_OVERLAY2), DockerOverlay2Layer)
+        return [
+            TopEntry(category=category, id=layer.id, name=layer.diff_root or layer.id[:12], size=layer.size)
+            for layer in layers
+        ]
+
+    db = SqliteDatabase(settings.DB_DF)
+    with db:
+        if category == 'logs':
+            logs = kvstore.get_all(KeyValue(database=db, table_name=settings.TABLE_LOGFILES), DockerContainerLog)
+            return [TopEntry(category=category, id=log.id, name=log.name, size=log.size) for log in logs]
+
+        kv = KeyValue(database=db, table_name=settings.TABLE_SYSTEM_DF)
+        if category == 'images' and settings.IMAGE_KEY in kv:
+            return [
+                # only the bytes not shared with other images
+                TopEntry(
+                    category=category, id=img.short_id, name=img.safe_repo_tags[0], size=img.size - img.shared_size
+                )
+                for img in kvstore.get(settings.IMAGE_KEY, kv, DockerImageList)
+            ]
+        if category == 'containers' and settings.CONTAINER_KEY in kv:
+            return [
+                TopEntry(category=category, id=cont.short_id, name=', '.join(cont.clean_names), size=cont.size_rw)
+                for cont in kvstore.get(settings.CONTAINER_KEY, kv, DockerContainerList)
+            ]
+        if category == 'volumes' and settings.VOLUME_KEY in kv:
+            return [
+                TopEntry(category=category, id=vol.name, name=vol.short_name, size=vol.size)
+                for vol in kvstore.get(settings.VOLUME_KEY, kv, DockerVolumeList)
+            ]
+        if category == 'build_cache' and settings.BUILD_CACHE_KEY in kv:
+            return [
+                TopEntry(category=category, id=item.id, name=item.short_desc or item.type, size=item.size)
+                for item in kvstore.get(settings.BUILD_CACHE_KEY, kv, DockerBuildCacheList)
+            ]
+    return []
+
+
+def update_top(*categories: str) -> None:
+    """
+    Rebuild the index of the largest entries of each category from the results of its last scan.
+    The keys of an entry are `<category>/<rank>`, so reading a category largest first is a range scan
+    of the primary key index that stops after a few rows.
+    """
+    indexes = {}
+    for category in categories:
+        entries = [entry for entry in _entries(category) if entry.size > 0]  # unknown sizes are negative
+        indexes[category] = heapq.nlargest(INDEX_SIZE, entries, key=attrgetter('size'))
+
+    db = SqliteDatabase(settings.DB_DF)
+    with db:
+        kv = KeyValue(database=db, table_name=settings.TABLE_TOP)
+        with db.atomic():
+            for category, entries in indexes.items():
+                del kv[_range(kv, category)]
+                for rank, entry in enumerate(entries):
+                    kvstore.set(_key(category, rank), entry, kv)
+
+
+def ranked(kv: KeyValue, category: str, limit: int) -> Iterator[TopEntry]:
+    """
+    Entries of a category, largest first. Rows are read from the database as they are consumed.
+    """
+    query = kv.model.select(kv.value).where(_range(kv, category)).order_by(kv.key).limit(limit).tuples()
+    for (value,) in query.iterator():
+        yield TopEntry.model_validate_json(str(value))
+
+
+def top(kv: KeyValue, n: int, categories: Iterable[str] = CATEGORIES) -> list[TopEntry]:
+    """
+    The `n` largest entries across the categories: a k-way merge of the indexes of the categories,
+    each already sorted, so at most `n` entries are read besides the head of each category.
+    """
+    streams = [ranked(kv, category, n) for category in categories]
+    return list(islice(heapq.merge(*streams, key=attrgetter('size'), reverse=True), n))
@@ -0,0 +1,267 @@
+import base64
+import heapq
+import time
+from array import array
+from datetime import datetime
+
+from contrib.types import DockerSizeTree, GrowthReport, SizeDelta
+from scan.walker import Collector
+
+
+ROOT = -1  # parent index of the root node
+REST = '(files and smaller directories)'  # name of the bytes not in any child node (ncdu export)
+MIN_RELATIVE_DELTA = 1024 * 1024  # smaller changes are noise in the ranking by relative change
+
+
+def _b64(arr: array) -> str:
+    return base64.b64encode(arr.tobytes()).decode()
+
+
+def _unb64(typecode: str, s: str) -> array:
+    arr = array(typecode)
+    arr.frombytes(base64.b64decode(s))
+    return arr
+
+
+class SizeTree:
+    """
+    Directory tree with the bytes of every subtree, stored in flat arrays:
+    node i is named names[offsets[i]:offsets[i + 1]], its parent is parents[i] and its size is sizes[i].
+    Parents always precede their children, the root is node 0.
+    Decoding is a few array copies, whatever the number of nodes.
+    """
+
+    def __init__(self, parents: array, offsets: array, sizes: array, names: bytes):
+        self.parents = parents
+        self.offsets = offsets
+        self.sizes = sizes
+        self.names = names
+        self._children: list[list[int]] | None = None
+        self._index: dict[tuple[int, bytes], int] | None = None  # (parent, encoded name) -> node
+
+    @classmethod
+    def build(cls, root_name: str, nodes: dict[tuple[str, ...], int]) -> 'SizeTree':
+        """
+        Build a tree from the subtree sizes by path components, the root has no components.
+        Every node must have its parent in the nodes (except the root).
+        """
+        parents, offsets, sizes = array('i'), array('q', [0]), array('q')
+        names = bytearray()
+        index: dict[tuple[str, ...], int] = {}
+        for path in sorted(nodes):  # a prefix sorts first, so parents precede children
+            if path and path[:-1] not in index:
+                continue  # detached node, e.g. of an interrupted walk
+            index[path] = len(sizes)
+            parents.append(index[path[:-1]] if path else ROOT)
+            sizes.append(nodes[path])
+            names += (path[-1] if path else root_name).encode('utf-8', errors='surrogateescape')
+            offsets.append(len(names))
+        return cls(parents, offsets, sizes, bytes(names))
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def name(self, i: int) -> str:
+        return self.names[self.offsets[i] : self.offsets[i + 1]].decode('utf-8', errors='replace')
+
+    def children(self, i: int) -> list[int]:
+        if self._children is None:
+            self._children = [[] for _ in range(len(self))]
+            for node, parent in enumerate(self.parents):
+                if parent != ROOT:
+                    self._children[parent].append(node)
+        return self._children[i]
+
+    def child(self, i: int, name: str) -> int | None:
+        """Find a child of a node by name."""
+        if self._index is None:
+            self._index = {
+                (parent, self.names[self.offsets[node] : self.offsets[node + 1]]): node
+                for node, parent in enumerate(self.parents)
+            }
+        return self._index.get((i, name.encode('utf-8', errors='surrogateescape')))
+
+    def find(self, path: str) -> int | None:
+        """Find the node of a path relative to the root, e.g. `/data/db`."""
+        if not len(self):
+            return None
+        node: int | None = 0
+        for part in path.strip('/').split('/'):
+            if part:
+                node = self.child(node, part)
+                if node is None:
+                    return None
+        return node
+
+    def path(self, i: int) -> str:
+        """Path of a node relative to the root."""
+        parts = []
+        while i > 0:
+            parts.append(self.name(i))
+            i = self.parents[i]
+        return '/' + '/'.join(reversed(parts))
+
+    def subtree(self, i: int, depth: int) -> dict:
+        """Nested representation of a node and its descendants down to a relative depth, largest first."""
+        ret = {'name': self.name(i), 'size': self.sizes[i]}
+        if depth > 0:
+            children = sorted(self.children(i), key=lambda c: self.sizes[c], reverse=True)
+            ret['children'] = [self.subtree(child, depth - 1) for child in children]
+        return ret
+
+    def to_ncdu(self, root_name: str, timestamp: datetime | None = None) -> list:
+        """
+        Export in the ncdu JSON format (`ncdu -f file.json`). Directories only: the bytes of the files of
+        a directory and of its subdirectories not kept in the tree are reported as a single file.
+        """
+
+        def node(i: int, name: str) -> list:
+            ret: list = [{'name': name}]
+            rest = self.sizes[i]
+            for child in self.children(i):
+                ret.append(node(child, self.name(child)))
+                rest -= self.sizes[child]
+            if rest > 0:
+                ret.append({'name': REST, 'asize': rest, 'dsize': rest})
+            return ret
+
+        ts = int(timestamp.timestamp() if timestamp else time.time())
+        meta = {'progname': 'doku', 'progver': '1', 'timestamp': ts}
+        return [1, 0, meta, node(0, root_name) if len(self) else [{'name': root_name}]]
+
+    def to_model(self, key: str, last_scan: datetime, depth: int) -> DockerSizeTree:
+        return DockerSizeTree(
+            key=key,
+            last_scan=last_scan,
+            depth=depth,
+            nodes=len(self),
+            parents=_b64(self.parents),
+            offsets=_b64(self.offsets),
+            sizes=_b64(self.sizes),
+            names=base64.b64encode(self.names).decode(),
+        )
+
+    @classmethod
+    def from_model(cls, model: DockerSizeTree) -> 'SizeTree':
+        return cls(
+            parents=_unb64('i', model.parents),
+            offsets=_unb64('q', model.offsets),
+            sizes=_unb64('q', model.sizes),
+            names=base64.b64decode(model.names),
+        )
+
+
+class TreeCollector(Collector):
+    """
+    Keeps the subtree bytes of every directory down to a depth, plus the largest deeper directories.
+    A directory is never smaller than its subdirectories, and ties are broken in favor of the shallower one,
+    so the ancestors of a kept deep directory are kept as well and the result is a connected tree.
+    """
+
+    same_device_only = True  # the subtree bytes don't include other filesystems mounted inside
+
+    def __init__(self, root: str, depth: int, deep_nodes: int):
+        self.root = root.rstrip('/')
+        self.depth = depth
+        self.deep_nodes = deep_nodes
+        self.nodes: dict[tuple[str, ...], int] = {}  # path components -> subtree bytes
+        self.deep: list[tuple[int, int, tuple[str, ...]]] = []  # min-heap of (size, -depth, path components)
+
+    def directory(self, path: str, size: int) -> None:
+        rel = path[len(self.root) :].strip('/')
+        parts = tuple(rel.split('/')) if rel else ()
+        if len(parts) <= self.depth:
+            self.nodes[parts] = size
+        elif len(self.deep) < self.deep_nodes:
+            heapq.heappush(self.deep, (size, -len(parts), parts))
+        elif self.deep and (size, -len(parts)) > self.deep[0][:2]:
+            heapq.heapreplace(self.deep, (size, -len(parts), parts))
+
+    def tree(self, root_name: str) -> SizeTree:
+        nodes = dict(self.nodes)
+        for size, _, parts in self.deep:
+            nodes[parts] = size
+        return SizeTree.build(root_name, nodes)
+
+
+class GrowthCollector(Collector):
+    """
+    Compares the subtree bytes of every directory with the size tree of the previous scan during the walk,
+    and keeps the top N changes in bounded heaps: the new tree is never held in full.
+    A directory missing from the previous tree is new if it's not deeper than the previous tree depth,
+    otherwise it was pruned from the previous tree and its change is unknown.
+    Directories of the previous tree never seen during the walk were removed, only the top of a removed
+    subtree is reported.
+    """
+
+    same_device_only = True  # like the size tree
+
+    FIELDS = ('grown', 'shrunk', 'grown_relative', 'shrunk_relative')
+
+    def __init__(self, root: str, previous: SizeTree, depth: int, top_n: int):
+        self.root = root.rstrip('/')
+        self.previous = previous
+        self.depth = depth
+        self.top_n = top_n
+        self.seen = bytearray(len(previous))
+        self.heaps: dict[str, list[tuple[float, str, int, int]]] = {field: [] for field in self.FIELDS}
+        self.delta = 0
+
+    def _push(self, field: str, key: float, path: str, previous: int, size: int):
+        heap = self.heaps[field]
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, (key, path, previous, size))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, path, previous, size))
+
+    def _record(self, path: str, previous: int, size: int):
+        delta = size - previous
+        if delta > 0:
+            self._push('grown', delta, path, previous, size)
+            if previous and delta >= MIN_RELATIVE_DELTA:
+                self._push('grown_relative', delta / previous, path, previous, size)
+        elif delta < 0:
+            self._push('shrunk', -delta, path, previous, size)
+            if previous and -delta >= MIN_RELATIVE_DELTA:
+                self._push('shrunk_relative', -delta / previous, path, previous, size)
+
+    def directory(self, path: str, size: int) -> None:
+        if not len(self.previous):
+            return
+        rel = path[len(self.root) :].strip('/')
+        if not rel:  # the root is the whole bind mount
+            self.seen[0] = 1
+            self.delta = size - self.previous.sizes[0]
+            return
+
+        parts = rel.split('/')
+        node: int | None = 0
+        for part in parts:
+            node = self.previous.child(node, part)
+            if node is None:
+                break
+        if node is not None:
+            self.seen[node] = 1
+            self._record('/' + rel, self.previous.sizes[node], size)
+        elif len(parts) <= self.depth:
+            self._record('/' + rel, 0, size)
+
+    def report(self, key: str, previous_scan: datetime, last_scan: datetime) -> GrowthReport:
+        for node in range(1, len(self.previous)):
+            if not self.seen[node] and self.seen[self.previous.parents[node]]:
+                self._record(self.previous.path(node), self.previous.sizes[node], 0)
+
+        report = GrowthReport(key=key, previous_scan=previous_scan, last_scan=last_scan, delta=self.delta)
+        for field in self.FIELDS:
+            deltas = [
+                SizeDelta(
+                    path=path,
+                    previous=previous,
+                    size=size,
+                    delta=size - previous,
+                    ratio=(size - previous) / previous if previous else None,
+                )
+                for _, path, previous, size in sorted(self.heaps[field], key=lambda item: (-item[0], item[1]))
+            ]
+            setattr(report, field, deltas)
+        return report
@@ -1,26 +1,31 @@
+import fnmatch
+import functools
 import shutil
 import subprocess
-import time
 from collections.abc import Callable
+from datetime import datetime, UTC
 from pathlib import Path
 from subprocess import CompletedProcess
+from typing import TYPE_CHECKING
 
 from humanize import naturalsize
 
 import settings
 from contrib.logger import get_logger
+from contrib.mountinfo import MountInfo, nested_mounts
+from scan.ignore import IgnoreMatcher
+from scan.walker import Collector, WalkStats, cpu_throttling, walk
+from settings import ScanStrategy
 
+if TYPE_CHECKING:
+    from contrib.types import ScanStats  # contrib.types imports this module
 
-_files_processed = 0
 
-
-def cpu_throttling(sleep_duration: float):
-    global _files_processed
-    _files_processed += 1
-    if _files_processed % 100 == 0:  # every 100 files we sleep for a while
-        time.sleep(sleep_duration)
+# du must be this much faster than the walker to be chosen
+DU_MIN_SPEEDUP = 1.2
 
 
+@functools.cache
 def du_available() -> bool:
     """
     Check if the `du` command is available in the system.
@@ -28,11 +33,14 @@ def du_available() -> bool:
     return shutil.which('du') is not None
 
 
-def run_du(path: Path) -> int:
+def run_du(path: Path, exclude: list[str] | None = None) -> int:
     """
     Run the `du` command on a path and return the disk usage in bytes.
+    Directories on other filesystems are skipped (see -x option).
     """
-    res: CompletedProcess = subprocess.run(['du', '-sb', path], capture_output=True, text=True)
+    args = ['du', '-sbx']
+    args += [f'--exclude={pattern}' for pattern in exclude or []]
+    res: CompletedProcess = subprocess.run([*args, path], capture_output=True, text=True)
     if res.returncode == 0:
         try:
             # output is in the format 'size path' (see -s option)
@@ -47,40 +55,122 @@ def run_du(path: Path) -> int:
     return 0
 
 
-def get_size(path: Path, /, sleep_duration: float, is_stop: Callable[[], bool], use_du=True) -> int:
+def get_stats(
+    path: Path,
+    /,
+    sleep_duration: float,
+    is_stop: Callable[[], bool],
+    use_du=True,
+    ignore: IgnoreMatcher | None = None,
+    collectors: tuple[Collector, ...] = (),
+) -> WalkStats:
     """
-    Calculate disk usage of a path in bytes (recursively).
-    Path can be a file or a directory.
+    Calculate disk usage of a path (recursively) with `du` or the walker.
+    Path can be a file or a directory. Only the filesystem of the path is counted.
+    Entries are only counted by the walker, `du` reports the size only.
 
     Args:
         path: Path to calculate size for
         sleep_duration: Duration to sleep for every 100 files processed
         is_stop: Callable to check if the process should stop
         use_du: Whether to use 'du' command
+        ignore: Matcher of the paths to skip
+        collectors: Collectors of the details of the tree, `du` is not used if there are any
     """
-    total = 0
     if is_stop():
-        return total
-
-    match path:
-        case _ if path.is_dir(follow_symlinks=False):
-            if use_du:
-                total += run_du(path)
-                cpu_throttling(sleep_duration)
-            else:
-                for item in path.iterdir():
-                    total += get_size(
-                        item,
-                        sleep_duration=sleep_duration,
-                        is_stop=is_stop,
-                        use_du=use_du,
-                    )
-
-        case _ if path.is_file(follow_symlinks=False):
-            total += path.stat(follow_symlinks=False).st_size
-            cpu_throttling(sleep_duration)
-
-    return total
+        return WalkStats()
+
+    if use_du and not collectors and path.is_dir(follow_symlinks=False):
+        size = run_du(path, exclude=ignore.du_exclude() if ignore else None)
+        cpu_throttling(sleep_duration)
+        return WalkStats(size=size)
+
+    return walk(path, sleep_duration=sleep_duration, is_stop=is_stop, ignore=ignore, collectors=collectors)
+
+
+def get_size(
+    path: Path,
+    /,
+    sleep_duration: float,
+    is_stop: Callable[[], bool],
+    use_du=True,
+    ignore: IgnoreMatcher | None = None,
+) -> int:
+    """
+    Calculate disk usage of a path in bytes (recursively).
+    Path can be a file or a directory. Only the filesystem of the path is counted.
+
+    Args:
+        path: Path to calculate size for
+        sleep_duration: Duration to sleep for every 100 files processed
+        is_stop: Callable to check if the process should stop
+        use_du: Whether to use 'du' command
+        ignore: Matcher of the paths to skip
+    """
+    return get_stats(path, sleep_duration=sleep_duration, is_stop=is_stop, use_du=use_du, ignore=ignore).size
+
+
+def other_device_mounts(path: Path, mount_table: list[MountInfo]) -> list[Path]:
+    """
+    Mount points nested under the path that are on other devices, skipping pseudo filesystems.
+    Their bytes are not counted by a walk of the path (see `du -x`) and must be measured separately.
+    """
+    try:
+        root_dev = path.stat().st_dev
+    except OSError:
+        return []
+
+    ret = []
+    for mnt in nested_mounts(str(path), mount_table):
+        if mnt.fstype in settings.SCAN_PSEUDO_FSTYPES:
+            continue
+        mount_point = Path(mnt.mount_point)
+        try:
+            if mount_point.stat().st_dev == root_dev:
+                continue  # a bind mount from the same device, the walk enters it
+        except OSError:
+            continue
+        ret.append(mount_point)
+    return ret
+
+
+def fstype_strategy(fstype: str) -> ScanStrategy:
+    """
+    Pick the scan strategy for a filesystem type according to the configured policies.
+    """
+    for pattern, strategy in settings.SCAN_FSTYPE_POLICIES.items():
+        if fnmatch.fnmatchcase(fstype, pattern):
+            return strategy
+    return ScanStrategy.AUTO if settings.SCAN_USE_DU else ScanStrategy.WALK
+
+
+def choose_backend(stats: 'ScanStats') -> tuple[ScanStrategy, str]:
+    """
+    Pick `du` or the walker for a directory by the throughput measured on previous scans.
+    Each backend is probed first, and measured again once its measurement gets too old.
+    The walker wins a tie: it can be stopped at any time and collects more than the size.
+
+    Returns the backend and the reason of the choice.
+    """
+    if not du_available():
+        return ScanStrategy.WALK, 'du is not available'
+
+    du = stats.backends.get(ScanStrategy.DU.value)
+    walker = stats.backends.get(ScanStrategy.WALK.value)
+    if du is None:
+        return ScanStrategy.DU, 'probing du throughput'
+    if walker is None:
+        return ScanStrategy.WALK, 'probing walk throughput'
+
+    now = datetime.now(UTC)
+    oldest, backend = min((du.measured_at, ScanStrategy.DU), (walker.measured_at, ScanStrategy.WALK))
+    if (now - oldest).total_seconds() > settings.SCAN_BACKEND_REPROBE_INTERVAL:
+        return backend, f're-probing {backend.value} throughput'
+
+    rates = f'du {pretty_size(round(du.bytes_per_sec))}/s, walk {pretty_size(round(walker.bytes_per_sec))}/s'
+    if du.bytes_per_sec > walker.bytes_per_sec * DU_MIN_SPEEDUP:
+        return ScanStrategy.DU, f'du is faster ({rates})'
+    return ScanStrategy.WALK, f'walk is as fast or faster ({rates})'
 
 
 def pretty_size(size: int) -> str:
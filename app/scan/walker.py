@@ -0,0 +1,235 @@
+import os
+import stat
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from scan.ignore import IGNORE_FILE, IgnoreMatcher, IgnoreRules
+
+
+# directories listed ahead of the walk per worker thread, bounds the memory used by prefetching
+PREFETCH_PER_THREAD = 16
+# directories submitted to the thread pool and not listed yet per worker thread, keeps the workers busy
+IN_FLIGHT_PER_THREAD = 2
+
+Entry = tuple[str, bool, os.stat_result]  # path, is directory, stat result (not following symlinks)
+
+_files_processed = 0
+
+
+def cpu_throttling(sleep_duration: float):
+    global _files_processed
+    _files_processed += 1
+    if _files_processed % 100 == 0:  # every 100 files we sleep for a while
+        time.sleep(sleep_duration)
+
+
+class Collector:
+    """
+    Collects details of a directory tree during a walk, in the same pass as the size.
+    Subclasses override the hooks they need.
+    """
+
+    same_device_only = False  # skip other filesystems mounted inside the scanned item (measured separately)
+
+    def file(self, path: str, st: os.stat_result) -> None:
+        """Called for every regular file counted in the size."""
+
+    def directory(self, path: str, size: int) -> None:
+        """Called when the walk leaves a directory, with the bytes of its whole subtree."""
+
+
+@dataclass
+class WalkStats:
+    size: int = 0  # bytes of regular files on the device of the root
+    files: int = 0  # number of regular files counted
+    dirs: int = 0  # number of directories below the root
+    symlinks: int = 0  # number of symbolic links
+    others: int = 0  # number of other entries: sockets, fifos, devices
+    ignored: int = 0  # number of ignored files and directories, their bytes are unknown
+
+
+def list_dir(path: str) -> list[Entry]:
+    """
+    List a directory and stat its entries. Entries that can't be accessed are skipped.
+    """
+    entries = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.S_ISDIR(st.st_mode), st))
+    except OSError:
+        pass
+    return entries
+
+
+class _Listing:
+    """Listing of a directory: by the thread pool once submitted, otherwise by the walk when it gets there."""
+
+    __slots__ = ('path', 'future')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.future: Future | None = None
+
+    def result(self) -> list[Entry]:
+        return self.future.result() if self.future else list_dir(self.path)
+
+    def cancel(self):
+        if self.future:
+            self.future.cancel()
+
+
+class _Leave:
+    """Stack marker popped after the whole subtree of a directory has been walked."""
+
+    __slots__ = ('path', 'start')
+
+    def __init__(self, path: str, start: int):
+        self.path = path
+        self.start = start  # bytes counted before entering the directory
+
+
+def walk(
+    path: Path,
+    /,
+    sleep_duration: float,
+    is_stop: Callable[[], bool],
+    threads: int = 0,
+    ignore: IgnoreMatcher | None = None,
+    collectors: tuple[Collector, ...] = (),
+) -> WalkStats:
+    """
+    Calculate disk usage of a path in bytes by walking the directory tree depth-first.
+    The walk stays on the device of the path (like `du -x`): directories on other devices,
+    e.g. nested mounts of /proc or another disk, are not entered (see `other_device_mounts`).
+
+    With threads > 0, directories are listed and their entries stat'ed by a thread pool ahead
+    of the walk. Every stat on a network filesystem is a round-trip to the server, so listing
+    many directories concurrently hides the latency. The walk order stays the same: as listings
+    complete, the pool is refilled with the directories the walk will reach first (the top of the stack).
+
+    Every entry on the device is counted by type (files, directories, symlinks, others), running out of
+    inodes is as real as running out of bytes. Ignored directories are pruned, the walk never enters them.
+
+    Collectors see every counted file and the subtree size of every directory (the root included).
+
+    Args:
+        path: Path to calculate size for
+        sleep_duration: Duration to sleep for every 100 files processed
+        is_stop: Callable to check if the process should stop
+        threads: Number of threads listing directories ahead of the walk, 0 for a serial walk
+        ignore: Matcher of the paths to skip
+        collectors: Collectors of the details of the tree
+    """
+    stats = WalkStats()
+    try:
+        st = path.stat(follow_symlinks=False)
+    except OSError:
+        return stats
+
+    if not stat.S_ISDIR(st.st_mode):
+        if stat.S_ISREG(st.st_mode):
+            stats.size = st.st_size
+            stats.files = 1
+            for collector in collectors:
+                collector.file(str(path), st)
+        return stats
+
+    root_dev = st.st_dev
+
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='walker') if threads else None
+    prefetch_limit = threads * PREFETCH_PER_THREAD
+    in_flight_limit = threads * IN_FLIGHT_PER_THREAD
+    waiting: list[_Listing] = []  # not submitted yet, in stack order: the last one is reached first
+    in_flight: list[Future] = []  # submitted and not listed yet
+    pending = 0  # number of directories submitted to the executor and not consumed yet
+
+    def refill():
+        nonlocal in_flight, pending
+        in_flight = [future for future in in_flight if not future.done()]
+        while waiting and len(in_flight) < in_flight_limit and pending < prefetch_limit:
+            listing = waiting.pop()
+            listing.future = executor.submit(list_dir, listing.path)
+            in_flight.append(listing.future)
+            pending += 1
+
+    total = 0
+    files = dirs = symlinks = others = 0
+    root = _Listing(str(path))
+    if executor:
+        waiting.append(root)
+    stack: list[tuple[_Listing, tuple[IgnoreRules, ...], str] | _Leave] = [(root, (), str(path))]
+    try:
+        while stack:
+            if is_stop():
+                break
+
+            item = stack.pop()
+            if isinstance(item, _Leave):
+                for collector in collectors:
+                    collector.directory(item.path, total - item.start)
+                continue
+
+            listing, rules, dir_path = item
+            if executor:
+                if not listing.future:
+                    waiting.pop()  # the top of the stack, listed by the walk itself
+                refill()
+            entries = listing.result()
+            if listing.future:
+                pending -= 1
+
+            if collectors:
+                # popped after all subdirectories pushed below, i.e. after the whole subtree
+                stack.append(_Leave(dir_path, total))
+
+            if ignore and any(os.path.basename(p) == IGNORE_FILE for p, _, _ in entries):
+                ruleset = ignore.load(dir_path)
+                if ruleset:
+                    rules += (ruleset,)
+
+            for entry_path, is_dir, entry_st in entries:
+                if ignore and ignore(entry_path, is_dir, rules):
+                    stats.ignored += 1
+                elif entry_st.st_dev != root_dev:
+                    # a mount point of another filesystem, its bytes are not on this device
+                    continue
+                elif is_dir:
+                    dirs += 1
+                    listing = _Listing(entry_path)
+                    stack.append((listing, rules, entry_path))
+                    if executor:
+                        waiting.append(listing)
+                elif stat.S_ISREG(entry_st.st_mode):
+                    total += entry_st.st_size
+                    files += 1
+                    for collector in collectors:
+                        collector.file(entry_path, entry_st)
+                    cpu_throttling(sleep_duration)
+                elif stat.S_ISLNK(entry_st.st_mode):
+                    symlinks += 1
+                else:
+                    others += 1
+
+            if executor:
+                refill()
+    finally:
+        if executor:
+            for item in stack:
+                if not isinstance(item, _Leave):
+                    item[0].cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    stats.size = total
+    stats.files = files
+    stats.dirs = dirs
+    stats.symlinks = symlinks
+    stats.others = others
+    return stats
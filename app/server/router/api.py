@@ -1,12 +1,31 @@
-from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, List, Literal, Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
+import os
+import re
 import time
-from datetime import datetime
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
 
 from server.auth import AuthRequired, NoOpAuth
 from server.router import context
 from contrib.docker import docker_from_env
+from contrib.types import DockerSizeTree, LogHeatmap, ScanDetails
+from scan.logs import (
+    COMPRESSED,
+    LogProbes,
+    file_chunks,
+    gzip_chunks,
+    heatmap,
+    log_segments,
+    search,
+    tail,
+    tail_follow,
+)
+from scan.top import CATEGORIES, INDEX_SIZE
+from scan.tree import SizeTree
 import settings
 import logging
 
@@ -18,6 +37,10 @@ if not settings.AUTH_ENABLED:
 
 router = APIRouter(prefix='/api')
 
+log_probes = LogProbes()  # times probed in log files, only appended bytes are probed again
+
+MAX_HEATMAP_BUCKETS = 10_000
+
 
 class DashboardResponse(BaseModel):
     docker_version: Dict[str, Any]
@@ -288,6 +311,20 @@ def get_build_cache(_: AuthRequired) -> List[Dict[str, Any]]:
         raise HTTPException(status_code=500, detail=f"Failed to fetch build cache data: {str(e)}")
 
 
+@router.get('/build-cache/reclaim-curve')
+def get_build_cache_reclaim_curve(_: AuthRequired) -> Dict[str, Any]:
+    """Get the bytes freed by `docker builder prune --all` for a range of `until` ages and `--keep-storage` limits"""
+    try:
+        curve = context.build_cache_curve()
+    except Exception as e:
+        logger.error(f"Failed to fetch build cache reclaim curve: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch build cache reclaim curve: {str(e)}")
+
+    if curve is None:
+        raise HTTPException(status_code=404, detail="No build cache scan yet")
+    return curve.model_dump()
+
+
 @router.get('/logs')
 def get_logs(_: AuthRequired) -> List[Dict[str, Any]]:
     """Get Docker container logs data"""
@@ -322,35 +359,260 @@ def get_logs(_: AuthRequired) -> List[Dict[str, Any]]:
         raise HTTPException(status_code=500, detail=f"Failed to fetch logs data: {str(e)}")
 
 
+SortBy = Optional[Literal['size', 'entries']]
+
+
 @router.get('/bind-mounts')
-def get_bind_mounts(_: AuthRequired) -> List[Dict[str, Any]]:
-    """Get Docker bind mounts data"""
+def get_bind_mounts(_: AuthRequired, sort: SortBy = None) -> List[Dict[str, Any]]:
+    """Get Docker bind mounts data, optionally sorted by size or number of entries (largest first)"""
     try:
         client = docker_from_env()
         containers = client.containers.list(all=True)
+        # sizes and entry counts come from the last scan of the bind mounts
+        scanned = {item.path: item for item in context.bind_mounts()['items'] or []}
 
         bind_mounts = []
         for cont in containers:
             mounts = cont.attrs.get('Mounts', [])
             for mount in mounts:
                 if mount.get('Type') == 'bind':
-                    # Estimate size (bind mounts point to host paths)
-                    size = 0  # Placeholder; could calculate from host file system
+                    item = scanned.get(mount.get('Source', ''))
 
                     bind_mounts.append({
                         'source': mount.get('Source', ''),
                         'destination': mount.get('Destination', ''),
                         'container_name': cont.name,
-                        'size': size,
+                        'size': item.size if item else 0,
+                        'entries': item.entries if item else 0,
                         'type': 'bind'
                     })
 
+        if sort:
+            bind_mounts.sort(key=lambda x: x[sort], reverse=True)
         return bind_mounts
     except Exception as e:
         logger.error(f"Failed to fetch bind mounts data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch bind mounts data: {str(e)}")
 
 
+def _scan_details(table_name: str, key: str, item: str) -> ScanDetails:
+    """Get the details collected by the walker for an item or raise 404"""
+    try:
+        details = context.scan_details(table_name, key)
+    except Exception as e:
+        logger.error(f"Failed to fetch {item} details: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch {item} details: {str(e)}")
+
+    if details is None:
+        raise HTTPException(status_code=404, detail=f"No details collected for {item} {key}")
+    return details
+
+
+LARGEST_FIELDS = {'key', 'last_scan', 'largest_files', 'largest_dirs'}
+
+
+@router.get('/bind-mounts/largest')
+def get_bind_mount_largest(path: str, _: AuthRequired) -> Dict[str, Any]:
+    """Get the largest files and directories of a bind mount (by host path)"""
+    return _scan_details(settings.TABLE_BINDMOUNT_DETAILS, path, 'bind mount').model_dump(include=LARGEST_FIELDS)
+
+
+@router.get('/bind-mounts/details')
+def get_bind_mount_details(path: str, _: AuthRequired) -> Dict[str, Any]:
+    """Get all details collected by the last walk of a bind mount (by host path)"""
+    return _scan_details(settings.TABLE_BINDMOUNT_DETAILS, path, 'bind mount').model_dump()
+
+
+def _size_tree(path: str) -> DockerSizeTree:
+    """Get the size tree of a bind mount or raise 404"""
+    try:
+        tree = context.size_tree(path)
+    except Exception as e:
+        logger.error(f"Failed to fetch size tree: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch size tree: {str(e)}")
+
+    if tree is None:
+        raise HTTPException(status_code=404, detail=f"No size tree for bind mount {path}")
+    return tree
+
+
+@router.get('/bind-mounts/tree')
+def get_bind_mount_tree(path: str, _: AuthRequired, subtree: str = '/', depth: int = 2) -> Dict[str, Any]:
+    """
+    Get the size tree of a bind mount (by host path) from a directory relative to the mount, e.g. `/data`,
+    down to a relative depth. Directories deeper than the tree depth are only kept if they are among the largest.
+    """
+    model = _size_tree(path)
+    tree = SizeTree.from_model(model)
+    node = tree.find(subtree)
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"Directory {subtree} not in the size tree of {path}")
+    return {
+        'key': model.key,
+        'last_scan': model.last_scan,
+        'depth': model.depth,
+        'nodes': model.nodes,
+        'tree': tree.subtree(node, max(depth, 0)),
+    }
+
+
+@router.get('/bind-mounts/tree/ncdu')
+def get_bind_mount_tree_ncdu(path: str, _: AuthRequired) -> JSONResponse:
+    """Export the size tree of a bind mount (by host path) for `ncdu -f`"""
+    model = _size_tree(path)
+    filename = path.strip('/').replace('/', '_') or 'root'
+    return JSONResponse(
+        SizeTree.from_model(model).to_ncdu(path, model.last_scan),
+        headers={'Content-Disposition': f'attachment; filename="{filename}.ncdu.json"'},
+    )
+
+
+@router.get('/bind-mounts/growth')
+def get_bind_mount_growth(path: str, _: AuthRequired) -> Dict[str, Any]:
+    """Get the directories of a bind mount (by host path) that grew or shrank the most since its previous scan"""
+    try:
+        report = context.growth_report(path)
+    except Exception as e:
+        logger.error(f"Failed to fetch growth report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch growth report: {str(e)}")
+
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"No growth report for bind mount {path}")
+    return report.model_dump()
+
+
+@router.get('/volumes/{name}/details')
+def get_volume_details(name: str, _: AuthRequired) -> Dict[str, Any]:
+    """Get all details collected by the last walk of a local volume"""
+    return _scan_details(settings.TABLE_VOLUME_DETAILS, name, 'volume').model_dump()
+
+
+@router.get('/deleted-files')
+def get_deleted_files(_: AuthRequired) -> List[Dict[str, Any]]:
+    """Get files deleted while still held open by processes, largest first"""
+    try:
+        items = context.deleted_files()['items'] or []
+    except Exception as e:
+        logger.error(f"Failed to fetch deleted files: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch deleted files: {str(e)}")
+
+    items.sort(key=lambda x: x.size, reverse=True)
+    return [item.model_dump() for item in items]
+
+
+@router.get('/container-logs/top-writers')
+def get_log_top_writers(_: AuthRequired) -> Dict[str, Any]:
+    """Get the fastest growing container log files, by moving average of bytes written per second"""
+    try:
+        report = context.log_growth()
+    except Exception as e:
+        logger.error(f"Failed to fetch log growth rates: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch log growth rates: {str(e)}")
+
+    if report is None:
+        raise HTTPException(status_code=404, detail="No log growth rates yet")
+    return report.model_dump()
+
+
+Codec = Literal['zlib', 'lzma']  # the codecs of scan.collectors.CODECS
+
+
+@router.get('/compression')
+def get_compression(_: AuthRequired, codec: Codec = 'zlib') -> List[Dict[str, Any]]:
+    """Get the estimated compression ratios of bind mounts, volumes and overlay2 layers, largest savings first"""
+    try:
+        estimates = context.compression_estimates()
+    except Exception as e:
+        logger.error(f"Failed to fetch compression estimates: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch compression estimates: {str(e)}")
+
+    def savings(estimate) -> int:
+        return next((ratio.savings for ratio in estimate.codecs if ratio.codec == codec), 0)
+
+    estimates.sort(key=lambda item: savings(item[2]), reverse=True)
+    return [{'type': item, 'key': key} | estimate.model_dump() for item, key, estimate in estimates]
+
+
+@router.get('/duplicates')
+def get_duplicates(_: AuthRequired) -> Dict[str, Any]:
+    """Get the sets of identical files found in bind mounts and volumes, most reclaimable bytes first"""
+    try:
+        report = context.dedup_report()
+    except Exception as e:
+        logger.error(f"Failed to fetch duplicate files: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch duplicate files: {str(e)}")
+
+    if report is None:
+        raise HTTPException(status_code=404, detail="No search for duplicate files yet")
+    return report.model_dump()
+
+
+@router.get('/rollups')
+def get_rollups(_: AuthRequired, label: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Get the disk usage grouped by a container label (the first of ROLLUP_LABELS by default), largest first"""
+    label = label or next(iter(settings.ROLLUP_LABELS), '')
+    if label not in settings.ROLLUP_LABELS:
+        raise HTTPException(status_code=404, detail=f"Label {label} is not in ROLLUP_LABELS")
+    try:
+        items = context.rollups(label)
+    except Exception as e:
+        logger.error(f"Failed to fetch usage rollups: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch usage rollups: {str(e)}")
+
+    return [item.model_dump() for item in items]
+
+
+@router.get('/containers/footprints')
+def get_container_footprints(_: AuthRequired, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Get the disk footprint of each container (image, writable layer, logs, volumes, bind mounts), heaviest first"""
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    try:
+        items = context.footprints(limit)
+    except Exception as e:
+        logger.error(f"Failed to fetch container footprints: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch container footprints: {str(e)}")
+
+    return [item.model_dump() for item in items]
+
+
+@router.get('/top')
+def get_top(_: AuthRequired, n: int = 20, category: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the N biggest disk consumers across all categories (or the comma-separated ones), largest first.
+    No total is given: the categories overlap (e.g. overlay2 layers hold the images and the containers),
+    so their sizes don't add up.
+    """
+    categories = list(dict.fromkeys(category.split(','))) if category else list(CATEGORIES)
+    unknown = [item for item in categories if item not in CATEGORIES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown categories: {', '.join(unknown)}")
+    if not 1 <= n <= INDEX_SIZE:
+        raise HTTPException(status_code=400, detail=f"n must be between 1 and {INDEX_SIZE}")
+    try:
+        items = context.top(n, categories)
+    except Exception as e:
+        logger.error(f"Failed to fetch top disk consumers: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch top disk consumers: {str(e)}")
+
+    return {'items': [item.model_dump() for item in items]}
+
+
+@router.get('/reclaimable')
+def get_reclaimable(_: AuthRequired) -> Dict[str, Any]:
+    """Get the bytes freed by each cleanup action, exclusive bytes add up to the total"""
+    try:
+        actions = context.reclaimable()
+    except Exception as e:
+        logger.error(f"Failed to fetch reclaimable space: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch reclaimable space: {str(e)}")
+
+    return {
+        'total': sum(action.exclusive for action in actions),
+        'actions': [action.model_dump() for action in actions],
+    }
+
+
 @router.get('/overlay2')
 def get_overlay2(_: AuthRequired) -> Dict[str, Any]:
     """Get Docker overlay2 data"""
@@ -367,6 +629,9 @@ def get_overlay2(_: AuthRequired) -> Dict[str, Any]:
         active_layers = total_layers  # All layers are technically "active" if referenced
         unused_layers = 0  # Docker manages cleanup automatically
 
+        # estimated by compressing samples of the scanned layers
+        compression_ratio = context.compression_ratio('overlay2 layer')
+
         return {
             'totalSize': layers_size,
             'totalLayers': total_layers,
@@ -393,7 +658,7 @@ def get_overlay2(_: AuthRequired) -> Dict[str, Any]:
             'storageEfficiency': {
                 'layerSharing': 'Good',
                 'deduplication': '85%',  # Estimate
-                'compressionRatio': '2.1:1'
+                'compressionRatio': f'{compression_ratio:.1f}:1' if compression_ratio else 'n/a'
             },
             'layerDistribution': {
                 'imageLayers': total_layers,
@@ -414,6 +679,32 @@ def get_overlay2(_: AuthRequired) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Failed to fetch overlay2 data: {str(e)}")
 
 
+@router.get('/overlay2/layers')
+def get_overlay2_layers(_: AuthRequired, sort: SortBy = None) -> List[Dict[str, Any]]:
+    """Get scanned overlay2 layers, optionally sorted by size or number of entries (largest first)"""
+    try:
+        layers = context.overlay2()['items'] or []
+    except Exception as e:
+        logger.error(f"Failed to fetch overlay2 layers: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch overlay2 layers: {str(e)}")
+
+    if sort:
+        layers.sort(key=lambda x: getattr(x, sort), reverse=True)
+    return [layer.model_dump() | {'entries': layer.entries} for layer in layers]
+
+
+@router.get('/overlay2/{layer_id}/largest')
+def get_overlay2_largest(layer_id: str, _: AuthRequired) -> Dict[str, Any]:
+    """Get the largest files and directories of an overlay2 layer"""
+    return _scan_details(settings.TABLE_OVERLAY2_DETAILS, layer_id, 'overlay2 layer').model_dump(include=LARGEST_FIELDS)
+
+
+@router.get('/overlay2/{layer_id}/details')
+def get_overlay2_details(layer_id: str, _: AuthRequired) -> Dict[str, Any]:
+    """Get all details collected by the last walk of an overlay2 layer"""
+    return _scan_details(settings.TABLE_OVERLAY2_DETAILS, layer_id, 'overlay2 layer').model_dump()
+
+
 @router.get('/system-info')
 def get_system_info(_: AuthRequired) -> Dict[str, Any]:
     """Get Docker system information"""
@@ -460,6 +751,166 @@ def get_docker_events(_: AuthRequired) -> List[Dict[str, Any]]:
         raise HTTPException(status_code=500, detail=f"Failed to fetch events: {str(e)}")
 
 
+def _log_file(container_id: str) -> Path:
+    """Get the live json-file log of a container or raise 404, 400 if the ID prefix is ambiguous"""
+    try:
+        path = context.log_file(container_id)
+    except LookupError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to find the log file of {container_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to find the log file: {str(e)}")
+
+    if path is None:
+        raise HTTPException(status_code=404, detail="No json-file log found for the container")
+    return path
+
+
+@router.get('/container-logs/{container_id}/tail')
+def tail_container_logs(container_id: str, _: AuthRequired, lines: int = 100, follow: bool = False):
+    """Stream the last lines of a container log as NDJSON, read from its json-file log, then new lines if following"""
+    path = _log_file(container_id)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="No json-file log found for the container")
+    # a follower waits with async sleeps, it doesn't hold a worker thread of the threadpool
+    chunks = tail_follow(path, lines) if follow else tail(path, lines)
+    return StreamingResponse(chunks, media_type='application/x-ndjson')
+
+
+@router.get('/container-logs/{container_id}/search')
+def search_container_logs(
+    container_id: str,
+    _: AuthRequired,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = None,
+    limit: int = 1000,
+):
+    """Stream the lines of a container log and its rotated files in a time range matching a regex, as NDJSON"""
+    try:
+        pattern = re.compile(q.encode()) if q else None
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regular expression: {str(e)}")
+    path = _log_file(container_id)
+    # naive times are UTC, like the times of the log lines
+    since, until = (ts.replace(tzinfo=ts.tzinfo or UTC) if ts else None for ts in (since, until))
+    return StreamingResponse(search(path, since, until, pattern, limit), media_type='application/x-ndjson')
+
+
+@router.get('/container-logs/{container_id}/heatmap')
+def get_container_log_heatmap(
+    container_id: str,
+    _: AuthRequired,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: int = 60,
+) -> Dict[str, Any]:
+    """Get the bytes written to a container log per time bucket (in seconds), over the last 24 hours by default"""
+    until = until.replace(tzinfo=until.tzinfo or UTC) if until else datetime.now(UTC)
+    since = since.replace(tzinfo=since.tzinfo or UTC) if since else until - timedelta(hours=24)
+    if bucket <= 0 or since >= until:
+        raise HTTPException(status_code=400, detail="Invalid time range or bucket")
+    if (until - since).total_seconds() / bucket > MAX_HEATMAP_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"More than {MAX_HEATMAP_BUCKETS} buckets")
+
+    path = _log_file(container_id)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="No json-file log found for the container")
+    try:
+        buckets = heatmap(path, since, until, bucket, log_probes)
+    except Exception as e:
+        logger.error(f"Failed to compute the log heatmap of {container_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute the log heatmap: {str(e)}")
+
+    return LogHeatmap(since=since, until=until, bucket=bucket, total=sum(buckets), buckets=buckets).model_dump()
+
+
+@router.get('/container-logs/{container_id}/files')
+def get_container_log_files(container_id: str, _: AuthRequired) -> List[Dict[str, Any]]:
+    """Get the log files of a container, rotated segments first and the live log last"""
+    path = _log_file(container_id)
+    files = []
+    for segment in log_segments(path):
+        try:
+            files.append({'name': segment.name, 'size': segment.stat().st_size})
+        except OSError:
+            continue  # rotated away in the meantime
+    return files
+
+
+def _byte_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Offsets of a single byte range (`bytes=start-end`, `start-` or `-suffix`), None to send the whole file"""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None  # no range, or one not supported: the whole file is sent
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        return None  # invalid range, ignored as RFC 9110 says: the whole file is sent
+    if not first:
+        start, end = max(size - int(last), 0), size
+    else:
+        start, end = int(first), min(int(last) + 1, size) if last else size
+    if start >= end:
+        headers = {'Content-Range': f'bytes */{size}'}
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers=headers)
+    return start, end
+
+
+@router.get('/container-logs/{container_id}/download')
+def download_container_log(
+    container_id: str,
+    _: AuthRequired,
+    file: Optional[str] = None,
+    gzip: bool = False,
+    range_: Optional[str] = Header(None, alias='Range'),
+):
+    """
+    Download a log file of a container as it is on disk, the live log by default. Range requests are
+    supported to resume a download, except when compressing it on the fly (gzip=true).
+    The live log grows during the download: its size is taken when the download starts, and exactly the
+    bytes up to it are sent, so the Content-Length holds. The file is read a block at a time, uvicorn 0.34
+    doesn't implement the ASGI pathsend extension, so there is no zero-copy sendfile either way.
+    """
+    path = _log_file(container_id)
+    if file:
+        # only the log files of the container, never another path
+        path = next((segment for segment in log_segments(path) if segment.name == file), None)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Log file not found")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Log file not found")
+
+    if gzip and not path.name.endswith(COMPRESSED):
+        return StreamingResponse(
+            gzip_chunks(path),
+            media_type='application/gzip',
+            headers={'Content-Disposition': f'attachment; filename="{path.name}{COMPRESSED}"'},
+        )
+    media_type = 'application/gzip' if path.name.endswith(COMPRESSED) else 'application/x-ndjson'
+    fd = path.open('rb')
+    size = os.fstat(fd.fileno()).st_size  # the same file is read even if it's rotated in the meantime
+    try:
+        byte_range = _byte_range(range_, size)
+    except HTTPException:
+        fd.close()
+        raise
+    start, end = byte_range or (0, size)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'attachment; filename="{path.name}"',
+        'Content-Length': str(end - start),
+    }
+    if byte_range:
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    return StreamingResponse(
+        file_chunks(fd, start, end),
+        status_code=206 if byte_range else 200,
+        media_type=media_type,
+        headers=headers,
+        background=BackgroundTask(fd.close),  # also if the client disconnects before the end
+    )
+
+
 @router.get('/container-logs/{container_id}')
 def get_container_logs(container_id: str, _: AuthRequired, lines: int = 100) -> Dict[str, Any]:
     """Get logs for a specific container using Docker API"""
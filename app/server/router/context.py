@@ -1,6 +1,8 @@
+import os
 from collections.abc import Sequence
 from datetime import datetime, UTC
 from operator import attrgetter
+from pathlib import Path
 
 import psutil
 from humanize import naturaltime
@@ -10,19 +12,33 @@ from pydantic import BaseModel
 
 import settings
 from contrib import kvstore
-from contrib.docker import docker_from_env
+from contrib.docker import docker_from_env, map_host_path_to_container
 from contrib.types import (
     DockerVersion,
     DockerImageList,
     DockerContainerList,
     DockerVolumeList,
     DockerBuildCacheList,
+    BuildCacheCurve,
     DockerMount,
     DockerContainerLog,
+    DockerDeletedFile,
     DockerBindMounts,
     DockerOverlay2Layer,
     DiskUsage,
+    CompressionEstimate,
+    DedupReport,
+    DockerSizeTree,
+    GrowthReport,
+    LogGrowthReport,
+    ReclaimableSpace,
+    ScanDetails,
+    UsageRollup,
+    ContainerFootprint,
+    TopEntry,
 )
+from scan.reclaim import ACTIONS
+from scan.top import CATEGORIES, top as scan_top
 from scan.utils import pretty_size
 
 
@@ -131,6 +147,19 @@ def build_cache() -> dict:
     return context
 
 
+def build_cache_curve() -> BuildCacheCurve | None:
+    """
+    Bytes freed by pruning the build cache for a range of ages and storage limits, as of the last df scan.
+    """
+    if settings.DB_DF.exists():
+        db = SqliteDatabase(settings.DB_DF)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_SYSTEM_DF)
+            if settings.BUILD_CACHE_CURVE_KEY in kv:
+                return kvstore.get(settings.BUILD_CACHE_CURVE_KEY, kv, BuildCacheCurve)
+    return None
+
+
 def bind_mounts() -> dict:
     items = None
 
@@ -169,6 +198,69 @@ def logs() -> dict:
     return context
 
 
+def deleted_files() -> dict:
+    items = None
+
+    if settings.DB_DF.exists():
+        db = SqliteDatabase(settings.DB_DF)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_DELETED_FILES)
+            items = kvstore.get_all(kv, DockerDeletedFile)
+
+    context = {
+        'name': 'deleted_files',
+        'items': items,
+        'total': total_size(items),
+        'si': settings.SI,
+        'last_scan_at': last_scan_time(settings.TABLE_DELETED_FILES),
+    }
+    return context
+
+
+def log_file(container_id: str) -> Path | None:
+    """
+    Live `json-file` log of a container (by ID, short ID or name) found by the last logfiles scan,
+    as a path in the Doku container. None for other logging drivers.
+    Like the docker CLI, a full ID or a name is matched first, and an ID prefix of several containers
+    raises a LookupError.
+    """
+    if not container_id or not settings.DB_DF.exists():
+        return None
+
+    db = SqliteDatabase(settings.DB_DF)
+    with db:
+        kv = KeyValue(database=db, table_name=settings.TABLE_SYSTEM_DF)
+        if settings.ROOT_MOUNT_KEY not in kv:
+            return None
+        root_mount = kvstore.get(settings.ROOT_MOUNT_KEY, kv, DockerMount)
+        kv = KeyValue(database=db, table_name=settings.TABLE_LOGFILES)
+        items = kvstore.get_all(kv, DockerContainerLog)
+
+    # the IDs of the logs are short IDs, a full ID starts with one
+    item = next((item for item in items if item.name == container_id or container_id.startswith(item.id)), None)
+    if item is None:
+        matches = [item for item in items if item.id.startswith(container_id)]
+        if len(matches) > 1:
+            raise LookupError(f'Multiple containers found with the ID prefix {container_id}')
+        item = next(iter(matches), None)
+    if item is None or not item.path.endswith('-json.log'):
+        return None
+    return map_host_path_to_container(root_mount.src, root_mount.dst, item.path)
+
+
+def log_growth() -> LogGrowthReport | None:
+    """
+    Fastest growing log files, sampled every few seconds.
+    """
+    if settings.DB_DF.exists():
+        db = SqliteDatabase(settings.DB_DF)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_LOG_RATES)
+            if settings.LOG_RATES_KEY in kv:
+                return kvstore.get(settings.LOG_RATES_KEY, kv, LogGrowthReport)
+    return None
+
+
 def overlay2() -> dict:
     items = None
 
@@ -188,6 +280,150 @@ def overlay2() -> dict:
     return context
 
 
+def scan_details(table_name: str, key: str) -> ScanDetails | None:
+    """
+    Details collected by the walker for a bind mount (keyed by host path) or an overlay2 layer (keyed by ID).
+    """
+    if settings.DB_DU.exists():
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            kv = KeyValue(database=db, table_name=table_name)
+            if key in kv:
+                return kvstore.get(key, kv, ScanDetails)
+    return None
+
+
+COMPRESSION_TABLES = {
+    'bind mount': settings.TABLE_BINDMOUNT_DETAILS,
+    'volume': settings.TABLE_VOLUME_DETAILS,
+    'overlay2 layer': settings.TABLE_OVERLAY2_DETAILS,
+}
+
+
+def compression_estimates() -> list[tuple[str, str, CompressionEstimate]]:
+    """
+    Compression estimates of all scanned items: (type, key, estimate).
+    """
+    ret = []
+    if settings.DB_DU.exists():
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            for item, table_name in COMPRESSION_TABLES.items():
+                kv = KeyValue(database=db, table_name=table_name)
+                for details in kvstore.get_all(kv, ScanDetails):
+                    if details.compression:
+                        ret.append((item, details.key, details.compression))
+    return ret
+
+
+def compression_ratio(item: str, codec: str = 'zlib') -> float | None:
+    """
+    Estimated compression ratio of all scanned items of a type, None if none was estimated.
+    """
+    size = compressed = 0.0
+    for item_, _, estimate in compression_estimates():
+        for ratio in estimate.codecs:
+            if item_ == item and ratio.codec == codec and ratio.ratio:
+                size += estimate.size
+                compressed += estimate.size / ratio.ratio
+    return size / compressed if compressed else None
+
+
+def size_tree(key: str) -> DockerSizeTree | None:
+    """
+    Size tree of the last walk of a bind mount (keyed by host path).
+    """
+    if settings.DB_DU.exists():
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_BINDMOUNT_TREES)
+            if key in kv:
+                return kvstore.get(key, kv, DockerSizeTree)
+    return None
+
+
+def growth_report(key: str) -> GrowthReport | None:
+    """
+    Largest changes of a bind mount (keyed by host path) between its last two walks.
+    """
+    if settings.DB_DU.exists():
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_BINDMOUNT_GROWTH)
+            if key in kv:
+                return kvstore.get(key, kv, GrowthReport)
+    return None
+
+
+def dedup_report() -> DedupReport | None:
+    """
+    Duplicate files found in bind mounts and volumes by the last search.
+    """
+    if settings.DB_DU.exists():
+        db = SqliteDatabase(settings.DB_DU)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_DEDUP)
+            if settings.DEDUP_KEY in kv:
+                return kvstore.get(settings.DEDUP_KEY, kv, DedupReport)
+    return None
+
+
+def reclaimable() -> list[ReclaimableSpace]:
+    """
+    Bytes freed by each cleanup action, in the order their exclusive bytes are counted.
+    """
+    items = []
+    if settings.DB_DF.exists():
+        db = SqliteDatabase(settings.DB_DF)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_RECLAIMABLE)
+            items = kvstore.get_all(kv, ReclaimableSpace)
+    items.sort(key=lambda item: ACTIONS.index(item.action) if item.action in ACTIONS else len(ACTIONS))
+    return items
+
+
+def footprints(limit: int | None = None) -> list[ContainerFootprint]:
+    """
+    Disk footprint of the containers, heaviest first.
+    """
+    items = []
+    if settings.DB_DF.exists():
+        db = SqliteDatabase(settings.DB_DF)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_FOOTPRINTS)
+            items = kvstore.get_all(kv, ContainerFootprint)
+    items.sort(key=attrgetter('total'), reverse=True)
+    return items[:limit]
+
+
+def top(n: int, categories: Sequence[str] = CATEGORIES) -> list[TopEntry]:
+    """
+    The `n` largest disk consumers across the categories, largest first.
+    """
+    items = []
+    if settings.DB_DF.exists():
+        db = SqliteDatabase(settings.DB_DF)
+        with db:
+            items = scan_top(KeyValue(database=db, table_name=settings.TABLE_TOP), n, categories)
+    return items
+
+
+def rollups(label: str) -> list[UsageRollup]:
+    """
+    Disk usage grouped by the value of a container label, largest first.
+    """
+    items = []
+    if settings.DB_DF.exists():
+        db = SqliteDatabase(settings.DB_DF)
+        with db:
+            kv = KeyValue(database=db, table_name=settings.TABLE_ROLLUPS)
+            # keys are `<label>=<value>`: a range scan of the primary key index
+            values = kv[(kv.key >= f'{label}=') & (kv.key < f'{label}>')]
+            items = [UsageRollup.model_validate_json(str(value)) for value in values]
+    items.sort(key=attrgetter('total'), reverse=True)
+    return items
+
+
 class Summary(BaseModel):
     num: int = 0
     total_size: int
@@ -222,16 +458,19 @@ def summary(db: SqliteDatabase) -> dict[str, Summary]:
                 pretty_total_size=pretty_size(total_size),
             )
 
-    # retrieve logs
-    kv = KeyValue(database=db, table_name=settings.TABLE_LOGFILES)
-    key = settings.TABLE_LOGFILES
-    items = kvstore.get_all(kv, DockerContainerLog)
-    total_size = sum(map(attrgetter('size'), items))
-    r[key] = Summary(
-        num=len(items),
-        total_size=total_size,
-        pretty_total_size=pretty_size(total_size),
-    )
+    # retrieve logs and deleted files held open
+    for key, model in (
+        (settings.TABLE_LOGFILES, DockerContainerLog),
+        (settings.TABLE_DELETED_FILES, DockerDeletedFile),
+    ):
+        kv = KeyValue(database=db, table_name=key)
+        items = kvstore.get_all(kv, model)
+        total_size = sum(map(attrgetter('size'), items))
+        r[key] = Summary(
+            num=len(items),
+            total_size=total_size,
+            pretty_total_size=pretty_size(total_size),
+        )
     return r
 
 
@@ -266,7 +505,8 @@ def overlay2_summary(db: SqliteDatabase) -> dict[str, Summary]:
 
 
 def disk_usage() -> DiskUsage:
-    du = psutil.disk_usage('/')
+    path = '/'
+    du = psutil.disk_usage(path)
 
     if settings.DB_DF.exists():
         db = SqliteDatabase(settings.DB_DF)
@@ -277,13 +517,20 @@ def disk_usage() -> DiskUsage:
                 root_mount = kvstore.get(settings.ROOT_MOUNT_KEY, kv, DockerMount)
                 _du = psutil.disk_usage(root_mount.destination)
                 if _du.total > du.total:
-                    du = _du
+                    path, du = root_mount.destination, _du
 
+    # inodes of the same filesystem, running out of them is as bad as running out of bytes
+    st = os.statvfs(path)
+    inodes_used = st.f_files - st.f_ffree
     return DiskUsage(
         total=du.total,
         used=du.used,
         free=du.free,
         percent=du.percent,
+        inodes_total=st.f_files,
+        inodes_used=inodes_used,
+        inodes_free=st.f_favail,
+        inodes_percent=round(inodes_used / st.f_files * 100, 1) if st.f_files else 0,
     )
 
 
@@ -311,10 +558,20 @@ def dashboard() -> dict:
             # retrieve bind mounts and overlay2 layers
             items |= overlay2_summary(db)
 
+    # bytes freed by the cleanup actions, without counting any twice
+    actions = reclaimable()
+    reclaimable_size = sum(map(attrgetter('exclusive'), actions))
+    items['reclaimable'] = Summary(
+        num=sum(map(attrgetter('items'), actions)),
+        total_size=reclaimable_size,
+        pretty_total_size=pretty_size(reclaimable_size),
+    )
+
     context = {
         'name': 'dashboard',
         'si': settings.SI,
         'version': version,
         'disk_usage': disk_usage(),
+        'reclaimable_actions': actions,
     } | items
     return context
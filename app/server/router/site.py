@@ -51,6 +51,12 @@ def logs(request: Request, _: AuthRequired):
     return templates.TemplateResponse(request=request, name='pages/logs.html', context=ctx)
 
 
+@router.get('/deleted-files/', name='deleted_files', response_class=HTMLResponse, include_in_schema=False)
+def deleted_files(request: Request, _: AuthRequired):
+    ctx = context.deleted_files()
+    return templates.TemplateResponse(request=request, name='pages/deleted_files.html', context=ctx)
+
+
 @router.get('/build-cache/', name='build_cache', response_class=HTMLResponse, include_in_schema=False)
 def build_cache(request: Request, _: AuthRequired):
     ctx = context.build_cache()
@@ -1,6 +1,15 @@
 from dataclasses import dataclass
+from datetime import datetime, UTC
+from unittest.mock import patch
 
-from server.router.context import total_size
+import pytest
+from peewee import SqliteDatabase
+from playhouse.kv import KeyValue
+
+import settings
+from contrib import kvstore
+from contrib.types import DockerContainerLog, DockerMount
+from server.router.context import log_file, total_size
 
 
 @dataclass
@@ -32,3 +41,30 @@ def test_total_size():
     assert total_size([]) == '0'
 
     assert total_size(None) == '0'
+
+
+def test_log_file(tmp_path):
+    db_path = tmp_path / 'df.sqlite3'
+    db = SqliteDatabase(db_path)
+    with db:
+        kv = KeyValue(database=db, table_name=settings.TABLE_SYSTEM_DF)
+        mount = DockerMount(Source='/var/lib/docker', Destination=str(tmp_path), Type='bind')
+        kvstore.set(settings.ROOT_MOUNT_KEY, mount, kv)
+        kv = KeyValue(database=db, table_name=settings.TABLE_LOGFILES)
+        for id_, name in (('abc111111111', 'web'), ('abc222222222', 'db'), ('def333333333', 'abc')):
+            (tmp_path / 'containers' / id_).mkdir(parents=True)
+            (tmp_path / 'containers' / id_ / f'{id_}-json.log').touch()
+            path = f'/var/lib/docker/containers/{id_}/{id_}-json.log'
+            log = DockerContainerLog(id=id_, name=name, image='img', path=path, size=0, last_scan=datetime.now(UTC))
+            kvstore.set(id_, log, kv)
+
+    with patch('server.router.context.settings.DB_DF', db_path):
+        # by name, short ID, full ID or unique ID prefix
+        for container_id in ('web', 'abc111111111', 'abc111111111' + '1' * 52, 'abc1'):
+            assert log_file(container_id).name == 'abc111111111-json.log'
+        # a name is matched before an ID prefix
+        assert log_file('abc').name == 'def333333333-json.log'
+        # an ID prefix of several containers is ambiguous
+        with pytest.raises(LookupError):
+            log_file('ab')
+        assert log_file('xyz') is None
@@ -18,6 +18,7 @@ from contrib.types import (
     DockerBuildCacheList,
     DockerMount,
     DockerContainerLog,
+    DockerDeletedFile,
     DockerBindMounts,
     DockerOverlay2Layer,
 )
@@ -176,6 +177,31 @@ def test_logs(mock_kvstore, log_start_time):
     assert response.headers['content-type'] == 'text/html; charset=utf-8'
 
 
+@patch('server.router.context.kvstore')
+def test_deleted_files(mock_kvstore, log_start_time):
+    settings.DB_DF.touch()
+    log_start_time(settings.DB_DIR, settings.TABLE_DELETED_FILES)
+
+    files = [
+        DockerDeletedFile(
+            path='/var/log/nginx/access.log.1',
+            size=50000,
+            apparent_size=50000,
+            pids=[1234, 1235],
+            process='nginx',
+            container_id='123456789abc',
+            container='nginx',
+            last_scan='2023-01-01T12:00:00Z',
+        ),
+    ]
+    mock_kvstore.get_all.return_value = files
+
+    response = client.get('/site/deleted-files/')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'text/html; charset=utf-8'
+    assert 'access.log.1' in response.text
+
+
 @patch('server.router.context.kvstore')
 def test_overlay2(mock_kvstore, log_start_time):
     settings.DB_DU.touch()
@@ -5,7 +5,7 @@ from pathlib import Path
 
 from docker import constants as docker
 from dotenv import load_dotenv
-from pydantic import Field, PositiveInt, ValidationError, field_validator
+from pydantic import Field, NonNegativeInt, PositiveInt, ValidationError, field_validator
 from pydantic_settings import BaseSettings
 
 
@@ -26,6 +26,15 @@ class ScanIntensity(str, Enum):
     LIGHT = 'light'
 
 
+class ScanStrategy(str, Enum):
+    AUTO = 'auto'
+    DU = 'du'
+    WALK = 'walk'
+    PARALLEL = 'parallel'
+    ESTIMATE = 'estimate'
+    SKIP = 'skip'
+
+
 class Settings(BaseSettings):
     # general settings
     host: str = Field(alias='HOST', default='0.0.0.0', description='Interface address to bind the server to')
@@ -59,6 +68,42 @@ class Settings(BaseSettings):
         default=60 * 5,
         description='How frequently to check container log sizes (in seconds)',
     )
+    scan_deleted_files_interval: PositiveInt = Field(
+        alias='SCAN_DELETED_FILES_INTERVAL',
+        default=60,
+        description='How often to look for deleted files still held open by processes (in seconds)',
+    )
+    scan_log_rate_interval: PositiveInt = Field(
+        alias='SCAN_LOG_RATE_INTERVAL',
+        default=5,
+        description='How often to sample the size of container log files for their growth rate (in seconds)',
+    )
+    log_rate_half_life: PositiveInt = Field(
+        alias='LOG_RATE_HALF_LIFE',
+        default=60,
+        description='Half-life of the moving average of the log growth rate (in seconds)',
+    )
+    log_rate_top_n: PositiveInt = Field(
+        alias='LOG_RATE_TOP_N',
+        default=10,
+        description='Number of fastest growing log files reported',
+    )
+    rollup_labels: str = Field(
+        alias='ROLLUP_LABELS',
+        default='com.docker.compose.project',
+        examples=['com.docker.compose.project;team'],
+        description='Container labels to group disk usage by (semicolon-separated)',
+    )
+    reclaim_build_cache_age: NonNegativeInt = Field(
+        alias='RECLAIM_BUILD_CACHE_AGE',
+        default=60 * 60 * 24 * 7,
+        description='Build cache unused for longer than this is counted as reclaimable (in seconds)',
+    )
+    reclaim_log_size: NonNegativeInt = Field(
+        alias='RECLAIM_LOG_SIZE',
+        default=100 * 1024 * 1024,
+        description='Log files larger than this are counted as reclaimable (in bytes)',
+    )
     scan_bindmounts_interval: PositiveInt = Field(
         alias='SCAN_BINDMOUNTS_INTERVAL',
         default=60 * 60,
@@ -70,6 +115,45 @@ class Settings(BaseSettings):
         examples=['/home/*;/tmp/*;*/.git/*'],
         description='Paths matching these patterns will be excluded from bind mount scanning (semicolon-separated)',
     )
+    scan_ignore_files: bool = Field(
+        alias='SCAN_IGNORE_FILES',
+        default=True,
+        description='Skip paths listed in .dokuignore files (gitignore syntax) found inside scanned directories',
+    )
+    bindmount_estimate_patterns: str = Field(
+        alias='BINDMOUNT_ESTIMATE_PATTERNS',
+        default='',
+        examples=['/mnt/nfs/*;/srv/archive'],
+        description='Bind mounts matching these patterns are sized by random sampling instead of a full scan (semicolon-separated)',
+    )
+    scan_estimate_probes: PositiveInt = Field(
+        alias='SCAN_ESTIMATE_PROBES',
+        default=200,
+        description='Number of random directory probes used to estimate the size of a bind mount',
+    )
+    scan_bindmounts_exact_interval: PositiveInt = Field(
+        alias='SCAN_BINDMOUNTS_EXACT_INTERVAL',
+        default=60 * 60 * 24 * 7,
+        description='How often estimated bind mounts are fully scanned to recalibrate the estimate (in seconds)',
+    )
+    scan_fstype_policies: str = Field(
+        alias='SCAN_FSTYPE_POLICIES',
+        default='nfs=parallel;nfs4=parallel;cifs=parallel;smb3=parallel;9p=parallel;fuse=estimate;fuse.*=estimate',
+        examples=['nfs*=parallel;fuse.sshfs=skip;fuse.*=estimate'],
+        description='Scan strategy of bind mounts by backing filesystem type: auto, du, walk, parallel, estimate or skip '
+        '(semicolon-separated type=strategy pairs, types may contain wildcards)',
+    )
+    scan_parallel_threads: PositiveInt = Field(
+        alias='SCAN_PARALLEL_THREADS',
+        default=32,
+        description='Number of threads listing directories concurrently with the parallel scan strategy',
+    )
+    scan_pseudo_fstypes: str = Field(
+        alias='SCAN_PSEUDO_FSTYPES',
+        default='proc;sysfs;devtmpfs;devpts;tmpfs;ramfs;cgroup;cgroup2;securityfs;debugfs;tracefs;pstore;bpf;mqueue;'
+        'hugetlbfs;configfs;fusectl;binfmt_misc;autofs;nsfs;efivarfs;rpc_pipefs;overlay',
+        description='Filesystem types that are never entered when scanning (semicolon-separated)',
+    )
     scan_overlay2_interval: PositiveInt = Field(
         alias='SCAN_OVERLAY2_INTERVAL',
         default=60 * 60 * 24,
@@ -80,6 +164,37 @@ class Settings(BaseSettings):
         default=False,
         description='Disable Overlay2 storage scanning',
     )
+    scan_volumes_interval: PositiveInt = Field(
+        alias='SCAN_VOLUMES_INTERVAL',
+        default=60 * 60,
+        description='How often local volumes are walked to collect their details (in seconds)',
+    )
+    disable_volumes_scan: bool = Field(
+        alias='DISABLE_VOLUMES_SCAN',
+        default=False,
+        description='Disable walking local volumes (their sizes still come from the Docker API)',
+    )
+    scan_dedup_interval: PositiveInt = Field(
+        alias='SCAN_DEDUP_INTERVAL',
+        default=60 * 60 * 24,
+        description='How often the files found by the last scans of bind mounts and local volumes are searched for '
+        'duplicates (in seconds)',
+    )
+    disable_dedup_scan: bool = Field(
+        alias='DISABLE_DEDUP_SCAN',
+        default=False,
+        description='Disable the search for duplicate files',
+    )
+    scan_dedup_min_size: NonNegativeInt = Field(
+        alias='SCAN_DEDUP_MIN_SIZE',
+        default=1024 * 1024,
+        description='Files smaller than this are not searched for duplicates (in bytes)',
+    )
+    scan_dedup_workers: NonNegativeInt = Field(
+        alias='SCAN_DEDUP_WORKERS',
+        default=2,
+        description='Number of processes hashing files when searching for duplicates (0 to hash in the scanner process)',
+    )
     scan_intensity: ScanIntensity = Field(
         alias='SCAN_INTENSITY',
         default=ScanIntensity.NORMAL,
@@ -88,7 +203,80 @@ class Settings(BaseSettings):
     scan_use_du: bool = Field(
         alias='SCAN_USE_DU',
         default=True,
-        description='Use the faster system `du` command for disk calculations instead of slower built-in methods',
+        description='Allow the system `du` command for disk calculations. Bind mounts pick `du` or the built-in walker by measured speed, the walker when their details (largest files, breakdowns, ages, size tree, duplicate candidates) are older than SCAN_DETAILS_INTERVAL',
+    )
+    scan_backend_reprobe_interval: PositiveInt = Field(
+        alias='SCAN_BACKEND_REPROBE_INTERVAL',
+        default=60 * 60 * 24 * 7,
+        description='How often the throughput of the scan backend not in use is measured again (in seconds)',
+    )
+    scan_details_interval: NonNegativeInt = Field(
+        alias='SCAN_DETAILS_INTERVAL',
+        default=60 * 60 * 24,
+        description='How often bind mounts are walked to refresh their details, and overlay2 layers to refresh their '
+        'compression estimates, `du` may measure them in between (in seconds, 0 to walk every scan)',
+    )
+    scan_top_k: NonNegativeInt = Field(
+        alias='SCAN_TOP_K',
+        default=20,
+        description='Number of largest files and directories kept for each bind mount, volume and overlay2 layer (0 to disable). '
+        'Collected by the built-in walker only',
+    )
+    scan_overlay2_details: bool = Field(
+        alias='SCAN_OVERLAY2_DETAILS',
+        default=False,
+        description='Collect the details of overlay2 layers (largest files, breakdowns, ages). The layers are walked '
+        'by the built-in walker instead of using `du`, which is slower. Without them, the compressibility of the '
+        'layers is still estimated by a walk every SCAN_DETAILS_INTERVAL',
+    )
+    scan_breakdown_keys: NonNegativeInt = Field(
+        alias='SCAN_BREAKDOWN_KEYS',
+        default=50,
+        description='Number of file extensions and owner uids kept in the usage breakdown of each scanned directory, '
+        'the rest is counted as "other" (0 to disable)',
+    )
+    scan_tree_depth: NonNegativeInt = Field(
+        alias='SCAN_TREE_DEPTH',
+        default=3,
+        description='Depth of the size tree kept for each bind mount, all directories down to it are kept (0 to disable)',
+    )
+    scan_tree_deep_nodes: NonNegativeInt = Field(
+        alias='SCAN_TREE_DEEP_NODES',
+        default=500,
+        description='Number of the largest directories below SCAN_TREE_DEPTH kept in the size tree',
+    )
+    scan_growth_top_n: NonNegativeInt = Field(
+        alias='SCAN_GROWTH_TOP_N',
+        default=10,
+        description='Number of directories reported as the largest growth and shrinkage of a bind mount since '
+        'its previous scan, compared with the size tree (0 to disable)',
+    )
+    scan_age_histogram: bool = Field(
+        alias='SCAN_AGE_HISTOGRAM',
+        default=True,
+        description='Collect a histogram of bytes by the age of files (last modification and last access)',
+    )
+    scan_compress_samples: NonNegativeInt = Field(
+        alias='SCAN_COMPRESS_SAMPLES',
+        default=240,
+        description='Number of blocks compressed to estimate the compression ratio of each scanned directory '
+        '(0 to disable)',
+    )
+    scan_compress_time_limit: PositiveInt = Field(
+        alias='SCAN_COMPRESS_TIME_LIMIT',
+        default=5,
+        description='Time spent compressing samples of each scanned directory at most (in seconds)',
+    )
+    scan_compress_workers: NonNegativeInt = Field(
+        alias='SCAN_COMPRESS_WORKERS',
+        default=2,
+        description='Number of processes compressing samples (0 to compress in the scanner process)',
+    )
+    scan_cold_skip_interval: NonNegativeInt = Field(
+        alias='SCAN_COLD_SKIP_INTERVAL',
+        default=0,
+        description='Bind mounts where nothing was modified for 90 days are scanned again only after this interval '
+        '(in seconds, 0 to always scan)',
     )
 
     # uvicorn settings
@@ -136,6 +324,11 @@ class Settings(BaseSettings):
             return v.lower()
         return v
 
+    @field_validator('scan_fstype_policies')
+    def validate_scan_fstype_policies(cls, v):
+        parse_policies(v)  # raises ValueError if the format is invalid
+        return v
+
     @cached_property
     def log_level_num(self) -> int:
         level_map = {
@@ -149,17 +342,42 @@ class Settings(BaseSettings):
 
     @cached_property
     def bindmount_ignore_patterns_list(self) -> list[str]:
-        patterns = self.bindmount_ignore_patterns
+        return split_patterns(self.bindmount_ignore_patterns)
+
+    @cached_property
+    def bindmount_estimate_patterns_list(self) -> list[str]:
+        return split_patterns(self.bindmount_estimate_patterns)
+
+    @cached_property
+    def rollup_labels_list(self) -> list[str]:
+        return split_patterns(self.rollup_labels)
+
+    @cached_property
+    def scan_pseudo_fstypes_list(self) -> list[str]:
+        return split_patterns(self.scan_pseudo_fstypes)
+
+    @cached_property
+    def scan_fstype_policies_map(self) -> dict[str, ScanStrategy]:
+        return parse_policies(self.scan_fstype_policies)
+
+
+def split_patterns(patterns: str) -> list[str]:
+    # Remove surrounding quotes from the entire string if present
+    if (patterns.startswith('"') and patterns.endswith('"')) or (patterns.startswith("'") and patterns.endswith("'")):
+        patterns = patterns[1:-1]
+
+    # Split and filter empty values
+    return list(filter(None, map(str.strip, patterns.split(';'))))
 
-        # Remove surrounding quotes from the entire string if present
-        if (patterns.startswith('"') and patterns.endswith('"')) or (
-            patterns.startswith("'") and patterns.endswith("'")
-        ):
-            patterns = patterns[1:-1]
 
-        # Split and filter empty values
-        result = list(filter(None, map(str.strip, patterns.split(';'))))
-        return result
+def parse_policies(policies: str) -> dict[str, ScanStrategy]:
+    result = {}
+    for item in split_patterns(policies):
+        fstype, sep, strategy = item.partition('=')
+        if not sep or not fstype.strip():
+            raise ValueError(f'invalid policy {item!r}, expected "fstype=strategy"')
+        result[fstype.strip()] = ScanStrategy(strategy.strip().lower())
+    return result
 
 
 try:
@@ -192,10 +410,30 @@ SSL_CIPHERS = _settings.ssl_ciphers
 # scan settings
 SCAN_INTERVAL = _settings.scan_interval
 SCAN_LOGFILE_INTERVAL = _settings.scan_logfile_interval
+SCAN_DELETED_FILES_INTERVAL = _settings.scan_deleted_files_interval
+SCAN_LOG_RATE_INTERVAL = _settings.scan_log_rate_interval
+LOG_RATE_HALF_LIFE = _settings.log_rate_half_life
+LOG_RATE_TOP_N = _settings.log_rate_top_n
+ROLLUP_LABELS = _settings.rollup_labels_list
+RECLAIM_BUILD_CACHE_AGE = _settings.reclaim_build_cache_age
+RECLAIM_LOG_SIZE = _settings.reclaim_log_size
 SCAN_BINDMOUNTS_INTERVAL = _settings.scan_bindmounts_interval
 BINDMOUNT_IGNORE_PATTERNS = _settings.bindmount_ignore_patterns_list
+SCAN_IGNORE_FILES = _settings.scan_ignore_files
+BINDMOUNT_ESTIMATE_PATTERNS = _settings.bindmount_estimate_patterns_list
+SCAN_ESTIMATE_PROBES = _settings.scan_estimate_probes
+SCAN_BINDMOUNTS_EXACT_INTERVAL = _settings.scan_bindmounts_exact_interval
+SCAN_FSTYPE_POLICIES = _settings.scan_fstype_policies_map
+SCAN_PARALLEL_THREADS = _settings.scan_parallel_threads
+SCAN_PSEUDO_FSTYPES = _settings.scan_pseudo_fstypes_list
 SCAN_OVERLAY2_INTERVAL = _settings.scan_overlay2_interval
 DISABLE_OVERLAY2_SCAN = _settings.disable_overlay2_scan
+SCAN_VOLUMES_INTERVAL = _settings.scan_volumes_interval
+DISABLE_VOLUMES_SCAN = _settings.disable_volumes_scan
+SCAN_DEDUP_INTERVAL = _settings.scan_dedup_interval
+DISABLE_DEDUP_SCAN = _settings.disable_dedup_scan
+SCAN_DEDUP_MIN_SIZE = _settings.scan_dedup_min_size
+SCAN_DEDUP_WORKERS = _settings.scan_dedup_workers
 SCAN_INTENSITY = _settings.scan_intensity
 SCAN_SLEEP_DURATION = {
     ScanIntensity.AGGRESSIVE: 0,  # no sleep, but CPU throttling
@@ -203,6 +441,19 @@ SCAN_SLEEP_DURATION = {
     ScanIntensity.LIGHT: 0.01,  # 10ms
 }[ScanIntensity(_settings.scan_intensity)]
 SCAN_USE_DU = _settings.scan_use_du
+SCAN_BACKEND_REPROBE_INTERVAL = _settings.scan_backend_reprobe_interval
+SCAN_DETAILS_INTERVAL = _settings.scan_details_interval
+SCAN_TOP_K = _settings.scan_top_k
+SCAN_OVERLAY2_DETAILS = _settings.scan_overlay2_details
+SCAN_BREAKDOWN_KEYS = _settings.scan_breakdown_keys
+SCAN_TREE_DEPTH = _settings.scan_tree_depth
+SCAN_TREE_DEEP_NODES = _settings.scan_tree_deep_nodes
+SCAN_GROWTH_TOP_N = _settings.scan_growth_top_n
+SCAN_AGE_HISTOGRAM = _settings.scan_age_histogram
+SCAN_COMPRESS_SAMPLES = _settings.scan_compress_samples
+SCAN_COMPRESS_TIME_LIMIT = _settings.scan_compress_time_limit
+SCAN_COMPRESS_WORKERS = _settings.scan_compress_workers
+SCAN_COLD_SKIP_INTERVAL = _settings.scan_cold_skip_interval
 
 # uvicorn settings
 WORKERS = _settings.workers
@@ -231,14 +482,34 @@ DB_DIR = BASE_DIR / 'db'
 DB_DU = DB_DIR / 'du.sqlite3'
 DB_DF = DB_DIR / 'df.sqlite3'
 TABLE_LOGFILES = 'logfiles'
+TABLE_DELETED_FILES = 'deleted_files'
+TABLE_RECLAIMABLE = 'reclaimable'
+TABLE_LOG_RATES = 'log_rates'
+TABLE_ROLLUPS = 'rollups'
+TABLE_FOOTPRINTS = 'footprints'
+TABLE_TOP = 'top'
 TABLE_BINDMOUNTS = 'bindmounts'
 TABLE_SYSTEM_DF = 'system_df'
 TABLE_OVERLAY2 = 'overlay2'
+TABLE_SCAN_STATS = 'scan_stats'
+TABLE_BINDMOUNT_DETAILS = 'bindmount_details'
+TABLE_OVERLAY2_DETAILS = 'overlay2_details'
+TABLE_VOLUME_DETAILS = 'volume_details'
+TABLE_BINDMOUNT_TREES = 'bindmount_trees'
+TABLE_BINDMOUNT_GROWTH = 'bindmount_growth'
+TABLE_DEDUP = 'dedup'
+TABLE_DEDUP_HASHES = 'dedup_hashes'
+TABLE_BINDMOUNT_FILES = 'bindmount_files'
+TABLE_VOLUME_FILES = 'volume_files'
 IMAGE_KEY = 'image'
 CONTAINER_KEY = 'container'
 VOLUME_KEY = 'volume'
 BUILD_CACHE_KEY = 'build_cache'
+BUILD_CACHE_CURVE_KEY = 'build_cache_curve'
 ROOT_MOUNT_KEY = 'root_mount'
+DEDUP_KEY = 'dedup'
+LOG_RATES_KEY = 'log_rates'
+ROLLUP_INPUTS_KEY = 'rollup_inputs'
 
 
 def to_string() -> str:
@@ -268,12 +539,45 @@ def to_string() -> str:
         'Scan settings': [
             'scan_interval',
             'scan_logfile_interval',
+            'scan_deleted_files_interval',
+            'scan_log_rate_interval',
+            'log_rate_half_life',
+            'log_rate_top_n',
+            'rollup_labels',
+            'reclaim_build_cache_age',
+            'reclaim_log_size',
             'scan_bindmounts_interval',
             'bindmount_ignore_patterns',
+            'scan_ignore_files',
+            'bindmount_estimate_patterns',
+            'scan_estimate_probes',
+            'scan_bindmounts_exact_interval',
+            'scan_fstype_policies',
+            'scan_parallel_threads',
+            'scan_pseudo_fstypes',
             'scan_overlay2_interval',
             'disable_overlay2_scan',
+            'scan_volumes_interval',
+            'disable_volumes_scan',
+            'scan_dedup_interval',
+            'disable_dedup_scan',
+            'scan_dedup_min_size',
+            'scan_dedup_workers',
             'scan_intensity',
             'scan_use_du',
+            'scan_backend_reprobe_interval',
+            'scan_details_interval',
+            'scan_top_k',
+            'scan_overlay2_details',
+            'scan_breakdown_keys',
+            'scan_tree_depth',
+            'scan_tree_deep_nodes',
+            'scan_growth_top_n',
+            'scan_age_histogram',
+            'scan_compress_samples',
+            'scan_compress_time_limit',
+            'scan_compress_workers',
+            'scan_cold_skip_interval',
         ],
         'Uvicorn settings': ['workers', 'debug'],
         'Docker settings': [
@@ -195,6 +195,9 @@ function initializeDataTable(config = {}) {
     'targets': col,
     'render': function(data, type, row) {
       if (type === 'display') {
+        if (data === '') {
+          return 'unknown';  // the size was not calculated, e.g. the path is ignored
+        }
         return humanSize(data, si=si, dp=2);
       }
       return data;